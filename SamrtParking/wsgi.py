@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SamrtParking.settings')
 
 application = get_wsgi_application()
+
+# Con el registro de aplicaciones listo, para precargar la versión activa del modelo
+from vehiculos.prefork import preload_model  # noqa: E402
+preload_model()
@@ -0,0 +1,33 @@
+"""
+Configuración de gunicorn con el modelo precargado antes del fork
+
+    gunicorn -c gunicorn.conf.py
+
+El maestro carga Django y el modelo de placas una vez; los workers heredan
+los pesos por copy-on-write. Para ASGI usar GUNICORN_WORKER_CLASS=
+uvicorn.workers.UvicornWorker y GUNICORN_APP=SamrtParking.asgi:application.
+"""
+
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SamrtParking.settings')
+
+wsgi_app = os.getenv('GUNICORN_APP', 'SamrtParking.wsgi:application')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', max(2, multiprocessing.cpu_count() // 2)))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# Django y la aplicación se cargan en el maestro antes de crear los workers
+preload_app = True
+
+
+def when_ready(server):
+    from vehiculos.prefork import prepare_master
+    prepare_master()
+
+
+def post_fork(server, worker):
+    from vehiculos.prefork import init_worker
+    init_worker(server.cfg.workers)
+
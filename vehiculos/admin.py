@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Vehiculo, PrestamoVehiculo, RegistroAcceso
+from django.contrib import admin, messages
+from .config import MODEL_VERSION_CONFIG
+from .models import Vehiculo, PrestamoVehiculo, RegistroAcceso, TrabajoDeteccion, VersionModelo, OcupacionCochera
 
 
 @admin.register(Vehiculo)
@@ -32,17 +33,17 @@ class PrestamoVehiculoAdmin(admin.ModelAdmin):
 
 @admin.register(RegistroAcceso)
 class RegistroAccesoAdmin(admin.ModelAdmin):
-    list_display = ['vehiculo', 'tipo_acceso', 'timestamp', 'vigilante', 'usuario_autorizado', 'placa_coincide']
-    list_filter = ['tipo_acceso', 'timestamp', 'metodo', 'placa_coincide']
+    list_display = ['vehiculo', 'tipo_acceso', 'timestamp', 'puerta', 'vigilante', 'usuario_autorizado', 'placa_coincide']
+    list_filter = ['tipo_acceso', 'timestamp', 'metodo', 'puerta', 'placa_coincide', 'version_modelo']
     search_fields = ['vehiculo__placa', 'placa_detectada', 'vigilante__username', 'usuario_autorizado__username']
     readonly_fields = ['timestamp']
     
     fieldsets = (
         ('Información Básica', {
-            'fields': ('vehiculo', 'usuario_autorizado', 'vigilante', 'tipo_acceso', 'timestamp')
+            'fields': ('vehiculo', 'usuario_autorizado', 'vigilante', 'tipo_acceso', 'puerta', 'timestamp')
         }),
         ('Detección Automática', {
-            'fields': ('metodo', 'placa_detectada', 'confianza_deteccion', 'placa_coincide')
+            'fields': ('metodo', 'placa_detectada', 'confianza_deteccion', 'placa_coincide', 'version_modelo')
         }),
         ('Archivos', {
             'fields': ('foto_capturada',)
@@ -58,3 +59,61 @@ class RegistroAccesoAdmin(admin.ModelAdmin):
         if request.user.is_superuser:
             return qs
         return qs.filter(vigilante=request.user)
+
+
+@admin.register(OcupacionCochera)
+class OcupacionCocheraAdmin(admin.ModelAdmin):
+    list_display = ['vehiculo', 'usuario_autorizado', 'fecha_entrada']
+    search_fields = ['vehiculo__placa', 'usuario_autorizado__username']
+    list_select_related = ['vehiculo', 'usuario_autorizado']
+    # Se mantiene con cada registro de acceso; no se edita a mano
+    readonly_fields = ['vehiculo', 'registro_entrada', 'usuario_autorizado', 'fecha_entrada']
+
+
+@admin.register(TrabajoDeteccion)
+class TrabajoDeteccionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'estado', 'intentos', 'worker', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado', 'fecha_creacion']
+    search_fields = ['id', 'usuario__username', 'worker']
+    readonly_fields = ['fecha_creacion', 'fecha_inicio', 'fecha_fin', 'resultado', 'worker', 'intentos']
+    exclude = ['imagen']
+
+
+@admin.register(VersionModelo)
+class VersionModeloAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'ruta_modelo', 'backend', 'activa', 'fecha_creacion', 'fecha_activacion']
+    list_filter = ['activa', 'backend']
+    search_fields = ['nombre', 'ruta_modelo', 'descripcion']
+    readonly_fields = ['activa', 'fecha_creacion', 'fecha_activacion', 'creado_por']
+    actions = ['activar_version']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.creado_por = request.user
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description='Activar la versión seleccionada (cambio en caliente)')
+    def activar_version(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Selecciona exactamente una versión', level=messages.ERROR)
+            return
+        version = queryset.first()
+        # Misma verificación que activar_modelo: un modelo que no carga aquí tampoco cargará en los workers
+        from .model_versions import verify_model_version
+
+        try:
+            seconds = verify_model_version(version.ruta_modelo, version.backend)
+        except Exception as e:
+            self.message_user(
+                request,
+                f"No se activó '{version.nombre}': no se pudo cargar '{version.ruta_modelo}' ({version.backend}): {e}",
+                level=messages.ERROR,
+            )
+            return
+        version.activar()
+        self.message_user(
+            request,
+            f"Versión '{version.nombre}' verificada en {seconds:.1f} s y activada. Cada proceso la cargará y calentará en segundo plano "
+            f"en los próximos {MODEL_VERSION_CONFIG['poll_interval_seconds']} s, sin interrumpir detecciones.",
+            level=messages.SUCCESS,
+        )
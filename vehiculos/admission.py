@@ -0,0 +1,163 @@
+"""
+Control de admisión de las peticiones de detección
+
+Limita cuántas detecciones corren a la vez por proceso y cuántas pueden
+esperar turno. Cuando la cola está llena, o la espera prevista no cabe en el
+límite, la petición se rechaza de inmediato con un tiempo de reintento
+estimado a partir del tiempo de servicio medido, en lugar de quedar
+bloqueando un hilo del servidor hasta expirar.
+"""
+
+import math
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+from .config import DETECTION_ADMISSION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """La petición no fue admitida; retry_after son los segundos sugeridos"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Semáforo con cola de espera acotada y estimación del tiempo de servicio
+    """
+
+    def __init__(self, max_concurrent=None, max_queue=None, max_queue_wait=None, alpha=None):
+        """
+        Args:
+            max_concurrent: Detecciones simultáneas
+            max_queue: Peticiones que pueden esperar turno
+            max_queue_wait: Segundos máximos de espera en la cola
+            alpha: Suavizado de la media móvil del tiempo de servicio
+        """
+        config = DETECTION_ADMISSION_CONFIG
+        self.max_concurrent = max(1, max_concurrent or config['max_concurrent'])
+        self.max_queue = config['max_queue'] if max_queue is None else max_queue
+        self.max_queue_wait = config['max_queue_wait_seconds'] if max_queue_wait is None else max_queue_wait
+        self.alpha = config['service_time_alpha'] if alpha is None else alpha
+
+        self.active = 0
+        self.queued = 0
+        self.service_time = None
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_wait = 0
+        self.queue_timeouts = 0
+        self._condition = threading.Condition()
+
+    def _expected_wait(self, position):
+        # Rondas de max_concurrent peticiones por delante, cada una de service_time
+        if self.service_time is None:
+            return 0.0
+        return math.ceil(position / self.max_concurrent) * self.service_time
+
+    def retry_after(self):
+        """Segundos sugeridos para reintentar según la carga actual"""
+        estimate = self._expected_wait(self.active + self.queued + 1)
+        return max(DETECTION_ADMISSION_CONFIG['min_retry_after_seconds'], math.ceil(estimate))
+
+    def acquire(self, max_wait=None):
+        """
+        Ocupa un turno de detección, esperando en la cola si hace falta
+
+        Args:
+            max_wait: Espera máxima en segundos (por defecto max_queue_wait; se
+                usa el menor de ambos, p. ej. el plazo restante de la petición)
+
+        Raises:
+            AdmissionRejected: Si la cola está llena o el turno no llega a tiempo
+        """
+        limit = self.max_queue_wait if max_wait is None else min(max_wait, self.max_queue_wait)
+        with self._condition:
+            if self.active < self.max_concurrent and not self.queued:
+                self.active += 1
+                self.admitted += 1
+                return
+
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected('Cola de detección llena', self.retry_after())
+            if self._expected_wait(self.queued + 1) > limit:
+                # No tiene sentido ocupar la cola si el turno llegaría tarde
+                self.rejected_wait += 1
+                raise AdmissionRejected('Espera prevista mayor que la permitida', self.retry_after())
+
+            self.queued += 1
+            expires = time.monotonic() + limit
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        self.queue_timeouts += 1
+                        raise AdmissionRejected('Tiempo de espera en cola agotado', self.retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def release(self, service_seconds=None):
+        with self._condition:
+            self.active -= 1
+            if service_seconds is not None:
+                if self.service_time is None:
+                    self.service_time = service_seconds
+                else:
+                    self.service_time += self.alpha * (service_seconds - self.service_time)
+            self._condition.notify()
+
+    @contextmanager
+    def admit(self, max_wait=None):
+        """Turno de detección como context manager (mide el tiempo de servicio)"""
+        self.acquire(max_wait)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'max_queue_wait_seconds': self.max_queue_wait,
+                'active': self.active,
+                'queue_depth': self.queued,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_expected_wait': self.rejected_wait,
+                'queue_timeouts': self.queue_timeouts,
+                'service_time_ms': round(self.service_time * 1000, 1) if self.service_time is not None else None,
+                'retry_after_seconds': self.retry_after(),
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Control de admisión compartido por las vistas de detección del proceso"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+def admission_stats():
+    """Métricas del control de admisión (None si no se ha creado)"""
+    return _controller.stats() if _controller is not None else None
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class VehiculosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vehiculos'
+
+    def ready(self):
+        import vehiculos.signals
+        # La precarga del modelo (PRELOAD_PLATE_MODEL) no se hace aquí: con el
+        # registro de aplicaciones a medio cargar no se puede leer la versión
+        # activa. La hacen wsgi.py/asgi.py con prefork.preload_model()
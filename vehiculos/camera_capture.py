@@ -0,0 +1,289 @@
+"""
+Servicio de captura continua de cámara
+
+Cada cámara (o archivo de video) la abre un único hilo de larga vida que lee
+frames sin parar y guarda los más recientes en un pequeño buffer circular.
+Los endpoints de detección toman el último frame sin abrir ni configurar el
+dispositivo en cada petición.
+
+Un dispositivo local solo puede tenerlo abierto un proceso: con varios
+workers de gunicorn, el servicio toma un bloqueo exclusivo por cámara y los
+demás procesos reciben CameraBusyError. Para servir la cámara desde todos los
+workers hay que correr el supervisor multicámara, que es el único dueño del
+dispositivo y publica los frames en memoria compartida.
+"""
+
+import os
+import time
+import tempfile
+import threading
+import logging
+from collections import deque, namedtuple
+
+import cv2
+
+from .config import CAMERA_CONFIG
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+Frame = namedtuple('Frame', ['image', 'sequence', 'timestamp'])
+
+
+def resolve_source(source):
+    """
+    Normaliza la fuente de captura: '0' -> 0 (índice de cámara), rutas y URLs se dejan igual
+    """
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source.strip())
+    return source
+
+
+class CameraBusyError(RuntimeError):
+    """El dispositivo ya lo tiene abierto otro proceso"""
+
+
+def _lock_device(source):
+    """
+    Bloqueo exclusivo entre procesos de un dispositivo local
+
+    Returns:
+        file | None: Archivo bloqueado (None para videos y URLs, que admiten varios lectores)
+
+    Raises:
+        CameraBusyError: Si otro proceso tiene la cámara
+    """
+    if not isinstance(source, int) or fcntl is None:
+        return None
+    lock_file = open(os.path.join(tempfile.gettempdir(), f'smartparking_camara_{source}.lock'), 'a+')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.seek(0)
+        owner = lock_file.read().strip() or 'desconocido'
+        lock_file.close()
+        raise CameraBusyError(
+            f"La cámara {source} ya está abierta por otro proceso (pid {owner}); "
+            f"con varios workers use el supervisor multicámara"
+        )
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+
+class CaptureService:
+    """
+    Hilo de captura dueño de una cámara o video, con buffer de los últimos frames
+    """
+
+    def __init__(self, source, width=None, height=None, buffer_size=None,
+                 warmup_frames=None, loop_video=None):
+        self.source = resolve_source(source)
+        self.is_file = not isinstance(self.source, int)
+        self.width = width or CAMERA_CONFIG['resolution_width']
+        self.height = height or CAMERA_CONFIG['resolution_height']
+        self.warmup_frames = CAMERA_CONFIG['warmup_frames'] if warmup_frames is None else warmup_frames
+        self.loop_video = CAMERA_CONFIG['loop_video_files'] if loop_video is None else loop_video
+
+        self._frames = deque(maxlen=buffer_size or CAMERA_CONFIG['ring_buffer_size'])
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+        self.sequence = 0
+        self.read_failures = 0
+        self.reopens = 0
+        self.started_at = None
+        self.last_error = None
+
+    def start(self):
+        if self.is_running():
+            return
+        if self._lock_file is None:
+            self._lock_file = _lock_device(self.source)
+        self._stop_event.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name=f'camera-capture-{self.source}', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        with self._condition:
+            self._condition.notify_all()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            raise ValueError(f"No se pudo abrir la fuente de video {self.source}")
+
+        if not self.is_file:
+            # Configurar resolución
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            # Los primeros frames tras abrir suelen salir mal expuestos
+            for _ in range(self.warmup_frames):
+                cap.read()
+        return cap
+
+    def _run(self):
+        cap = None
+        frame_interval = 0.0
+        backoff = 0.5
+
+        while not self._stop_event.is_set():
+            if cap is None:
+                try:
+                    cap = self._open()
+                    backoff = 0.5
+                    fps = cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+                    # Los videos se reproducen a su velocidad real para simular una cámara
+                    frame_interval = 1.0 / fps if fps and fps > 0 else 0.0
+                    self.last_error = None
+                    logger.info(f"Captura iniciada en la fuente {self.source}")
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Error al abrir la fuente {self.source}: {e}")
+                    self._stop_event.wait(backoff)
+                    backoff = min(backoff * 2, 10.0)
+                    continue
+
+            started = time.monotonic()
+            ret, image = cap.read()
+            if not ret:
+                if self.is_file and self.loop_video:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, image = cap.read()
+                if not ret:
+                    self.read_failures += 1
+                    if self.is_file and not self.loop_video:
+                        logger.info(f"Fin del video {self.source}")
+                        break
+                    # Cámara caída: se reabre el dispositivo
+                    cap.release()
+                    cap = None
+                    self.reopens += 1
+                    continue
+
+            with self._condition:
+                self.sequence += 1
+                self._frames.append(Frame(image, self.sequence, time.time()))
+                self._condition.notify_all()
+
+            if frame_interval:
+                remaining = frame_interval - (time.monotonic() - started)
+                if remaining > 0:
+                    self._stop_event.wait(remaining)
+
+        if cap is not None:
+            cap.release()
+
+    def get_latest_frame(self, max_age=None):
+        """
+        Último frame capturado
+
+        Args:
+            max_age: Antigüedad máxima en segundos (None = cualquiera)
+
+        Returns:
+            Frame | None
+        """
+        with self._condition:
+            if not self._frames:
+                return None
+            frame = self._frames[-1]
+        if max_age is not None and time.time() - frame.timestamp > max_age:
+            return None
+        return frame
+
+    def wait_for_frame(self, after_sequence=0, timeout=None):
+        """
+        Espera un frame con número de secuencia mayor que after_sequence
+
+        Returns:
+            Frame | None: None si se agotó el tiempo
+        """
+        timeout = CAMERA_CONFIG['frame_wait_timeout'] if timeout is None else timeout
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: (self._frames and self._frames[-1].sequence > after_sequence)
+                or self._stop_event.is_set(),
+                timeout=timeout,
+            )
+            if not ready or not self._frames or self._frames[-1].sequence <= after_sequence:
+                return None
+            return self._frames[-1]
+
+    def recent_frames(self):
+        """Copia de los frames del buffer, del más antiguo al más reciente"""
+        with self._condition:
+            return list(self._frames)
+
+    def stats(self):
+        latest = self.get_latest_frame()
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        return {
+            'source': str(self.source),
+            'running': self.is_running(),
+            'frames_captured': self.sequence,
+            'fps': round(self.sequence / elapsed, 2) if elapsed > 0 else None,
+            'read_failures': self.read_failures,
+            'reopens': self.reopens,
+            'latest_frame_age_ms': round((time.time() - latest.timestamp) * 1000, 1) if latest else None,
+            'last_error': self.last_error,
+        }
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_capture_service(source=None):
+    """
+    Servicio de captura de la fuente indicada, iniciándolo si hace falta
+
+    Args:
+        source: Índice de cámara, ruta de video o URL (por defecto la de CAMERA_CONFIG)
+
+    Raises:
+        CameraBusyError: Si otro proceso tiene abierta la cámara
+    """
+    source = resolve_source(CAMERA_CONFIG['source'] if source is None else source)
+    with _services_lock:
+        service = _services.get(source)
+        if service is None:
+            service = CaptureService(source)
+            _services[source] = service
+        if not service.is_running():
+            service.start()
+        return service
+
+
+def stop_capture_services():
+    """Detiene todos los servicios de captura del proceso"""
+    with _services_lock:
+        services = list(_services.values())
+        _services.clear()
+    for service in services:
+        service.stop()
+
+
+def capture_stats():
+    """Métricas de cada fuente de captura activa"""
+    return [service.stats() for service in list(_services.values())]
@@ -0,0 +1,575 @@
+"""
+Supervisor multicámara
+
+Un proceso de captura por cámara escribe los frames en un buffer circular de
+memoria compartida (multiprocessing.shared_memory); un pool de procesos de
+inferencia los lee de ahí sin serializar los arrays. El supervisor reinicia
+los procesos caídos y publica contadores por cámara (fps, frames perdidos,
+retraso) en un archivo de estado que lee el endpoint de métricas.
+
+Las cámaras se reparten entre los workers de inferencia (cámara i -> worker
+i mod N) para que el filtro de movimiento y el tracker de cada cámara vivan
+en un solo proceso.
+
+Con el supervisor corriendo, sus procesos de captura son los únicos dueños
+de los dispositivos: los workers de la API leen el último frame del mismo
+anillo (get_supervisor_ring) en lugar de abrir la cámara otra vez.
+
+NumPy se importa dentro de las funciones que manejan frames: el endpoint de
+métricas importa este módulo solo para leer el archivo de estado.
+"""
+
+import os
+import json
+import time
+import queue
+import signal
+import logging
+import threading
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+from .config import CAMERA_CONFIG, CAMERA_SUPERVISOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Campos de la cabecera compartida de cada cámara (float64)
+HEADER_FIELDS = (
+    'latest_sequence',     # Último frame escrito (captura)
+    'frames_written',
+    'heartbeat',           # time.time() del último latido de la captura
+    'processed_sequence',  # Último frame leído por inferencia
+    'frames_processed',
+    'frames_dropped',      # Frames sobrescritos antes de que la inferencia los leyera
+    'lag_sum',             # Suma de retrasos captura -> inferencia (segundos)
+    'last_lag',
+)
+_FIELD = {name: index for index, name in enumerate(HEADER_FIELDS)}
+
+
+def _attach_shared_memory(name, child=True):
+    """
+    Abre un bloque existente sin que el proceso lo libere al terminar
+
+    Args:
+        child: El proceso es hijo del supervisor (False para los workers de la API)
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: los hijos comparten el resource_tracker del supervisor,
+        # que es quien libera el bloque. Un proceso ajeno tiene su propio
+        # tracker, que lo borraría al salir: se le quita el registro
+        block = shared_memory.SharedMemory(name=name)
+        if not child:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class FrameRing:
+    """
+    Buffer circular de frames de tamaño fijo en memoria compartida
+
+    La cabecera guarda los contadores de la cámara y, por cada posición, el
+    número de secuencia y la marca de tiempo del frame. Mientras se escribe
+    una posición su secuencia vale -1, así el lector detecta frames a medias.
+    """
+
+    def __init__(self, block, shape, slots, owner=False):
+        import numpy as np
+
+        self.block = block
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = owner
+
+        header_length = len(HEADER_FIELDS) + 2 * slots
+        self.header = np.ndarray((header_length,), dtype=np.float64, buffer=block.buf)
+        self.slot_sequences = self.header[len(HEADER_FIELDS):len(HEADER_FIELDS) + slots]
+        self.slot_timestamps = self.header[len(HEADER_FIELDS) + slots:]
+        self.frames = np.ndarray(
+            (slots,) + self.shape, dtype=np.uint8, buffer=block.buf, offset=self.header.nbytes
+        )
+
+    @staticmethod
+    def _size(shape, slots):
+        import numpy as np
+
+        return (len(HEADER_FIELDS) + 2 * slots) * 8 + slots * int(np.prod(shape))
+
+    @classmethod
+    def create(cls, shape, slots):
+        block = shared_memory.SharedMemory(create=True, size=cls._size(shape, slots))
+        ring = cls(block, shape, slots, owner=True)
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, shape, slots, child=True):
+        return cls(_attach_shared_memory(name, child), shape, slots)
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def get(self, field):
+        return float(self.header[_FIELD[field]])
+
+    def set(self, field, value):
+        self.header[_FIELD[field]] = value
+
+    def add(self, field, value=1):
+        self.header[_FIELD[field]] += value
+
+    def write(self, image):
+        """Copia un frame en la siguiente posición (solo el proceso de captura escribe)"""
+        import numpy as np
+
+        sequence = int(self.get('latest_sequence')) + 1
+        slot = sequence % self.slots
+        self.slot_sequences[slot] = -1
+        np.copyto(self.frames[slot], image)
+        self.slot_timestamps[slot] = time.time()
+        self.slot_sequences[slot] = sequence
+        self.set('latest_sequence', sequence)
+        self.add('frames_written')
+        return sequence
+
+    def read_latest(self, out):
+        """
+        Copia el último frame en out
+
+        Returns:
+            tuple | None: (secuencia, timestamp), o None si se estaba sobrescribiendo
+        """
+        import numpy as np
+
+        sequence = int(self.get('latest_sequence'))
+        if sequence <= 0:
+            return None
+        slot = sequence % self.slots
+        if self.slot_sequences[slot] != sequence:
+            return None
+        timestamp = float(self.slot_timestamps[slot])
+        np.copyto(out, self.frames[slot])
+        if self.slot_sequences[slot] != sequence:
+            return None
+        return sequence, timestamp
+
+    def latest_frame(self, max_age=None, attempts=3):
+        """
+        Copia del último frame para un lector fuera del supervisor
+
+        Args:
+            max_age: Antigüedad máxima en segundos (None = cualquiera)
+
+        Returns:
+            ndarray | None: None si no hay frame reciente
+        """
+        import numpy as np
+
+        out = np.empty(self.shape, dtype=np.uint8)
+        for _ in range(attempts):
+            read = self.read_latest(out)
+            if read is not None:
+                break
+        else:
+            return None
+        if max_age is not None and time.time() - read[1] > max_age:
+            return None
+        return out
+
+    def close(self):
+        # Las vistas numpy deben soltarse antes de cerrar el bloque
+        self.header = self.slot_sequences = self.slot_timestamps = self.frames = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+
+def capture_process_main(source, ring_name, shape, slots, stop_event):
+    """
+    Proceso de captura de una cámara: lee con CaptureService y escribe en el anillo
+    """
+    import cv2
+    from .camera_capture import CaptureService
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ring = FrameRing.attach(ring_name, shape, slots)
+    height, width = shape[:2]
+    service = CaptureService(source, width=width, height=height, buffer_size=2)
+    service.start()
+
+    sequence = 0
+    try:
+        while not stop_event.is_set():
+            ring.set('heartbeat', time.time())
+            frame = service.wait_for_frame(sequence, timeout=1.0)
+            if frame is None:
+                if not service.is_running():
+                    # Fin de un video sin bucle o fallo irrecuperable: el supervisor reinicia
+                    break
+                continue
+            sequence = frame.sequence
+
+            image = frame.image
+            if image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            if image.shape[:2] != (height, width):
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            ring.write(image)
+    finally:
+        service.stop()
+        ring.close()
+
+
+def inference_worker_main(cameras, stop_event, result_queue, idle_sleep=0.005):
+    """
+    Proceso de inferencia: atiende por turnos las cámaras asignadas
+
+    Args:
+        cameras: Lista de (camera_id, fuente, nombre del anillo, forma, posiciones)
+    """
+    import django
+    django.setup()
+
+    import numpy as np
+
+    from .motion_gate import get_motion_gate
+    from .plate_tracker import get_plate_tracker
+    from .plate_detection import get_plate_detection_service
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    detector = get_plate_detection_service()
+
+    lanes = []
+    for camera_id, source, ring_name, shape, slots in cameras:
+        lanes.append({
+            'camera_id': camera_id,
+            'source': source,
+            'ring': FrameRing.attach(ring_name, shape, slots),
+            'frame': np.empty(shape, dtype=np.uint8),
+            'motion_gate': get_motion_gate(source),
+            'tracker': get_plate_tracker(source),
+        })
+
+    try:
+        while not stop_event.is_set():
+            worked = False
+            for lane in lanes:
+                ring = lane['ring']
+                processed = int(ring.get('processed_sequence'))
+                if int(ring.get('latest_sequence')) <= processed:
+                    continue
+
+                read = ring.read_latest(lane['frame'])
+                if read is None:
+                    continue
+                sequence, timestamp = read
+                worked = True
+
+                # Los frames anteriores a la primera lectura no cuentan como perdidos
+                if sequence > processed + 1 and processed > 0:
+                    ring.add('frames_dropped', sequence - processed - 1)
+                lag = time.time() - timestamp
+                ring.set('processed_sequence', sequence)
+                ring.add('frames_processed')
+                ring.add('lag_sum', lag)
+                ring.set('last_lag', lag)
+
+                result = detector.process_camera_frame(
+                    lane['frame'], motion_gate=lane['motion_gate'], tracker=lane['tracker']
+                )
+                if result and result.get('plates_detected') and not result.get('frame_skipped'):
+                    result_queue.put({
+                        'camera_id': lane['camera_id'],
+                        'plates': result['plates_detected'],
+                        'confidences': result['confidence_scores'],
+                        'track_ids': result.get('track_ids', []),
+                        'timestamp': timestamp,
+                    })
+            if not worked:
+                time.sleep(idle_sleep)
+    finally:
+        for lane in lanes:
+            lane['ring'].close()
+
+
+class CameraSupervisor:
+    """
+    Lanza y vigila los procesos de captura e inferencia de todas las cámaras
+    """
+
+    def __init__(self, sources=None, inference_workers=None, ring_slots=None, status_file=None):
+        sources = sources or CAMERA_SUPERVISOR_CONFIG['sources'] or [CAMERA_CONFIG['source']]
+        self.cameras = {f'camara_{index + 1}': source for index, source in enumerate(sources)}
+        self.inference_workers = max(1, min(
+            inference_workers or CAMERA_SUPERVISOR_CONFIG['inference_workers'], len(self.cameras)
+        ))
+        self.ring_slots = ring_slots or CAMERA_SUPERVISOR_CONFIG['ring_slots']
+        self.status_file = status_file or CAMERA_SUPERVISOR_CONFIG['status_file']
+        self.shape = (CAMERA_CONFIG['resolution_height'], CAMERA_CONFIG['resolution_width'], 3)
+
+        # spawn: los procesos hijos no heredan hilos ni el estado de PyTorch del supervisor
+        self.context = multiprocessing.get_context('spawn')
+        self.stop_event = self.context.Event()
+        self.result_queue = self.context.Queue()
+
+        self.rings = {}
+        self.capture_processes = {}
+        self.worker_processes = {}
+        self.restarts = {}
+        self.failures = {}  # Caídas seguidas sin un periodo estable (define el backoff)
+        self.last_start = {}
+        self.next_start = {}
+        self.last_detections = {}
+        self.started_at = None
+        self.started_monotonic = None
+        self._previous = {}
+
+    def _start_capture(self, camera_id):
+        process = self.context.Process(
+            target=capture_process_main,
+            args=(self.cameras[camera_id], self.rings[camera_id].name, self.shape,
+                  self.ring_slots, self.stop_event),
+            name=f'captura-{camera_id}',
+            daemon=True,
+        )
+        # Latido inicial para no reiniciar el proceso mientras abre la cámara
+        self.rings[camera_id].set('heartbeat', time.time())
+        process.start()
+        self.capture_processes[camera_id] = process
+
+    def _worker_cameras(self, worker_index):
+        return [
+            (camera_id, source, self.rings[camera_id].name, self.shape, self.ring_slots)
+            for index, (camera_id, source) in enumerate(self.cameras.items())
+            if index % self.inference_workers == worker_index
+        ]
+
+    def _start_worker(self, worker_index):
+        process = self.context.Process(
+            target=inference_worker_main,
+            args=(self._worker_cameras(worker_index), self.stop_event, self.result_queue),
+            name=f'inferencia-{worker_index}',
+            daemon=True,
+        )
+        process.start()
+        self.worker_processes[worker_index] = process
+
+    def _restart_if_needed(self, key, process, start, heartbeat=None):
+        now = time.monotonic()
+        stale = (
+            heartbeat is not None
+            and time.time() - heartbeat > CAMERA_SUPERVISOR_CONFIG['heartbeat_timeout_seconds']
+        )
+        if process.is_alive() and not stale:
+            return
+        if now < self.next_start.get(key, 0):
+            return
+
+        if process.is_alive():
+            logger.warning(f"{process.name} sin latido, se reinicia")
+            process.terminate()
+        else:
+            logger.warning(f"{process.name} terminó (código {process.exitcode}), se reinicia")
+        process.join(timeout=5)
+
+        self.restarts[key] = self.restarts.get(key, 0) + 1
+        # Un proceso que funcionó un buen rato no arrastra el backoff de caídas anteriores
+        uptime = now - self.last_start.get(key, self.started_monotonic)
+        if uptime >= CAMERA_SUPERVISOR_CONFIG['stable_uptime_seconds']:
+            self.failures[key] = 0
+        failures = self.failures.get(key, 0) + 1
+        self.failures[key] = failures
+        # Backoff exponencial para no reiniciar en bucle una cámara desconectada
+        backoff = min(2 ** min(failures, 10), CAMERA_SUPERVISOR_CONFIG['max_restart_backoff_seconds'])
+        self.next_start[key] = now + backoff
+        self.last_start[key] = now
+        start()
+
+    def start(self):
+        self.started_at = time.time()
+        self.started_monotonic = time.monotonic()
+        for camera_id in self.cameras:
+            self.rings[camera_id] = FrameRing.create(self.shape, self.ring_slots)
+            self._start_capture(camera_id)
+        for worker_index in range(self.inference_workers):
+            self._start_worker(worker_index)
+        logger.info(
+            f"Supervisor iniciado: {len(self.cameras)} cámaras, {self.inference_workers} workers de inferencia"
+        )
+
+    def run(self, duration=None):
+        """
+        Bucle del supervisor hasta recibir SIGINT/SIGTERM (o agotar duration)
+        """
+        signal.signal(signal.SIGTERM, lambda *_: self.stop_event.set())
+        self.start()
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self.stop_event.is_set():
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                self._drain_results(CAMERA_SUPERVISOR_CONFIG['status_interval_seconds'])
+
+                for camera_id, process in list(self.capture_processes.items()):
+                    self._restart_if_needed(
+                        ('captura', camera_id), process,
+                        lambda camera_id=camera_id: self._start_capture(camera_id),
+                        heartbeat=self.rings[camera_id].get('heartbeat'),
+                    )
+                for worker_index, process in list(self.worker_processes.items()):
+                    self._restart_if_needed(
+                        ('inferencia', worker_index), process,
+                        lambda worker_index=worker_index: self._start_worker(worker_index),
+                    )
+                self.write_status()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def _drain_results(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                detection = self.result_queue.get(timeout=remaining)
+            except queue.Empty:
+                return
+            self.last_detections[detection['camera_id']] = detection
+            logger.info(f"{detection['camera_id']}: placas {', '.join(detection['plates'])}")
+
+    def stats(self):
+        now = time.time()
+        cameras = {}
+        for camera_id, source in self.cameras.items():
+            ring = self.rings[camera_id]
+            written = ring.get('frames_written')
+            processed = ring.get('frames_processed')
+            previous = self._previous.get(camera_id)
+            self._previous[camera_id] = (now, written, processed)
+
+            capture_fps = inference_fps = None
+            if previous is not None and now > previous[0]:
+                capture_fps = round((written - previous[1]) / (now - previous[0]), 2)
+                inference_fps = round((processed - previous[2]) / (now - previous[0]), 2)
+
+            process = self.capture_processes.get(camera_id)
+            cameras[camera_id] = {
+                'source': str(source),
+                'capture_alive': bool(process and process.is_alive()),
+                'capture_restarts': self.restarts.get(('captura', camera_id), 0),
+                'capture_fps': capture_fps,
+                'inference_fps': inference_fps,
+                'frames_captured': int(written),
+                'frames_processed': int(processed),
+                'frames_dropped': int(ring.get('frames_dropped')),
+                'drop_ratio': round(ring.get('frames_dropped') / written, 3) if written else None,
+                'lag_ms': round(ring.get('last_lag') * 1000, 1) if processed else None,
+                'avg_lag_ms': round(ring.get('lag_sum') / processed * 1000, 1) if processed else None,
+                'last_detection': self.last_detections.get(camera_id),
+                # Para que los workers de la API lean los frames sin abrir el dispositivo
+                'ring': {'name': ring.name, 'shape': list(self.shape), 'slots': self.ring_slots},
+            }
+        return {
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'updated_at': now,
+            'inference_workers': {
+                str(index): {
+                    'alive': process.is_alive(),
+                    'restarts': self.restarts.get(('inferencia', index), 0),
+                }
+                for index, process in self.worker_processes.items()
+            },
+            'cameras': cameras,
+        }
+
+    def write_status(self):
+        # Escritura atómica: el endpoint nunca lee un JSON a medias
+        temporary = f'{self.status_file}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as status:
+            json.dump(self.stats(), status)
+        os.replace(temporary, self.status_file)
+
+    def shutdown(self):
+        self.stop_event.set()
+        for process in list(self.capture_processes.values()) + list(self.worker_processes.values()):
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        try:
+            self.write_status()
+        except OSError:
+            pass
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
+        logger.info("Supervisor detenido")
+
+
+def read_supervisor_status(status_file=None, max_age_seconds=None):
+    """
+    Último estado publicado por el supervisor (None si no hay uno reciente)
+    """
+    status_file = status_file or CAMERA_SUPERVISOR_CONFIG['status_file']
+    if max_age_seconds is None:
+        max_age_seconds = CAMERA_SUPERVISOR_CONFIG['status_interval_seconds'] * 10
+    try:
+        with open(status_file, encoding='utf-8') as status:
+            data = json.load(status)
+    except (OSError, ValueError):
+        return None
+    data['stale'] = time.time() - data.get('updated_at', 0) > max_age_seconds
+    return data
+
+
+_rings = {}
+_rings_lock = threading.Lock()
+
+
+def get_supervisor_ring(source, status=None):
+    """
+    Anillo en el que el supervisor escribe los frames de una fuente
+
+    Args:
+        source: Índice de cámara, ruta de video o URL
+        status: Estado ya leído con read_supervisor_status (por defecto se lee)
+
+    Returns:
+        FrameRing | None: None si el supervisor no está activo o no captura esa fuente
+    """
+    from .camera_capture import resolve_source
+
+    status = read_supervisor_status() if status is None else status
+    if not status or status['stale']:
+        return None
+    wanted = str(resolve_source(source))
+    camera = next(
+        (camera for camera in status.get('cameras', {}).values()
+         if str(resolve_source(camera['source'])) == wanted and camera.get('ring')),
+        None,
+    )
+    if camera is None:
+        return None
+
+    info = camera['ring']
+    with _rings_lock:
+        ring = _rings.get(wanted)
+        if ring is not None and ring.name == info['name']:
+            return ring
+        if ring is not None:
+            # El supervisor se reinició con anillos nuevos
+            ring.close()
+            del _rings[wanted]
+        try:
+            ring = FrameRing.attach(info['name'], info['shape'], info['slots'], child=False)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo abrir el anillo de la fuente {source}: {e}")
+            return None
+        _rings[wanted] = ring
+        return ring
@@ -0,0 +1,213 @@
+"""
+Reconocedor de caracteres de placas en NumPy
+
+Segmenta los caracteres de un recorte binarizado con componentes conexas y
+los clasifica contra un banco de plantillas A-Z/0-9, calculando las
+distancias a todas las plantillas de una vez con NumPy. Corre en el propio
+proceso y es lo bastante rápido para usarse en cada frame de una cámara.
+"""
+
+import string
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+GLYPH_ALPHABET = string.ascii_uppercase + string.digits
+GLYPH_HEIGHT = 24
+GLYPH_WIDTH = 16
+
+# Variantes de fuente y grosor con las que se genera el banco de plantillas
+_GLYPH_VARIANTS = [
+    (cv2.FONT_HERSHEY_SIMPLEX, 3),
+    (cv2.FONT_HERSHEY_SIMPLEX, 5),
+    (cv2.FONT_HERSHEY_DUPLEX, 3),
+    (cv2.FONT_HERSHEY_DUPLEX, 5),
+]
+
+RecognitionResult = namedtuple('RecognitionResult', ['text', 'confidences', 'boxes'])
+
+
+def normalize_glyph(mask):
+    """
+    Ajusta la máscara de un carácter al tamaño de plantilla conservando su proporción
+
+    Args:
+        mask: Array 2D con el carácter en primer plano (valores > 0)
+
+    Returns:
+        np.array: Vector float32 de GLYPH_HEIGHT * GLYPH_WIDTH valores en [0, 1]
+    """
+    height, width = mask.shape
+    scale = min(GLYPH_HEIGHT / height, GLYPH_WIDTH / width)
+    new_height = max(1, int(round(height * scale)))
+    new_width = max(1, int(round(width * scale)))
+    resized = cv2.resize(
+        (mask > 0).astype(np.float32), (new_width, new_height), interpolation=cv2.INTER_AREA
+    )
+
+    glyph = np.zeros((GLYPH_HEIGHT, GLYPH_WIDTH), dtype=np.float32)
+    top = (GLYPH_HEIGHT - new_height) // 2
+    left = (GLYPH_WIDTH - new_width) // 2
+    glyph[top:top + new_height, left:left + new_width] = resized
+    return glyph.ravel()
+
+
+def _render_glyph(char, font, thickness):
+    canvas = np.zeros((90, 80), dtype=np.uint8)
+    cv2.putText(canvas, char, (10, 70), font, 2.2, 255, thickness, cv2.LINE_AA)
+    ys, xs = np.nonzero(canvas > 127)
+    return normalize_glyph(canvas[ys.min():ys.max() + 1, xs.min():xs.max() + 1])
+
+
+class GlyphBank:
+    """
+    Banco de plantillas de caracteres (una fila por variante de cada carácter)
+    """
+
+    def __init__(self, alphabet=GLYPH_ALPHABET, variants=None):
+        self.alphabet = alphabet
+        self.variants = variants or _GLYPH_VARIANTS
+        templates = [
+            _render_glyph(char, font, thickness)
+            for char in alphabet
+            for font, thickness in self.variants
+        ]
+        self.templates = np.stack(templates)
+        # Normas precalculadas para la distancia euclídea expandida
+        self.template_norms = np.einsum('ij,ij->i', self.templates, self.templates)
+
+    def classify(self, glyphs):
+        """
+        Clasifica varios caracteres a la vez
+
+        Args:
+            glyphs: Array (N, D) de caracteres normalizados
+
+        Returns:
+            tuple: (caracteres, confianzas) con N elementos cada uno
+        """
+        glyph_norms = np.einsum('ij,ij->i', glyphs, glyphs)
+        # |g - t|^2 = |g|^2 + |t|^2 - 2 g.t, para todas las parejas en una sola operación
+        distances = glyph_norms[:, None] + self.template_norms[None, :] - 2.0 * glyphs @ self.templates.T
+        np.maximum(distances, 0, out=distances)
+
+        per_class = distances.reshape(len(glyphs), len(self.alphabet), len(self.variants)).min(axis=2)
+        order = np.argsort(per_class, axis=1)
+        rows = np.arange(len(glyphs))
+        best = per_class[rows, order[:, 0]]
+        second = per_class[rows, order[:, 1]]
+
+        # Confianza por margen respecto a la segunda mejor clase
+        confidences = np.clip(1.0 - best / (second + 1e-6), 0.0, 1.0)
+        chars = [self.alphabet[index] for index in order[:, 0]]
+        return chars, confidences.tolist()
+
+
+_glyph_bank = None
+_glyph_bank_lock = threading.Lock()
+
+
+def get_glyph_bank():
+    """Banco de plantillas compartido (se genera una sola vez)"""
+    global _glyph_bank
+    if _glyph_bank is None:
+        with _glyph_bank_lock:
+            if _glyph_bank is None:
+                _glyph_bank = GlyphBank()
+    return _glyph_bank
+
+
+def _split_touching(mask, parts):
+    """
+    Divide un componente con varios caracteres pegados por las columnas con menos tinta
+    """
+    width = mask.shape[1]
+    column_ink = mask.sum(axis=0)
+    step = width / parts
+    cuts = [0]
+    for k in range(1, parts):
+        lo = int(k * step - step / 3)
+        hi = int(k * step + step / 3) + 1
+        cuts.append(lo + int(np.argmin(column_ink[lo:hi])))
+    cuts.append(width)
+    return [(cuts[k], cuts[k + 1]) for k in range(parts) if cuts[k + 1] > cuts[k]]
+
+
+def segment_characters(binary):
+    """
+    Separa los caracteres de una placa binarizada usando componentes conexas
+
+    Args:
+        binary: Recorte binarizado (0/255) de la placa
+
+    Returns:
+        list: (máscara, caja) de cada carácter, ordenados de izquierda a derecha
+    """
+    height, width = binary.shape[:2]
+
+    # Los caracteres ocupan menos área que el fondo: el valor minoritario es el primer plano
+    foreground = binary < 128 if np.mean(binary > 127) > 0.5 else binary > 127
+    foreground = foreground.astype(np.uint8)
+
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(foreground, connectivity=8)
+    if count <= 1:
+        return []
+
+    x, y, w, h, area = (stats[1:, column] for column in range(5))
+    tall = (h >= 0.35 * height) & (h <= 0.95 * height) & (area >= 0.1 * w * h)
+    single = tall & (w <= 0.3 * width) & (w >= 0.02 * width) & (w <= 1.2 * h)
+    # Componentes anchos con la altura de un carácter: caracteres pegados entre sí
+    touching = tall & ~single & (w > 1.2 * h) & (w <= 0.8 * width)
+    indices = np.nonzero(single | touching)[0]
+    if len(indices) == 0:
+        return []
+
+    # Descartar componentes fuera de la línea de texto (tornillos, bordes, logos)
+    centers = y[indices] + h[indices] / 2.0
+    median_center = np.median(centers)
+    median_height = np.median(h[indices])
+    indices = indices[np.abs(centers - median_center) <= 0.35 * median_height]
+    indices = indices[np.argsort(x[indices])]
+
+    single_widths = w[indices][single[indices]]
+    char_width = np.median(single_widths) if len(single_widths) else 0.7 * median_height
+
+    characters = []
+    for index in indices:
+        label = index + 1
+        x1, y1, x2, y2 = x[index], y[index], x[index] + w[index], y[index] + h[index]
+        mask = labels[y1:y2, x1:x2] == label
+        if not touching[index]:
+            characters.append((mask, (int(x1), int(y1), int(x2), int(y2))))
+            continue
+
+        parts = max(2, int(round(w[index] / char_width)))
+        for left, right in _split_touching(mask, parts):
+            piece = mask[:, left:right]
+            rows = np.nonzero(piece.any(axis=1))[0]
+            if len(rows) == 0:
+                continue
+            piece = piece[rows[0]:rows[-1] + 1]
+            characters.append((piece, (int(x1 + left), int(y1 + rows[0]), int(x1 + right), int(y1 + rows[-1] + 1))))
+    return characters
+
+
+def recognize_characters(binary):
+    """
+    Reconoce el texto de una placa binarizada
+
+    Args:
+        binary: Recorte binarizado (0/255), como el de PlateDetectionService.preprocess_plate
+
+    Returns:
+        RecognitionResult: texto, confianza por carácter y caja de cada carácter
+    """
+    characters = segment_characters(binary)
+    if not characters:
+        return RecognitionResult('', [], [])
+
+    glyphs = np.stack([normalize_glyph(mask) for mask, _ in characters])
+    chars, confidences = get_glyph_bank().classify(glyphs)
+    return RecognitionResult(''.join(chars), confidences, [box for _, box in characters])
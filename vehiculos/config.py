@@ -2,12 +2,28 @@
 Configuración específica para el sistema SmartParking
 """
 
+import os
+import tempfile
+
 # Configuración de YOLO y detección de placas
 PLATE_DETECTION_CONFIG = {
     'model_path': 'yolov8n.pt',  # Modelo por defecto, se puede entrenar uno específico
     'confidence_threshold': 0.5,  # Umbral de confianza para detecciones
     'image_size': 640,  # Tamaño de imagen para YOLO
     'max_detections': 10,  # Máximo número de detecciones por imagen
+    'nms_iou_threshold': 0.7,  # IoU de NMS (backend ONNX; ultralytics usa el mismo valor)
+    # Backend de inferencia: 'torch' (ultralytics/PyTorch) u 'onnx' (ONNX Runtime en CPU)
+    'backend': os.getenv('PLATE_DETECTION_BACKEND', 'torch'),
+    # Modelo ONNX a usar con el backend 'onnx' (None = model_path con extensión .onnx)
+    'onnx_model_path': os.getenv('PLATE_ONNX_MODEL') or None,
+    'onnx_threads': None,  # Hilos intra-op de ONNX Runtime (None = todos los núcleos)
+    'plate_regions': None,  # Regiones de PLATE_REGIONS activas (None = todas)
+    'max_ocr_corrections': 2,  # Máximo de caracteres corregidos por confusión en una placa
+    # Lado mayor mínimo al decodificar JPEG subidos a resolución reducida (1/2, 1/4, 1/8).
+    # Por encima de image_size para que los recortes de placa conserven detalle para el OCR
+    'decode_target_size': 1280,
+    # Cargar el modelo al arrancar Django (útil en workers de inferencia)
+    'preload_model': os.getenv('PRELOAD_PLATE_MODEL', 'False').lower() in ('1', 'true', 'yes'),
 }
 
 # Configuración de cámara
@@ -16,22 +32,126 @@ CAMERA_CONFIG = {
     'resolution_width': 1280,
     'resolution_height': 720,
     'fps': 30,
+    # Fuente por defecto: índice de cámara, ruta de un video o URL (CAMERA_SOURCE en .env)
+    'source': os.getenv('CAMERA_SOURCE', '0'),
+    'background_capture': True,  # Hilo de captura continua en lugar de abrir la cámara por petición
+    'ring_buffer_size': 4,  # Frames recientes guardados por cámara
+    'warmup_frames': 5,  # Frames descartados al abrir la cámara (exposición inestable)
+    'max_frame_age_seconds': 1.0,  # Antigüedad máxima aceptable del último frame
+    'frame_wait_timeout': 2.0,  # Espera máxima por un frame nuevo
+    'loop_video_files': True,  # Reiniciar los videos al terminar (pruebas sin cámara)
+}
+
+# Supervisor multicámara (python manage.py camera_supervisor)
+CAMERA_SUPERVISOR_CONFIG = {
+    # Fuentes separadas por coma, una por carril (CAMERA_SOURCES en .env); por defecto CAMERA_SOURCE
+    'sources': [source.strip() for source in os.getenv('CAMERA_SOURCES', '').split(',') if source.strip()],
+    'inference_workers': 2,  # Procesos de inferencia compartidos por todas las cámaras
+    'ring_slots': 4,  # Frames por cámara en la memoria compartida
+    'status_file': os.getenv(
+        'CAMERA_STATUS_FILE', os.path.join(tempfile.gettempdir(), 'smartparking_camaras.json')
+    ),
+    'status_interval_seconds': 1.0,  # Cada cuánto se escriben los contadores
+    'heartbeat_timeout_seconds': 10.0,  # Captura sin latido durante este tiempo se reinicia
+    'max_restart_backoff_seconds': 30.0,
+    'stable_uptime_seconds': 60.0,  # Tras este tiempo funcionando, el backoff de reinicio vuelve a empezar
+}
+
+# Filtro de cambios para frames de cámara (evita detectar sobre el carril vacío)
+MOTION_GATE_CONFIG = {
+    'enabled': True,
+    'roi': None,  # (x1, y1, x2, y2) en fracciones de la imagen; None = imagen completa
+    'camera_rois': {},  # ROI por cámara, p. ej. {'0': (0.2, 0.4, 0.8, 1.0)}
+    'downscale_width': 160,  # Ancho aproximado de la imagen reducida que se compara
+    'pixel_threshold': 25,  # Diferencia de gris (0-255) para considerar un píxel cambiado
+    'min_changed_ratio': 0.01,  # Fracción de píxeles cambiados para lanzar la detección
+    'max_skip_seconds': 10.0,  # Forzar una detección tras este tiempo sin cambios
+}
+
+# Configuración del seguimiento de placas entre frames
+TRACKER_CONFIG = {
+    'enabled': True,
+    'iou_threshold': 0.3,  # IoU mínimo para asociar una caja a una pista
+    'max_centroid_distance': 1.0,  # Distancia entre centros (en anchos de caja) sin solapamiento
+    'max_missed_frames': 5,  # Frames sin detección antes de cerrar una pista
+    'max_age_seconds': 2.0,  # Segundos sin ver una pista antes de cerrarla (otro carro pudo ocupar su lugar)
+    'reocr_confidence_margin': 0.1,  # Mejora de confianza que justifica otro OCR
+    'retry_interval_frames': 5,  # Frames entre reintentos si la pista aún no tiene placa
+}
+
+# Cola de trabajos de detección (python manage.py detection_worker)
+DETECTION_JOBS_CONFIG = {
+    'poll_interval_seconds': 0.5,  # Espera del worker cuando no hay trabajos
+    'max_wait_seconds': 30,  # Espera máxima de GET ...?wait=N
+    'job_timeout_seconds': 120,  # Trabajo 'procesando' sin terminar se reencola (worker caído)
+    'max_attempts': 3,  # Intentos antes de marcarlo como fallido
+    'max_image_mb': 10,
+}
+
+# Cambio de versión del modelo en caliente (VersionModelo, manage.py activar_modelo)
+MODEL_VERSION_CONFIG = {
+    # Consultar la versión activa en la base de datos y cambiarla sin reiniciar
+    'watch': os.getenv('WATCH_MODEL_VERSION', 'True').lower() in ('1', 'true', 'yes'),
+    'poll_interval_seconds': 5,
+    'drain_timeout_seconds': 30,  # Espera máxima a las inferencias en curso del modelo anterior
+    'warmup_images': os.getenv('MODEL_WARMUP_IMAGES'),  # Directorio de imágenes de calentamiento
+    'warmup_count': 3,  # Inferencias de calentamiento (imágenes sintéticas si no hay directorio)
+}
+
+# Control de admisión de las vistas de detección (por proceso)
+DETECTION_ADMISSION_CONFIG = {
+    'max_concurrent': int(os.getenv('DETECTION_MAX_CONCURRENT', '4')),  # Detecciones simultáneas
+    'max_queue': int(os.getenv('DETECTION_MAX_QUEUE', '8')),  # Peticiones esperando turno
+    'max_queue_wait_seconds': 2.0,  # Espera máxima en cola antes de responder 503
+    'min_retry_after_seconds': 1,
+    'service_time_alpha': 0.2,  # Suavizado del tiempo de servicio medido
+}
+
+# Servidor con precarga del modelo antes del fork (gunicorn -c gunicorn.conf.py)
+PREFORK_CONFIG = {
+    # Hilos de PyTorch/OpenCV por worker (None = núcleos / workers, mínimo 1)
+    'threads_per_worker': int(os.getenv('THREADS_PER_WORKER', '0')) or None,
 }
 
 # Patrones de placas por región/país (ajustar según necesidad)
-PLATE_PATTERNS = [
-    r'^[A-Z]{3}[0-9]{3}$',     # ABC123 (Colombia viejo)
-    r'^[A-Z]{3}[0-9]{2}[A-Z]$', # ABC12D (Colombia nuevo)
-    r'^[A-Z]{3}[0-9]{4}$',     # ABC1234 (Genérico)
-    r'^[A-Z]{2}[0-9]{4}$',     # AB1234 (Genérico)
-    r'^[0-9]{3}[A-Z]{3}$',     # 123ABC (Genérico)
+# Para soportar un país nuevo basta con añadir su región aquí
+PLATE_REGIONS = {
+    'colombia': [
+        r'^[A-Z]{3}[0-9]{3}$',     # ABC123 (Colombia viejo)
+        r'^[A-Z]{3}[0-9]{2}[A-Z]$', # ABC12D (Colombia nuevo)
+    ],
+    'generico': [
+        r'^[A-Z]{3}[0-9]{4}$',     # ABC1234 (Genérico)
+        r'^[A-Z]{2}[0-9]{4}$',     # AB1234 (Genérico)
+        r'^[0-9]{3}[A-Z]{3}$',     # 123ABC (Genérico)
+    ],
+}
+
+# Lista plana de todos los patrones
+PLATE_PATTERNS = [pattern for patterns in PLATE_REGIONS.values() for pattern in patterns]
+
+# Pares de caracteres que el OCR confunde con frecuencia
+PLATE_CONFUSIONS = [
+    ('O', '0'),
+    ('I', '1'),
+    ('B', '8'),
+    ('S', '5'),
+    ('Z', '2'),
+    ('G', '6'),
 ]
 
 # Configuración de OCR
 OCR_CONFIG = {
+    # 'tesseract' (pool OCR, con respaldo en NumPy) o 'numpy' (reconocedor en proceso)
+    'engine': 'tesseract',
+    'camera_engine': 'numpy',  # Motor para frames de cámara en vivo
     'tesseract_config': '--oem 3 --psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
     'enable_preprocessing': True,
     'gaussian_blur_kernel': (5, 5),
+    # Pool de procesos OCR persistentes (tesserocr si está instalado, si no pytesseract)
+    'use_worker_pool': True,
+    'pool_size': None,  # None = un worker por núcleo
+    'worker_timeout_seconds': 2.0,  # Tiempo máximo por recorte antes de reiniciar el worker
 }
 
 # Configuración de almacenamiento
@@ -91,10 +211,33 @@ SECURITY_CONFIG = {
     'require_photo_for_manual_entry': True,
 }
 
+# Listado de registros de acceso (paginación por cursor sobre (timestamp, id))
+ACCESS_LOG_CONFIG = {
+    'page_size': 50,
+    'max_page_size': 500,  # Tope del parámetro limit
+}
+
+# Sincronización de eventos de acceso registrados sin conexión por las puertas
+OFFLINE_SYNC_CONFIG = {
+    'max_events': 500,  # Eventos por petición
+    'max_clock_skew_seconds': 300,  # Tolerancia para timestamps en el futuro
+    'max_event_age_days': 30,  # Eventos más antiguos se rechazan
+}
+
 # Configuración de performance
 PERFORMANCE_CONFIG = {
     'enable_gpu_acceleration': True,  # Usar GPU si está disponible
     'batch_processing_size': 4,  # Tamaño de lote para procesamiento
+    'enable_micro_batching': True,  # Agrupar peticiones concurrentes en un solo lote
+    'batch_max_wait_ms': 10,  # Espera máxima para completar un lote
+    'inference_timeout_seconds': 30,  # Espera máxima por el resultado de un lote (peticiones sin plazo)
+    'max_batch_images': 16,  # Máximo de imágenes por petición de detección por lotes
     'cache_detection_results': True,
     'cache_duration_minutes': 30,
+    'cache_max_memory_mb': 64,  # Memoria máxima de la caché de detecciones (LRU)
+    # Plazo de respuesta por petición (deadline_ms): límites aceptados y suavizado
+    # de la duración estimada de cada etapa
+    'min_deadline_ms': 10,
+    'max_deadline_ms': 30000,
+    'stage_estimate_alpha': 0.2,
 }
\ No newline at end of file
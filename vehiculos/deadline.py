@@ -0,0 +1,103 @@
+"""
+Plazos de respuesta para el pipeline de detección
+
+Quien llama a la detección puede fijar un plazo (p. ej. el vigilante en la
+barrera necesita respuesta en unos cientos de ms). Cada etapa consulta el
+tiempo restante y la duración estimada de la etapa, y se omite si no alcanza:
+el resultado indica qué etapas terminaron para que la interfaz pase a la
+digitación manual sin esperar.
+"""
+
+import threading
+import time
+
+from .config import PERFORMANCE_CONFIG
+
+# Estado de cada etapa en el campo 'stages' del resultado
+STAGE_COMPLETED = 'completed'
+STAGE_PARTIAL = 'partial'
+STAGE_SKIPPED = 'skipped'
+
+
+class Deadline:
+    """
+    Instante límite, en reloj monotónico, para terminar una detección
+    """
+
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after_ms(cls, budget_ms):
+        return cls(time.monotonic() + budget_ms / 1000.0)
+
+    def remaining(self):
+        """Segundos restantes (negativo si ya venció)"""
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, estimate_seconds):
+        """
+        Si una etapa con la duración estimada termina antes del plazo
+
+        Sin estimación (etapa aún no medida) solo se exige que quede tiempo.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            return False
+        return estimate_seconds is None or estimate_seconds <= remaining
+
+
+def parse_deadline_ms(value):
+    """
+    Convierte el parámetro deadline_ms de una petición en un Deadline
+
+    Args:
+        value: Milisegundos desde ahora (str o número); vacío o None = sin plazo
+
+    Returns:
+        Deadline | None
+
+    Raises:
+        ValueError: Si no es un número o está fuera de los límites configurados
+    """
+    if value in (None, ''):
+        return None
+    try:
+        budget_ms = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('deadline_ms debe ser un número de milisegundos')
+
+    minimum = PERFORMANCE_CONFIG['min_deadline_ms']
+    maximum = PERFORMANCE_CONFIG['max_deadline_ms']
+    if not minimum <= budget_ms <= maximum:
+        raise ValueError(f'deadline_ms debe estar entre {minimum} y {maximum}')
+    return Deadline.after_ms(budget_ms)
+
+
+class StageTimer:
+    """
+    Duración estimada de cada etapa (media móvil exponencial)
+    """
+
+    def __init__(self, alpha=None):
+        self.alpha = PERFORMANCE_CONFIG['stage_estimate_alpha'] if alpha is None else alpha
+        self._estimates = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, stage):
+        """Segundos estimados de la etapa (None si aún no se ha medido)"""
+        return self._estimates.get(stage)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            previous = self._estimates.get(stage)
+            if previous is None:
+                self._estimates[stage] = seconds
+            else:
+                self._estimates[stage] = previous + self.alpha * (seconds - previous)
+
+    def stats(self):
+        return {stage: round(seconds * 1000, 3) for stage, seconds in list(self._estimates.items())}
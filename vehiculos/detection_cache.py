@@ -0,0 +1,171 @@
+"""
+Caché de resultados de detección indexada por el contenido de la imagen
+
+La clave es un hash de los píxeles decodificados, de modo que la misma foto
+reenviada (por el vigilante o por reintentos del frontend) no vuelve a pasar
+por el modelo. Expulsa por LRU al superar el límite de memoria y descarta las
+entradas más antiguas que el TTL.
+"""
+
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from .config import PERFORMANCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Costo aproximado de un resultado sin imagen anotada (dict, listas y tuplas)
+_BASE_ENTRY_BYTES = 512
+_PER_PLATE_BYTES = 256
+
+
+def _estimate_size(result):
+    size = _BASE_ENTRY_BYTES + _PER_PLATE_BYTES * len(result.get('plates_detected', []))
+    processed_image = result.get('processed_image')
+    if isinstance(processed_image, np.ndarray):
+        size += processed_image.nbytes
+    return size
+
+
+def copy_result(result):
+    # Dicts y listas se duplican a cualquier profundidad (p. ej. 'stages') para que el
+    # llamador pueda modificarlos; la imagen anotada es de solo lectura y se comparte
+    if isinstance(result, dict):
+        return {key: copy_result(value) for key, value in result.items()}
+    if isinstance(result, list):
+        return [copy_result(value) for value in result]
+    return result
+
+
+class DetectionCache:
+    """
+    Caché LRU con TTL y límite de memoria, segura entre hilos
+    """
+
+    def __init__(self, max_memory_bytes, ttl_seconds):
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for_image(image, **variant):
+        """
+        Clave de caché a partir de los píxeles de la imagen
+
+        Args:
+            image: Array numpy decodificado
+            **variant: Parámetros que cambian el resultado (modelo, motor OCR...)
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{image.shape}|{image.dtype}|{sorted(variant.items())}'.encode())
+        digest.update(memoryview(np.ascontiguousarray(image)).cast('B'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Devuelve una copia del resultado en caché o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, size, result = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._memory_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy_result(result)
+
+    def put(self, key, result):
+        """Guarda un resultado (los resultados con error no se guardan)"""
+        if result.get('error'):
+            return
+
+        size = _estimate_size(result)
+        if size > self.max_memory_bytes:
+            return
+
+        result = copy_result(result)
+        processed_image = result.get('processed_image')
+        if isinstance(processed_image, np.ndarray):
+            # Copia propia de la caché, compartida entre todos los aciertos: no debe
+            # modificarse (la del llamador sigue siendo escribible)
+            processed_image = processed_image.copy()
+            processed_image.flags.writeable = False
+            result['processed_image'] = processed_image
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous[1]
+
+            self._entries[key] = (time.monotonic(), size, result)
+            self._memory_bytes += size
+
+            while self._memory_bytes > self.max_memory_bytes and self._entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_detection_cache():
+    """
+    Caché de detecciones del proceso (None si está deshabilitada en PERFORMANCE_CONFIG)
+    """
+    global _cache
+    if not PERFORMANCE_CONFIG['cache_detection_results']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DetectionCache(
+                    max_memory_bytes=int(PERFORMANCE_CONFIG['cache_max_memory_mb'] * 1024 * 1024),
+                    ttl_seconds=PERFORMANCE_CONFIG['cache_duration_minutes'] * 60,
+                )
+    return _cache
+
+
+def detection_cache_stats():
+    """Contadores de la caché de detecciones (None si no se ha creado)"""
+    return _cache.stats() if _cache is not None else None
@@ -0,0 +1,164 @@
+"""
+Cola de trabajos de detección respaldada por la base de datos
+
+La petición HTTP solo guarda la imagen y responde con el id del trabajo; los
+workers (python manage.py detection_worker), en uno o varios nodos, reclaman
+los pendientes y escriben el resultado. El reclamo usa SELECT ... FOR UPDATE
+SKIP LOCKED donde el motor lo soporta y, en todos los casos, un UPDATE
+condicionado al estado 'pendiente', así dos workers nunca procesan el mismo
+trabajo.
+"""
+
+import os
+import socket
+import logging
+from datetime import timedelta
+from io import BytesIO
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .config import DETECTION_JOBS_CONFIG
+from .models import TrabajoDeteccion
+
+logger = logging.getLogger(__name__)
+
+# Campos del resultado de detect_plate que se guardan en el trabajo
+RESULT_FIELDS = ('plates_detected', 'confidence_scores', 'bounding_boxes', 'model_version')
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue_detection_job(usuario, image_file):
+    """
+    Encola una imagen subida para detección
+
+    Returns:
+        TrabajoDeteccion: Trabajo en estado pendiente
+    """
+    image_file.seek(0)
+    return TrabajoDeteccion.objects.create(
+        usuario=usuario,
+        imagen=image_file.read(),
+        nombre_imagen=getattr(image_file, 'name', '') or '',
+    )
+
+
+def _claim_first(pks, worker):
+    for pk in pks:
+        # Solo uno de los workers que compiten por la fila logra este UPDATE
+        claimed = TrabajoDeteccion.objects.filter(
+            pk=pk, estado=TrabajoDeteccion.PENDIENTE
+        ).update(
+            estado=TrabajoDeteccion.PROCESANDO,
+            worker=worker,
+            fecha_inicio=timezone.now(),
+            intentos=F('intentos') + 1,
+        )
+        if claimed:
+            return TrabajoDeteccion.objects.get(pk=pk)
+    return None
+
+
+def claim_detection_job(worker=None, candidates=10):
+    """
+    Reclama el trabajo pendiente más antiguo
+
+    Args:
+        worker: Identificador del worker (por defecto host:pid)
+        candidates: Pendientes a considerar por intento (los bloqueados por otros se saltan)
+
+    Returns:
+        TrabajoDeteccion | None
+    """
+    worker = worker or worker_id()
+    pending = TrabajoDeteccion.objects.filter(
+        estado=TrabajoDeteccion.PENDIENTE
+    ).order_by('fecha_creacion').values_list('pk', flat=True)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(pending.select_for_update(skip_locked=True)[:candidates])
+            return _claim_first(pks, worker)
+
+    # SQLite no tiene bloqueo de filas: una transacción de lectura que luego
+    # escribe fallaría con "database is locked", así que cada UPDATE va en
+    # autocommit y el filtro por estado hace de guarda
+    return _claim_first(list(pending[:candidates]), worker)
+
+
+def requeue_stale_jobs(timeout_seconds=None, max_attempts=None):
+    """
+    Devuelve a la cola los trabajos de workers caídos (o los marca fallidos)
+
+    Returns:
+        tuple: (reencolados, fallidos)
+    """
+    timeout_seconds = timeout_seconds or DETECTION_JOBS_CONFIG['job_timeout_seconds']
+    max_attempts = max_attempts or DETECTION_JOBS_CONFIG['max_attempts']
+    stale = TrabajoDeteccion.objects.filter(
+        estado=TrabajoDeteccion.PROCESANDO,
+        fecha_inicio__lt=timezone.now() - timedelta(seconds=timeout_seconds),
+    )
+    failed = stale.filter(intentos__gte=max_attempts).update(
+        estado=TrabajoDeteccion.FALLIDO,
+        error='El trabajo superó el tiempo máximo de procesamiento',
+        fecha_fin=timezone.now(),
+        imagen=b'',
+    )
+    requeued = stale.filter(intentos__lt=max_attempts).update(
+        estado=TrabajoDeteccion.PENDIENTE, worker='', fecha_inicio=None,
+    )
+    return requeued, failed
+
+
+def process_detection_job(job):
+    """
+    Ejecuta la detección de un trabajo reclamado y guarda el resultado
+    """
+    from .plate_detection import detect_plate_from_upload
+
+    try:
+        result = detect_plate_from_upload(BytesIO(bytes(job.imagen)))
+    except Exception as e:
+        result = {'error': str(e)}
+
+    # Terminado con o sin error, la imagen ya no hace falta: la tabla de la cola no crece con cada trabajo
+    updates = {'fecha_fin': timezone.now(), 'imagen': b''}
+    if result.get('error'):
+        updates.update(estado=TrabajoDeteccion.FALLIDO, error=result['error'])
+    else:
+        updates.update(
+            estado=TrabajoDeteccion.COMPLETADO,
+            resultado={field: result.get(field, []) for field in RESULT_FIELDS},
+        )
+
+    # Solo si el trabajo sigue siendo de este worker (no fue reencolado por timeout)
+    saved = TrabajoDeteccion.objects.filter(
+        pk=job.pk, estado=TrabajoDeteccion.PROCESANDO, worker=job.worker
+    ).update(**updates)
+    if not saved:
+        logger.warning(f"Trabajo {job.pk} reasignado mientras se procesaba, se descarta el resultado")
+    for field, value in updates.items():
+        setattr(job, field, value)
+    return job
+
+
+def job_payload(job):
+    """Representación del trabajo para la API"""
+    payload = {
+        'id': str(job.id),
+        'estado': job.estado,
+        'intentos': job.intentos,
+        'fecha_creacion': job.fecha_creacion.isoformat() if job.fecha_creacion else None,
+        'fecha_inicio': job.fecha_inicio.isoformat() if job.fecha_inicio else None,
+        'fecha_fin': job.fecha_fin.isoformat() if job.fecha_fin else None,
+    }
+    if job.estado == TrabajoDeteccion.COMPLETADO:
+        payload.update(job.resultado or {})
+    elif job.estado == TrabajoDeteccion.FALLIDO:
+        payload['error'] = job.error
+    return payload
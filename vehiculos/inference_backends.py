@@ -0,0 +1,298 @@
+"""
+Backends de inferencia para el detector de placas
+
+Todos los backends reciben imágenes BGR y devuelven, por imagen, un array
+(N, 6) con [x1, y1, x2, y2, confianza, clase] en coordenadas de la imagen
+original, de modo que el resto del servicio no depende de ultralytics.
+
+- 'torch': modelo de ultralytics (PyTorch), en GPU si está habilitada y disponible
+- 'onnx': exportación ONNX del mismo modelo ejecutada con ONNX Runtime
+"""
+
+import os
+import logging
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .config import PLATE_DETECTION_CONFIG, PERFORMANCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Color de relleno que usa ultralytics al hacer letterbox
+LETTERBOX_COLOR = (114, 114, 114)
+
+
+def _empty_detections():
+    return np.zeros((0, 6), dtype=np.float32)
+
+
+def onnx_path_for(model_path, int8=False):
+    """
+    Ruta del modelo ONNX exportado a partir de los pesos de PyTorch
+
+    Args:
+        model_path: Pesos .pt (o directamente un .onnx)
+        int8: Ruta de la variante cuantizada
+    """
+    path = Path(model_path)
+    if path.suffix == '.onnx' and not int8:
+        return str(path)
+    stem = path.stem[:-len('_int8')] if path.stem.endswith('_int8') else path.stem
+    return str(path.with_name(f"{stem}{'_int8' if int8 else ''}.onnx"))
+
+
+def letterbox(image, size):
+    """
+    Redimensiona conservando la proporción y rellena hasta size x size
+
+    Returns:
+        tuple: (imagen, escala, (relleno_x, relleno_y))
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+    pad_x = (size - new_width) / 2
+    pad_y = (size - new_height) / 2
+
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return image, scale, (left, top)
+
+
+class InferenceBackend:
+    """
+    Interfaz común de los backends
+
+    Las subclases implementan load() y predict(); __call__ acepta una imagen
+    o una lista, igual que el modelo de ultralytics.
+    """
+
+    name = None
+    # Si el backend admite llamadas concurrentes sin serializarlas
+    thread_safe = False
+    # Si el modelo cargado en el proceso maestro sigue siendo usable en los
+    # procesos hijos tras un fork (servidor con precarga, ver vehiculos.prefork)
+    fork_safe = False
+
+    def __init__(self, model_path, image_size=None, max_detections=None, use_gpu=None):
+        self.model_path = model_path
+        self.image_size = image_size or PLATE_DETECTION_CONFIG['image_size']
+        self.max_detections = max_detections or PLATE_DETECTION_CONFIG['max_detections']
+        self.use_gpu = PERFORMANCE_CONFIG['enable_gpu_acceleration'] if use_gpu is None else use_gpu
+        self.device = 'cpu'
+
+    def load(self):
+        raise NotImplementedError
+
+    def predict(self, images, conf):
+        """
+        Args:
+            images: Lista de imágenes BGR
+            conf: Confianza mínima
+
+        Returns:
+            list: Un array (N, 6) [x1, y1, x2, y2, confianza, clase] por imagen
+        """
+        raise NotImplementedError
+
+    def weights_bytes(self):
+        return None
+
+    def prepare_for_fork(self):
+        """Deja el modelo listo para compartirse por copy-on-write con los hijos"""
+
+    def __call__(self, source, conf=None, **kwargs):
+        images = source if isinstance(source, (list, tuple)) else [source]
+        if conf is None:
+            conf = PLATE_DETECTION_CONFIG['confidence_threshold']
+        return self.predict(list(images), conf)
+
+
+class TorchBackend(InferenceBackend):
+    """
+    Modelo de ultralytics ejecutado con PyTorch
+    """
+
+    name = 'torch'
+    fork_safe = True
+
+    def load(self):
+        from ultralytics import YOLO
+
+        self.model = YOLO(self.model_path)
+        if self.use_gpu:
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    self.device = 'cuda:0'
+            except ImportError:
+                pass
+        return self
+
+    def predict(self, images, conf):
+        results = self.model(
+            images,
+            conf=conf,
+            imgsz=self.image_size,
+            max_det=self.max_detections,
+            device=self.device,
+            verbose=False,
+        )
+        detections = []
+        for result in results:
+            if result.boxes is None:
+                detections.append(_empty_detections())
+            else:
+                detections.append(result.boxes.data.cpu().numpy().astype(np.float32))
+        return detections
+
+    def prepare_for_fork(self):
+        """
+        Fusiona capas, pasa a modo evaluación y descarta gradientes
+
+        ultralytics fusiona conv+bn en la primera predicción: hacerlo antes del
+        fork evita que cada worker cree su propia copia de los pesos fusionados.
+        No se ejecuta ninguna inferencia aquí para no iniciar los pools de
+        hilos de PyTorch en el proceso maestro.
+        """
+        module = getattr(self.model, 'model', self.model)
+        if hasattr(module, 'fuse') and not getattr(module, 'is_fused', lambda: False)():
+            module.fuse(verbose=False)
+        module.eval()
+        for parameter in module.parameters():
+            parameter.requires_grad_(False)
+            parameter.grad = None
+
+    def weights_bytes(self):
+        try:
+            module = getattr(self.model, 'model', self.model)
+            total = sum(p.numel() * p.element_size() for p in module.parameters())
+            total += sum(b.numel() * b.element_size() for b in module.buffers())
+            return int(total)
+        except Exception:
+            return None
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """
+    Exportación ONNX del modelo ejecutada con ONNX Runtime
+
+    Hace el mismo letterbox que ultralytics, decodifica la salida de YOLO
+    (1, 4 + clases, anclas) y aplica NMS por clase con OpenCV.
+    """
+
+    name = 'onnx'
+    thread_safe = True
+
+    def __init__(self, model_path, iou_threshold=None, threads=None, **kwargs):
+        super().__init__(model_path, **kwargs)
+        self.iou_threshold = PLATE_DETECTION_CONFIG['nms_iou_threshold'] if iou_threshold is None else iou_threshold
+        self.threads = PLATE_DETECTION_CONFIG['onnx_threads'] if threads is None else threads
+
+    def load(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+
+        providers = ['CPUExecutionProvider']
+        if self.use_gpu and 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+            self.device = 'cuda:0'
+
+        self.session = ort.InferenceSession(self.model_path, sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Exportaciones sin eje de lote dinámico solo aceptan una imagen por llamada
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        if isinstance(model_input.shape[2], int):
+            self.image_size = model_input.shape[2]
+        return self
+
+    def _prepare(self, images):
+        batch = np.empty((len(images), 3, self.image_size, self.image_size), dtype=np.float32)
+        transforms = []
+        for index, image in enumerate(images):
+            if image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            padded, scale, padding = letterbox(image, self.image_size)
+            # BGR HWC uint8 -> RGB CHW float en [0, 1], escribiendo directo en el lote
+            np.multiply(padded[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=batch[index], casting='unsafe')
+            transforms.append((scale, padding, image.shape[:2]))
+        return batch, transforms
+
+    def _decode(self, output, conf, transform):
+        scale, (pad_x, pad_y), (height, width) = transform
+        predictions = output.T  # (anclas, 4 + clases)
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        keep = confidences >= conf
+        if not keep.any():
+            return _empty_detections()
+        predictions, class_ids, confidences = predictions[keep], class_ids[keep], confidences[keep]
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        boxes -= np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)
+        boxes /= scale
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+
+        xywh = np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]])
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), confidences.tolist(), class_ids.tolist(), conf, self.iou_threshold
+        )
+        indices = np.asarray(indices, dtype=int).reshape(-1)[:self.max_detections]
+        if len(indices) == 0:
+            return _empty_detections()
+        return np.column_stack([
+            boxes[indices], confidences[indices], class_ids[indices]
+        ]).astype(np.float32)
+
+    def predict(self, images, conf):
+        batch, transforms = self._prepare(images)
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: batch[index:index + 1]})[0]
+                for index in range(len(images))
+            ])
+        return [self._decode(output, conf, transform) for output, transform in zip(outputs, transforms)]
+
+    def weights_bytes(self):
+        try:
+            return os.path.getsize(self.model_path)
+        except OSError:
+            return None
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
+
+
+def create_backend(name, model_path, **kwargs):
+    """
+    Crea y carga el backend indicado
+
+    Args:
+        name: 'torch' u 'onnx'
+        model_path: Pesos de PyTorch; con 'onnx' se usa su exportación .onnx
+            (PLATE_DETECTION_CONFIG['onnx_model_path'] si está definida)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+    if name == OnnxRuntimeBackend.name:
+        model_path = PLATE_DETECTION_CONFIG['onnx_model_path'] or onnx_path_for(model_path)
+    return BACKENDS[name](model_path, **kwargs).load()
@@ -0,0 +1,260 @@
+"""
+Planificador de inferencia con micro-batching dinámico
+
+Agrupa las peticiones de detección concurrentes en un solo lote para que el
+modelo haga una pasada por lote en lugar de N pasadas individuales.
+"""
+
+import os
+import bisect
+import queue
+import threading
+import time
+import weakref
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Planificadores vivos del proceso (para exponer métricas)
+_schedulers = weakref.WeakSet()
+
+QUEUE_WAIT_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 250, 500, 1000]
+
+
+class Histogram:
+    """
+    Histograma acumulado con límites superiores fijos (el último cubo es +inf)
+    """
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {str(bound): count for bound, count in zip(self.bounds, self.counts)}
+            buckets['+inf'] = self.counts[-1]
+            return {
+                'buckets': buckets,
+                'count': self.total,
+                'mean': round(self.sum / self.total, 3) if self.total else None,
+            }
+
+
+class _InferenceRequest:
+    __slots__ = ('image', 'future', 'enqueued_at', 'deadline')
+
+    def __init__(self, image, deadline=None):
+        self.image = image
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.deadline = deadline
+
+
+class InferenceScheduler:
+    """
+    Cola de inferencia que ejecuta el modelo en lotes
+
+    Un hilo de fondo toma la primera petición de la cola y espera hasta
+    ``max_wait_ms`` (o hasta llenar ``max_batch_size``) antes de lanzar una
+    única llamada al modelo con todas las imágenes acumuladas.
+
+    ``inference_timeout`` (segundos) acota, junto con ``max_wait_ms``, la
+    espera de ``infer()`` sin plazo: un hilo atascado no bloquea la petición
+    para siempre.
+    """
+
+    def __init__(self, model, max_batch_size=4, max_wait_ms=10, inference_timeout=30.0, **predict_kwargs):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.inference_timeout = inference_timeout
+        self.predict_kwargs = predict_kwargs
+
+        self.batch_size_histogram = Histogram(range(1, self.max_batch_size + 1))
+        self.queue_wait_histogram = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self.batches_run = 0
+        self.failed_batches = 0
+        self.expired_requests = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        # Encolar y cerrar no se cruzan: nada entra en la cola detrás del fin del hilo
+        self._close_lock = threading.Lock()
+        _schedulers.add(self)
+
+    def _ensure_worker(self):
+        # El hilo no sobrevive a un fork, así que se relanza en el proceso hijo
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._worker_loop, name='inference-scheduler', daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, image, deadline=None):
+        """
+        Encola una imagen para inferencia
+
+        Args:
+            image: Imagen BGR
+            deadline: Plazo de la petición (vehiculos.deadline.Deadline); si vence
+                antes de entrar en un lote, la imagen no llega al modelo
+
+        Returns:
+            Future: Se resuelve con el resultado del modelo para esa imagen
+        """
+        request = _InferenceRequest(image, deadline)
+        with self._close_lock:
+            if not self._closed:
+                self._ensure_worker()
+                self._queue.put(request)
+                return request.future
+
+        # Planificador cerrado (versión retirada): se ejecuta el modelo directamente
+        request.future.set_running_or_notify_cancel()
+        try:
+            request.future.set_result(list(self.model([image], **self.predict_kwargs))[0])
+        except Exception as e:
+            request.future.set_exception(e)
+        return request.future
+
+    def infer(self, image, timeout=None, deadline=None):
+        """
+        Encola una imagen y espera su resultado
+
+        Args:
+            timeout: Espera máxima en segundos (por defecto max_wait_ms + inference_timeout)
+            deadline: Plazo de la petición; si se indica, manda sobre timeout
+
+        Raises:
+            TimeoutError: Si el plazo vence antes de tener el resultado
+        """
+        future = self.submit(image, deadline)
+        if deadline is not None:
+            timeout = max(0.0, deadline.remaining())
+        elif timeout is None:
+            timeout = self.max_wait + self.inference_timeout
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # Si aún está en cola no ocupará sitio en el lote
+            future.cancel()
+            raise
+
+    def close(self):
+        """
+        Detiene el hilo del planificador (p. ej. al retirar una versión del modelo)
+
+        Llamar cuando ya no quedan peticiones en curso; las que estén en la cola
+        se procesan antes de terminar.
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        _schedulers.discard(self)
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # close(): se procesa el lote y el hilo termina en la siguiente vuelta
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _drop_stale(self, batch):
+        # Descarta las peticiones canceladas por quien esperaba o con el plazo
+        # vencido; las demás pasan a 'running' y ya no se pueden cancelar
+        live = []
+        for request in batch:
+            if not request.future.set_running_or_notify_cancel():
+                self.expired_requests += 1
+            elif request.deadline is not None and request.deadline.expired():
+                request.future.set_exception(TimeoutError('Plazo vencido antes de la inferencia'))
+                self.expired_requests += 1
+            else:
+                live.append(request)
+        return live
+
+    def _worker_loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            batch = self._drop_stale(batch)
+            if not batch:
+                continue
+            started = time.perf_counter()
+            for request in batch:
+                self.queue_wait_histogram.observe((started - request.enqueued_at) * 1000)
+            self.batch_size_histogram.observe(len(batch))
+
+            try:
+                results = self.model([request.image for request in batch], **self.predict_kwargs)
+                results = list(results)
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"El modelo devolvió {len(results)} resultados para un lote de {len(batch)}"
+                    )
+                self.batches_run += 1
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+            except Exception as e:
+                self.failed_batches += 1
+                logger.error(f"Error en inferencia por lotes: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': round(self.max_wait * 1000, 3),
+            'queue_depth': self._queue.qsize(),
+            'batches_run': self.batches_run,
+            'failed_batches': self.failed_batches,
+            'expired_requests': self.expired_requests,
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'queue_wait_ms': self.queue_wait_histogram.snapshot(),
+        }
+
+
+def scheduler_stats():
+    """Métricas de todos los planificadores vivos del proceso"""
+    return [scheduler.stats() for scheduler in list(_schedulers)]
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.config import MODEL_VERSION_CONFIG, PLATE_DETECTION_CONFIG
+from vehiculos.models import VersionModelo
+
+
+class Command(BaseCommand):
+    help = 'Registra y activa una versión del modelo de placas; los procesos la cambian en caliente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombre', nargs='?', help='Nombre de la versión a activar')
+        parser.add_argument('--model', help='Ruta de los pesos (crea la versión si no existe)')
+        parser.add_argument('--backend', choices=['torch', 'onnx'], help='Backend de inferencia de la versión')
+        parser.add_argument('--descripcion', default='')
+        parser.add_argument('--no-verify', action='store_true',
+                            help='No cargar ni calentar el modelo aquí antes de activarlo')
+        parser.add_argument('--list', action='store_true', help='Listar las versiones registradas')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for version in VersionModelo.objects.all():
+                self.stdout.write(
+                    f"{'*' if version.activa else ' '} {version.nombre:<24} {version.backend:<6} {version.ruta_modelo}"
+                )
+            return
+
+        if not options['nombre']:
+            raise CommandError('Indica el nombre de la versión (o --list)')
+
+        version = VersionModelo.objects.filter(nombre=options['nombre']).first()
+        if version is None:
+            if not options['model']:
+                raise CommandError(f"La versión '{options['nombre']}' no existe; indica --model para crearla")
+            version = VersionModelo(
+                nombre=options['nombre'],
+                ruta_modelo=options['model'],
+                backend=options['backend'] or PLATE_DETECTION_CONFIG['backend'],
+                descripcion=options['descripcion'],
+            )
+        else:
+            if options['model']:
+                version.ruta_modelo = options['model']
+            if options['backend']:
+                version.backend = options['backend']
+
+        if not options['no_verify']:
+            # Un modelo que no carga aquí tampoco cargará en los workers
+            from vehiculos.model_versions import verify_model_version
+
+            try:
+                seconds = verify_model_version(version.ruta_modelo, version.backend)
+            except Exception as e:
+                raise CommandError(f"No se pudo cargar '{version.ruta_modelo}' ({version.backend}): {e}")
+            self.stdout.write(f"Modelo verificado (carga y calentamiento en {seconds:.1f} s)")
+
+        version.save()
+        version.activar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Versión '{version.nombre}' activada. Los procesos de detección la cargarán en segundo plano "
+            f"en los próximos {MODEL_VERSION_CONFIG['poll_interval_seconds']} s"
+        ))
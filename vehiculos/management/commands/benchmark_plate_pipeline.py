@@ -0,0 +1,284 @@
+import json
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.char_recognizer import recognize_characters
+from vehiculos.config import OCR_CONFIG, PLATE_DETECTION_CONFIG
+from vehiculos.ocr_pool import get_ocr_pool
+from vehiculos.plate_detection import PlateDetectionService, decode_upload_image
+
+STAGES = ('decode', 'inference', 'crop', 'preprocessing', 'ocr', 'validation', 'annotation')
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+_worker_service = None
+
+
+def _parse_counts(value):
+    return [int(item) for item in str(value).split(',') if item.strip()]
+
+
+def synthetic_corpus(count, width=1280, height=720, seed=0):
+    """
+    Fotos JPEG sintéticas con una placa dibujada en una posición aleatoria
+
+    Returns:
+        list: (nombre, bytes JPEG, caja de la placa)
+    """
+    rng = np.random.default_rng(seed)
+    letters = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+    corpus = []
+    for index in range(count):
+        image = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+        plate_width = int(rng.integers(180, 320))
+        plate_height = plate_width // 3
+        x1 = int(rng.integers(0, width - plate_width))
+        y1 = int(rng.integers(height // 3, height - plate_height))
+        box = (x1, y1, x1 + plate_width, y1 + plate_height)
+
+        text = ''.join(rng.choice(list(letters), 3)) + ''.join(str(d) for d in rng.integers(0, 10, 3))
+        cv2.rectangle(image, box[:2], box[2:], (40, 200, 230), -1)
+        cv2.rectangle(image, box[:2], box[2:], (0, 0, 0), 3)
+        scale = plate_height / 40
+        cv2.putText(image, text, (x1 + plate_width // 12, y1 + int(plate_height * 0.75)),
+                    cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), max(2, int(scale * 2.5)), cv2.LINE_AA)
+
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        corpus.append((f'sintetica_{index:04d}.jpg', encoded.tobytes(), box))
+    return corpus
+
+
+def directory_corpus(directory, limit=None):
+    """Imágenes de un directorio, sin caja de referencia"""
+    paths = sorted(
+        path for path in Path(directory).iterdir()
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    )[:limit]
+    return [(path.name, path.read_bytes(), None) for path in paths]
+
+
+def _raw_ocr(binaries, engine):
+    """OCR sin limpiar: (texto, confianzas) por recorte, separado de la validación"""
+    if engine == 'numpy':
+        return [tuple(recognize_characters(binary)[:2]) for binary in binaries]
+
+    pool = get_ocr_pool()
+    if pool is not None:
+        return [(text, None) for text in pool.recognize_many(binaries)]
+    try:
+        import pytesseract
+        return [
+            (pytesseract.image_to_string(binary, config=OCR_CONFIG['tesseract_config']), None)
+            for binary in binaries
+        ]
+    except ImportError:
+        return [tuple(recognize_characters(binary)[:2]) for binary in binaries]
+
+
+def run_batch(service, items, ocr_engine):
+    """
+    Pasa un lote por todas las etapas del pipeline midiendo cada una
+
+    Returns:
+        dict: Segundos por muestra de cada etapa (inferencia: una muestra por lote)
+    """
+    timings = {stage: [] for stage in STAGES}
+    clock = time.perf_counter
+
+    images = []
+    for name, data, _ in items:
+        upload = InMemoryUploadedFile(BytesIO(data), 'image', name, 'image/jpeg', len(data), None)
+        started = clock()
+        images.append(decode_upload_image(upload))
+        timings['decode'].append(clock() - started)
+
+    started = clock()
+    results = service.model(images, conf=service.confidence_threshold)
+    timings['inference'].append(clock() - started)
+
+    for image, detections, (_, _, truth_box) in zip(images, results, items):
+        started = clock()
+        candidates = service.extract_boxes([detections])
+        if not candidates and truth_box is not None:
+            # Corpus sintético: el modelo genérico no detecta placas, se usa la caja conocida
+            candidates = [(truth_box, 1.0)]
+        crops = [image[y1:y2, x1:x2] for (x1, y1, x2, y2), _ in candidates]
+        timings['crop'].append(clock() - started)
+        if not crops:
+            continue
+
+        started = clock()
+        binaries = [service.preprocess_plate(crop) for crop in crops]
+        timings['preprocessing'].append(clock() - started)
+
+        started = clock()
+        raw = _raw_ocr(binaries, ocr_engine)
+        timings['ocr'].append(clock() - started)
+
+        started = clock()
+        texts = [service.clean_plate_text(text, confidences) for text, confidences in raw]
+        timings['validation'].append(clock() - started)
+
+        started = clock()
+        service.draw_detections(
+            image,
+            [box for box, _ in candidates],
+            [text or '?' for text in texts],
+            [confidence for _, confidence in candidates],
+        )
+        timings['annotation'].append(clock() - started)
+
+    return timings
+
+
+def _init_process(model_path, backend):
+    import django
+    django.setup()
+
+    global _worker_service
+    _worker_service = PlateDetectionService(model_path, backend)
+
+
+def _run_batch_in_process(items, ocr_engine):
+    return run_batch(_worker_service, items, ocr_engine)
+
+
+def summarize(samples, items_per_sample=1):
+    """Percentiles en ms y rendimiento (elementos por segundo de etapa)"""
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    total_seconds = float(np.sum(samples))
+    return {
+        'count': len(samples),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(values.mean()), 3),
+        'throughput_per_s': round(len(samples) * items_per_sample / total_seconds, 2) if total_seconds else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide por etapas (p50/p95/p99 y rendimiento) el pipeline de detección de placas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', help='Directorio de imágenes (por defecto un corpus sintético)')
+        parser.add_argument('--count', type=int, default=32, help='Imágenes del corpus sintético o máximo del directorio')
+        parser.add_argument('--repeat', type=int, default=3, help='Pasadas sobre el corpus por configuración')
+        parser.add_argument('--warmup', type=int, default=2, help='Lotes de calentamiento antes de medir')
+        parser.add_argument('--mode', choices=['threads', 'processes'], default='threads')
+        parser.add_argument('--workers', default='1', help='Hilos o procesos a probar, p. ej. 1,2,4')
+        parser.add_argument('--batch-sizes', default='1', help='Tamaños de lote a probar, p. ej. 1,4,8')
+        parser.add_argument('--backend', default=PLATE_DETECTION_CONFIG['backend'])
+        parser.add_argument('--model', default=PLATE_DETECTION_CONFIG['model_path'])
+        parser.add_argument('--ocr-engine', default=OCR_CONFIG['engine'], choices=['tesseract', 'numpy'])
+        parser.add_argument('--output', help='Archivo JSON de resultados (por defecto se imprime)')
+
+    def handle(self, *args, **options):
+        if options['images']:
+            corpus = directory_corpus(options['images'], options['count'])
+            source = str(Path(options['images']).resolve())
+        else:
+            corpus = synthetic_corpus(options['count'])
+            source = 'sintetico'
+        if not corpus:
+            raise CommandError('El corpus de imágenes está vacío')
+
+        service = PlateDetectionService(options['model'], options['backend'])
+        for _ in range(options['warmup']):
+            run_batch(service, corpus[:1], options['ocr_engine'])
+
+        runs = []
+        for workers in _parse_counts(options['workers']):
+            for batch_size in _parse_counts(options['batch_sizes']):
+                run = self.run_configuration(service, corpus, options, workers, batch_size)
+                runs.append(run)
+                self.report(run)
+
+        report = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'backend': options['backend'],
+                'model': options['model'],
+                'device': service.model.model.device,
+                'ocr_engine': options['ocr_engine'],
+                'confidence_threshold': service.confidence_threshold,
+                'image_size': PLATE_DETECTION_CONFIG['image_size'],
+                'corpus': {'source': source, 'images': len(corpus), 'repeat': options['repeat']},
+                'cpu_count': os.cpu_count(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            },
+            'runs': runs,
+        }
+
+        payload = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            Path(options['output']).write_text(payload, encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+    def run_configuration(self, service, corpus, options, workers, batch_size):
+        items = corpus * options['repeat']
+        batches = [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+
+        if options['mode'] == 'processes':
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_process,
+                initargs=(options['model'], options['backend']),
+            )
+            # Cada proceso carga su modelo: un lote de calentamiento por worker antes de medir
+            list(executor.map(_run_batch_in_process, [corpus[:1]] * workers, [options['ocr_engine']] * workers))
+            submit = lambda batch: executor.submit(_run_batch_in_process, batch, options['ocr_engine'])
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            submit = lambda batch: executor.submit(run_batch, service, batch, options['ocr_engine'])
+
+        started = time.perf_counter()
+        with executor:
+            futures = [submit(batch) for batch in batches]
+            timings = {stage: [] for stage in STAGES}
+            for future in futures:
+                for stage, samples in future.result().items():
+                    timings[stage].extend(samples)
+        wall_seconds = time.perf_counter() - started
+
+        stages = {stage: summarize(samples) for stage, samples in timings.items()}
+        # Una muestra de inferencia cubre un lote completo
+        stages['inference'] = summarize(timings['inference'], items_per_sample=len(items) / len(batches))
+        return {
+            'mode': options['mode'],
+            'workers': workers,
+            'batch_size': batch_size,
+            'images': len(items),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_images_per_s': round(len(items) / wall_seconds, 2),
+            'stages': stages,
+        }
+
+    def report(self, run):
+        self.stderr.write(
+            f"{run['mode']}={run['workers']} lote={run['batch_size']}: "
+            f"{run['throughput_images_per_s']} img/s ({run['images']} imágenes en {run['wall_seconds']} s)"
+        )
+        for stage in STAGES:
+            summary = run['stages'][stage]
+            if summary['count']:
+                self.stderr.write(
+                    f"  {stage:<14} p50 {summary['p50_ms']:>9.2f} ms  p95 {summary['p95_ms']:>9.2f} ms  "
+                    f"p99 {summary['p99_ms']:>9.2f} ms  {summary['throughput_per_s']} /s"
+                )
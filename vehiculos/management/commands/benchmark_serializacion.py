@@ -0,0 +1,152 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from vehiculos.models import PrestamoVehiculo, RegistroAcceso, Vehiculo
+from vehiculos.serializers import (
+    PRESTAMO_RELACIONES,
+    PRESTAMO_VALUES,
+    REGISTRO_ACCESO_RELACIONES,
+    REGISTRO_ACCESO_VALUES,
+    PrestamoVehiculoSerializer,
+    RegistroAccesoSerializer,
+    serialize_prestamos,
+    serialize_registros_acceso,
+)
+
+
+def _parse_sizes(value):
+    return [int(item) for item in str(value).split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = ('Compara filas/s y consultas por página de los listados de accesos y préstamos: '
+            'serializer por fila frente a la consulta values()')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', default='10,100,500', help='Tamaños de página separados por coma')
+        parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por medición (se toma la mejor)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Crear N registros sintéticos (en una transacción que se revierte al final)')
+        parser.add_argument('--json', action='store_true', help='Imprimir el reporte en JSON')
+
+    def handle(self, *args, **options):
+        sizes = _parse_sizes(options['page_sizes'])
+        if not sizes:
+            raise CommandError('Indica al menos un tamaño de página')
+
+        with transaction.atomic():
+            if options['seed']:
+                self._seed(options['seed'], max(sizes))
+            report = {
+                'registros_acceso': self._measure(
+                    RegistroAcceso.objects.order_by('-timestamp', '-id'),
+                    REGISTRO_ACCESO_RELACIONES, REGISTRO_ACCESO_VALUES,
+                    RegistroAccesoSerializer, serialize_registros_acceso, sizes, options['repeat'],
+                ),
+                'prestamos': self._measure(
+                    PrestamoVehiculo.objects.order_by('-fecha_solicitud'),
+                    PRESTAMO_RELACIONES, PRESTAMO_VALUES,
+                    PrestamoVehiculoSerializer, serialize_prestamos, sizes, options['repeat'],
+                ),
+            }
+            # Los datos sintéticos no se quedan en la base
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print(report)
+
+        errors = [error for section in report.values() for error in section['errors']]
+        if errors:
+            raise CommandError('; '.join(errors))
+        self.stdout.write(self.style.SUCCESS('Consultas por página constantes y salida idéntica'))
+
+    def _seed(self, count, loans):
+        user, _ = User.objects.get_or_create(username='benchmark_serializacion')
+        vehicles = Vehiculo.objects.bulk_create([
+            Vehiculo(usuario=user, marca='Marca', modelo='Modelo', placa=f'BSZ{index:04d}', color='Gris')
+            for index in range(50)
+        ])
+        now = timezone.now()
+        PrestamoVehiculo.objects.bulk_create([
+            PrestamoVehiculo(
+                vehiculo=random.choice(vehicles), prestador=user, prestatario=user, estado='activo',
+                fecha_inicio=now - timedelta(days=1), fecha_fin=now + timedelta(days=1),
+            )
+            for _ in range(loans)
+        ])
+        # bulk_create no pasa por save(): la ocupación y los resúmenes no se tocan
+        RegistroAcceso.objects.bulk_create([
+            RegistroAcceso(
+                vehiculo=random.choice(vehicles), usuario_autorizado=user, vigilante=user,
+                tipo_acceso=random.choice(['entrada', 'salida']), placa_detectada='BSZ0000',
+            )
+            for _ in range(count)
+        ], batch_size=2000)
+
+    def _run(self, func, repeat):
+        best, queries, data = None, None, None
+        for _ in range(repeat):
+            # El registro de consultas está acotado; se vacía para que el conteo no se sature
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                data = func()
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            queries = len(captured.captured_queries)
+        return best, queries, data
+
+    def _measure(self, queryset, relations, values, serializer_class, fast_serialize, sizes, repeat):
+        rows = []
+        errors = []
+        for size in sizes:
+            # Antes: serializer de modelo sobre el queryset sin plan de relaciones
+            before_s, before_q, before = self._run(
+                lambda: serializer_class(list(queryset[:size]), many=True).data, repeat
+            )
+            planned_s, planned_q, _ = self._run(
+                lambda: serializer_class(list(queryset.select_related(*relations)[:size]), many=True).data, repeat
+            )
+            fast_s, fast_q, fast = self._run(
+                lambda: fast_serialize(queryset.values(*values)[:size]), repeat
+            )
+            count = len(fast)
+            if json.loads(json.dumps(before, default=str)) != json.loads(json.dumps(fast, default=str)):
+                errors.append(f'{serializer_class.__name__}: la salida rápida difiere con página {size}')
+            rows.append({
+                'page_size': size,
+                'rows': count,
+                'antes': {'queries': before_q, 'rows_per_second': round(count / before_s) if before_s else None},
+                'select_related': {'queries': planned_q, 'rows_per_second': round(count / planned_s) if planned_s else None},
+                'values': {'queries': fast_q, 'rows_per_second': round(count / fast_s) if fast_s else None},
+            })
+
+        fast_queries = {row['values']['queries'] for row in rows}
+        if len(fast_queries) > 1:
+            errors.append(f'{serializer_class.__name__}: las consultas por página varían con el tamaño ({sorted(fast_queries)})')
+        return {'pages': rows, 'errors': errors}
+
+    def _print(self, report):
+        for name, section in report.items():
+            self.stdout.write(name)
+            self.stdout.write(
+                f"{'página':>8}{'filas':>8}{'antes q':>10}{'filas/s':>10}"
+                f"{'s_rel q':>10}{'filas/s':>10}{'values q':>10}{'filas/s':>10}"
+            )
+            for row in section['pages']:
+                self.stdout.write(
+                    f"{row['page_size']:>8}{row['rows']:>8}"
+                    f"{row['antes']['queries']:>10}{row['antes']['rows_per_second'] or '-':>10}"
+                    f"{row['select_related']['queries']:>10}{row['select_related']['rows_per_second'] or '-':>10}"
+                    f"{row['values']['queries']:>10}{row['values']['rows_per_second'] or '-':>10}"
+                )
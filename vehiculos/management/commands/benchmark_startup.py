@@ -0,0 +1,124 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Módulos que no deben cargarse al arrancar: solo los necesita la detección
+VISION_MODULES = ('torch', 'ultralytics', 'onnxruntime', 'cv2', 'numpy', 'pytesseract')
+
+# Se ejecuta en un intérprete nuevo: arranque de Django, URLconf y admin,
+# lo mismo que hace un worker web antes de atender la primera petición
+STARTUP_SCRIPT = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import vehiculos.views, vehiculos.admin
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'django_seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+    'vision_modules': sorted(name for name in %r if name in sys.modules),
+}))
+''' % (VISION_MODULES,)
+
+
+def measure_startup(env=None):
+    """
+    Arranca Django en un proceso nuevo y mide tiempo, memoria y módulos cargados
+
+    Returns:
+        dict: wall_seconds (incluye el intérprete), django_seconds, max_rss_kb,
+            modules y vision_modules
+    """
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+    )
+    wall_seconds = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise CommandError(f'El arranque de Django falló:\n{completed.stderr.strip()}')
+    sample = json.loads(completed.stdout.strip().splitlines()[-1])
+    sample['wall_seconds'] = wall_seconds
+    return sample
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de arranque de Django y falla si se carga la pila de visión o si hay regresión'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Arranques a medir (se reporta la mediana)')
+        parser.add_argument('--max-seconds', type=float, help='Máximo de la mediana del arranque completo')
+        parser.add_argument('--max-rss-mb', type=float, help='Máximo de memoria residente tras el arranque')
+        parser.add_argument('--baseline', help='JSON de una medición anterior con el que comparar')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Regresión permitida respecto al baseline (fracción, 0.25 = 25%%)')
+        parser.add_argument('--save-baseline', help='Guardar el resultado como baseline en este archivo')
+        parser.add_argument('--allow-vision', action='store_true',
+                            help='No fallar si se cargan módulos de visión (p. ej. con PRELOAD_PLATE_MODEL)')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        # La precarga carga el modelo a propósito: se mide el arranque de un worker web
+        if not options['allow_vision']:
+            env['PRELOAD_PLATE_MODEL'] = 'False'
+
+        samples = [measure_startup(env) for _ in range(max(1, options['runs']))]
+        vision_modules = sorted({name for sample in samples for name in sample['vision_modules']})
+        result = {
+            'runs': len(samples),
+            'median_seconds': round(statistics.median(s['wall_seconds'] for s in samples), 4),
+            'median_django_seconds': round(statistics.median(s['django_seconds'] for s in samples), 4),
+            'max_rss_mb': round(max(s['max_rss_kb'] for s in samples) / 1024, 1),
+            'modules': max(s['modules'] for s in samples),
+            'vision_modules': vision_modules,
+            'python': sys.version.split()[0],
+        }
+
+        self.stdout.write(
+            f"Arranque: {result['median_seconds'] * 1000:.0f} ms (Django {result['median_django_seconds'] * 1000:.0f} ms), "
+            f"{result['max_rss_mb']} MB, {result['modules']} módulos"
+        )
+
+        problems = []
+        if vision_modules and not options['allow_vision']:
+            problems.append(f"se cargaron módulos de visión al arrancar: {', '.join(vision_modules)}")
+        if options['max_seconds'] is not None and result['median_seconds'] > options['max_seconds']:
+            problems.append(f"{result['median_seconds']:.3f} s supera el máximo de {options['max_seconds']} s")
+        if options['max_rss_mb'] is not None and result['max_rss_mb'] > options['max_rss_mb']:
+            problems.append(f"{result['max_rss_mb']} MB supera el máximo de {options['max_rss_mb']} MB")
+        if options['baseline']:
+            problems.extend(self.compare(result, options['baseline'], options['tolerance']))
+
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(json.dumps(result, indent=2), encoding='utf-8')
+            self.stdout.write(f"Baseline guardado en {options['save_baseline']}")
+
+        if problems:
+            raise CommandError('Regresión en el arranque: ' + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Arranque dentro de los límites'))
+
+    def compare(self, result, baseline_path, tolerance):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer el baseline {baseline_path}: {e}')
+
+        problems = []
+        for key, unit in (('median_seconds', 's'), ('max_rss_mb', 'MB')):
+            limit = baseline[key] * (1 + tolerance)
+            if result[key] > limit:
+                problems.append(
+                    f"{key} {result[key]} {unit} supera el baseline {baseline[key]} {unit} (+{tolerance:.0%})"
+                )
+        return problems
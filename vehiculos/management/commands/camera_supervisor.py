@@ -0,0 +1,33 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from vehiculos.camera_supervisor import CameraSupervisor
+from vehiculos.config import CAMERA_SUPERVISOR_CONFIG
+
+
+class Command(BaseCommand):
+    help = 'Inicia el supervisor multicámara: un proceso de captura por cámara y un pool de inferencia compartido'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sources', help='Fuentes separadas por coma (por defecto CAMERA_SOURCES)')
+        parser.add_argument('--workers', type=int, default=CAMERA_SUPERVISOR_CONFIG['inference_workers'],
+                            help='Procesos de inferencia')
+        parser.add_argument('--status-file', default=CAMERA_SUPERVISOR_CONFIG['status_file'])
+        parser.add_argument('--duration', type=float, help='Segundos a ejecutar (por defecto hasta Ctrl+C)')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+        sources = [source.strip() for source in (options['sources'] or '').split(',') if source.strip()]
+
+        supervisor = CameraSupervisor(
+            sources=sources or None,
+            inference_workers=options['workers'],
+            status_file=options['status_file'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Supervisor con {len(supervisor.cameras)} cámaras y {supervisor.inference_workers} "
+            f"workers de inferencia (estado en {supervisor.status_file})"
+        ))
+        supervisor.run(duration=options['duration'])
+        self.stdout.write(self.style.SUCCESS('Supervisor detenido'))
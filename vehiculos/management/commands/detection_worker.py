@@ -0,0 +1,66 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from vehiculos.config import DETECTION_JOBS_CONFIG
+from vehiculos.detection_jobs import (
+    claim_detection_job, process_detection_job, requeue_stale_jobs, worker_id,
+)
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de trabajos de detección (se pueden lanzar varios workers, en uno o varios nodos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=DETECTION_JOBS_CONFIG['poll_interval_seconds'],
+                            help='Segundos de espera cuando no hay trabajos')
+        parser.add_argument('--max-jobs', type=int, help='Terminar tras procesar este número de trabajos')
+        parser.add_argument('--once', action='store_true', help='Procesar lo pendiente y terminar')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        # Cargar el modelo antes del primer trabajo
+        from vehiculos.plate_detection import get_plate_detection_service
+        get_plate_detection_service()
+
+        worker = worker_id()
+        self.stdout.write(self.style.SUCCESS(f'Worker de detección {worker} iniciado'))
+
+        processed = 0
+        last_requeue = 0.0
+        while not self.stopping:
+            if time.monotonic() - last_requeue > DETECTION_JOBS_CONFIG['job_timeout_seconds'] / 2:
+                requeued, failed = requeue_stale_jobs()
+                if requeued or failed:
+                    self.stdout.write(self.style.WARNING(
+                        f'{requeued} trabajos reencolados, {failed} marcados como fallidos'
+                    ))
+                last_requeue = time.monotonic()
+
+            close_old_connections()
+            job = claim_detection_job(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            started = time.perf_counter()
+            process_detection_job(job)
+            processed += 1
+            self.stdout.write(
+                f'Trabajo {job.id}: {job.estado} en {(time.perf_counter() - started) * 1000:.0f} ms'
+            )
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} detenido ({processed} trabajos)'))
+
+    def request_stop(self, *args):
+        # Se termina el trabajo en curso antes de salir
+        self.stopping = True
@@ -0,0 +1,217 @@
+import shutil
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.config import PLATE_DETECTION_CONFIG
+from vehiculos.inference_backends import OnnxRuntimeBackend, TorchBackend, onnx_path_for
+from vehiculos.plate_tracker import iou_matrix
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def load_sample_images(samples_dir, limit):
+    """Imágenes BGR de un directorio (las de ejemplo de ultralytics si no se indica)"""
+    if samples_dir is None:
+        from ultralytics.utils import ASSETS
+        samples_dir = ASSETS
+
+    paths = sorted(
+        path for path in Path(samples_dir).iterdir()
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    )[:limit]
+    images = [(path.name, cv2.imread(str(path))) for path in paths]
+    return [(name, image) for name, image in images if image is not None]
+
+
+def compare_detections(reference, candidate, iou_threshold, conf_tolerance):
+    """
+    Empareja detecciones de dos backends (misma clase, IoU y confianza dentro de tolerancia)
+
+    Returns:
+        tuple: (emparejadas, sin_pareja_en_reference, sin_pareja_en_candidate)
+    """
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0, len(reference), len(candidate)
+
+    ious = iou_matrix(reference[:, :4], candidate[:, :4])
+    matched = 0
+    used = set()
+    for i in np.argsort(-reference[:, 4]):
+        for j in np.argsort(-ious[i]):
+            if ious[i, j] < iou_threshold:
+                break
+            if j in used or reference[i, 5] != candidate[j, 5]:
+                continue
+            if abs(reference[i, 4] - candidate[j, 4]) > conf_tolerance:
+                continue
+            used.add(j)
+            matched += 1
+            break
+    return matched, len(reference) - matched, len(candidate) - len(used)
+
+
+class Command(BaseCommand):
+    help = 'Exporta el modelo de detección de placas a ONNX, opcionalmente cuantizado a int8, y lo verifica contra PyTorch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=PLATE_DETECTION_CONFIG['model_path'],
+                            help='Pesos de PyTorch a exportar (por defecto model_path de la configuración)')
+        parser.add_argument('--output', help='Ruta del .onnx (por defecto junto a los pesos)')
+        parser.add_argument('--imgsz', type=int, default=PLATE_DETECTION_CONFIG['image_size'])
+        parser.add_argument('--opset', type=int, default=17)
+        parser.add_argument('--int8', action='store_true',
+                            help='Generar además una variante cuantizada a int8 (<modelo>_int8.onnx)')
+        parser.add_argument('--samples', help='Directorio de imágenes para calibrar y verificar')
+        parser.add_argument('--max-samples', type=int, default=50)
+        parser.add_argument('--iou', type=float, default=0.9,
+                            help='IoU mínimo para considerar iguales dos detecciones')
+        parser.add_argument('--conf-tolerance', type=float, default=0.05,
+                            help='Diferencia máxima de confianza entre detecciones emparejadas')
+        parser.add_argument('--max-mismatch', type=float, default=0.05,
+                            help='Fracción máxima de detecciones sin pareja antes de fallar')
+        # La cuantización mueve cajas y confianzas más que la exportación: tolerancias propias
+        parser.add_argument('--int8-iou', type=float, default=0.8,
+                            help='IoU mínimo para la variante int8')
+        parser.add_argument('--int8-conf-tolerance', type=float, default=0.1,
+                            help='Diferencia máxima de confianza para la variante int8')
+        parser.add_argument('--int8-max-mismatch', type=float, default=0.1,
+                            help='Fracción máxima de detecciones sin pareja para la variante int8')
+        parser.add_argument('--skip-verify', action='store_true')
+
+    def handle(self, *args, **options):
+        model_path = options['model']
+        output = options['output'] or onnx_path_for(model_path)
+
+        exported = self.export(model_path, output, options['imgsz'], options['opset'])
+        int8_output = None
+
+        samples = []
+        if options['int8'] or not options['skip_verify']:
+            samples = load_sample_images(options['samples'], options['max_samples'])
+            self.stdout.write(f'{len(samples)} imágenes de muestra cargadas')
+
+        if options['int8']:
+            int8_output = self.quantize(exported, onnx_path_for(exported, int8=True), samples)
+
+        if options['skip_verify']:
+            return
+        if not samples:
+            raise CommandError('No hay imágenes de muestra para verificar la exportación')
+
+        reference = TorchBackend(model_path, image_size=options['imgsz'], use_gpu=False).load()
+        self.verify(
+            reference, exported, samples, options['imgsz'],
+            options['iou'], options['conf_tolerance'], options['max_mismatch'],
+        )
+        if int8_output is not None:
+            try:
+                self.verify(
+                    reference, int8_output, samples, options['imgsz'],
+                    options['int8_iou'], options['int8_conf_tolerance'], options['int8_max_mismatch'],
+                )
+            except CommandError:
+                # Que no quede a mano un modelo que no pasó la verificación
+                Path(int8_output).unlink(missing_ok=True)
+                self.stdout.write(self.style.WARNING(f'{int8_output} eliminado'))
+                raise
+
+    def export(self, model_path, output, image_size, opset):
+        from ultralytics import YOLO
+
+        started = time.perf_counter()
+        exported = YOLO(model_path).export(
+            format='onnx', imgsz=image_size, dynamic=True, simplify=True, opset=opset
+        )
+        if Path(exported).resolve() != Path(output).resolve():
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(exported, output)
+
+        size_mb = Path(output).stat().st_size / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'Modelo exportado a {output} ({size_mb:.1f} MB, {time.perf_counter() - started:.1f} s)'
+        ))
+        return output
+
+    def quantize(self, model_path, output, samples):
+        from onnxruntime.quantization import (
+            CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static,
+        )
+
+        if not samples:
+            # Sin imágenes de calibración solo se pueden cuantizar los pesos
+            self.stdout.write(self.style.WARNING(
+                'Sin imágenes de calibración: se usa cuantización dinámica (solo pesos)'
+            ))
+            quantize_dynamic(model_path, output, weight_type=QuantType.QUInt8)
+        else:
+            backend = OnnxRuntimeBackend(model_path, use_gpu=False).load()
+
+            class _CalibrationReader(CalibrationDataReader):
+                def __init__(self):
+                    self._images = iter(samples)
+
+                def get_next(self):
+                    sample = next(self._images, None)
+                    if sample is None:
+                        return None
+                    batch, _ = backend._prepare([sample[1]])
+                    return {backend.input_name: batch}
+
+            quantize_static(
+                model_path,
+                output,
+                _CalibrationReader(),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+            )
+
+        size_mb = Path(output).stat().st_size / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(f'Modelo int8 guardado en {output} ({size_mb:.1f} MB)'))
+        return output
+
+    def verify(self, reference, model_path, samples, image_size, iou, conf_tolerance, max_mismatch):
+        candidate = OnnxRuntimeBackend(model_path, image_size=image_size, use_gpu=False).load()
+        conf = PLATE_DETECTION_CONFIG['confidence_threshold']
+
+        totals = {'matched': 0, 'reference_only': 0, 'candidate_only': 0}
+        timings = {'torch': 0.0, 'onnx': 0.0}
+        for name, image in samples:
+            started = time.perf_counter()
+            expected = reference.predict([image], conf)[0]
+            timings['torch'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            actual = candidate.predict([image], conf)[0]
+            timings['onnx'] += time.perf_counter() - started
+
+            matched, missing, extra = compare_detections(expected, actual, iou, conf_tolerance)
+            totals['matched'] += matched
+            totals['reference_only'] += missing
+            totals['candidate_only'] += extra
+            if missing or extra:
+                self.stdout.write(self.style.WARNING(
+                    f'  {name}: {matched} iguales, {missing} solo en PyTorch, {extra} solo en ONNX'
+                ))
+
+        detections = sum(totals.values())
+        mismatch = (totals['reference_only'] + totals['candidate_only']) / detections if detections else 0.0
+        self.stdout.write(
+            f'{Path(model_path).name}: {totals["matched"]} detecciones iguales, '
+            f'{totals["reference_only"]} solo en PyTorch, {totals["candidate_only"]} solo en ONNX '
+            f'(diferencia {mismatch:.1%}); '
+            f'PyTorch {timings["torch"] / len(samples) * 1000:.1f} ms/img, '
+            f'ONNX {timings["onnx"] / len(samples) * 1000:.1f} ms/img'
+        )
+
+        if mismatch > max_mismatch:
+            raise CommandError(
+                f'{model_path} difiere de PyTorch en {mismatch:.1%} de las detecciones '
+                f'(máximo permitido {max_mismatch:.1%})'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{Path(model_path).name} verificado'))
@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.prefork import child_pids, memory_usage
+
+
+class Command(BaseCommand):
+    help = 'Reporta la memoria privada y compartida del maestro de gunicorn y de cada worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pid', type=int, help='Pid del maestro de gunicorn')
+        parser.add_argument('--pidfile', help='Archivo con el pid del maestro (opción --pid de gunicorn)')
+        parser.add_argument('--json', action='store_true', help='Imprimir el reporte en JSON')
+
+    def handle(self, *args, **options):
+        master = options['pid']
+        if master is None and options['pidfile']:
+            try:
+                master = int(Path(options['pidfile']).read_text().strip())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['pidfile']}: {e}")
+        if master is None:
+            raise CommandError('Indica el maestro con --pid o --pidfile')
+
+        master_usage = memory_usage(master)
+        if master_usage is None:
+            raise CommandError(f'No se puede leer /proc/{master}/smaps_rollup (¿proceso inexistente o no es Linux?)')
+
+        workers = []
+        for pid in child_pids(master):
+            usage = memory_usage(pid)
+            if usage is not None:
+                workers.append(dict(usage, pid=pid))
+
+        private = [worker['private_mb'] for worker in workers]
+        report = {
+            'master': dict(master_usage, pid=master),
+            'workers': workers,
+            # PSS reparte las páginas compartidas entre quienes las usan: la suma es el total real
+            'total_pss_mb': round(master_usage['pss_mb'] + sum(worker['pss_mb'] for worker in workers), 1),
+            # Lo que cuesta un worker más: su memoria privada
+            'mb_per_additional_worker': round(sum(private) / len(private), 1) if private else None,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'proceso':<16}{'rss':>10}{'pss':>10}{'privada':>10}{'compartida':>12}")
+        rows = [('maestro', report['master'])] + [(f"worker {w['pid']}", w) for w in workers]
+        for label, usage in rows:
+            self.stdout.write(
+                f"{label:<16}{usage['rss_mb']:>10}{usage['pss_mb']:>10}"
+                f"{usage['private_mb']:>10}{usage['shared_mb']:>12}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Total (PSS): {report['total_pss_mb']} MB; "
+            f"cada worker adicional: ~{report['mb_per_additional_worker']} MB"
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from vehiculos.models import OcupacionCochera
+from vehiculos.ocupacion import reconstruir_ocupacion
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la ocupación de la cochera a partir de todo el historial de accesos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Filas por lote al leer y escribir')
+
+    def handle(self, *args, **options):
+        anteriores = OcupacionCochera.objects.count()
+        started = time.perf_counter()
+        dentro = reconstruir_ocupacion(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Ocupación reconstruida en {time.perf_counter() - started:.2f} s: "
+            f"{dentro} vehículos dentro (antes {anteriores})"
+        ))
@@ -0,0 +1,29 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.resumenes import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los resúmenes de accesos por hora y por día a partir del historial'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a recalcular (AAAA-MM-DD); por defecto todo el historial')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por lote al escribir')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = date.fromisoformat(options['desde'])
+            except ValueError:
+                raise CommandError(f"Fecha inválida '{options['desde']}', usa AAAA-MM-DD")
+
+        started = time.perf_counter()
+        filas = reconstruir_resumenes(desde=desde, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos en {time.perf_counter() - started:.2f} s: "
+            f"{filas['dias']} días, {filas['horas']} horas"
+        ))
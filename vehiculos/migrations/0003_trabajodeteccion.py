@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:17
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0002_alter_vehiculo_options_prestamovehiculo_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoDeteccion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('imagen', models.BinaryField()),
+                ('nombre_imagen', models.CharField(blank=True, max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=15)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, help_text='host:pid del worker que lo procesa', max_length=100)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_deteccion', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Detección',
+                'verbose_name_plural': 'Trabajos de Detección',
+                'ordering': ['fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_cola_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0003_trabajodeteccion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionModelo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('ruta_modelo', models.CharField(help_text='Ruta de los pesos (.pt) o del modelo exportado', max_length=255)),
+                ('backend', models.CharField(choices=[('torch', 'PyTorch'), ('onnx', 'ONNX Runtime')], default='torch', max_length=10)),
+                ('activa', models.BooleanField(default=False)),
+                ('descripcion', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_activacion', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versiones_modelo', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Versión del Modelo',
+                'verbose_name_plural': 'Versiones del Modelo',
+                'ordering': ['-fecha_creacion'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('activa', True)), fields=('activa',), name='una_version_modelo_activa')],
+            },
+        ),
+    ]
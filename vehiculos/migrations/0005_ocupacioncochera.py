@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_ocupacion(apps, schema_editor):
+    # Último registro de cada vehículo en el historial; los que terminan en entrada están dentro
+    RegistroAcceso = apps.get_model('vehiculos', 'RegistroAcceso')
+    OcupacionCochera = apps.get_model('vehiculos', 'OcupacionCochera')
+    ultimos = {}
+    for pk, vehiculo_id, usuario_id, tipo_acceso, timestamp in RegistroAcceso.objects.order_by(
+        'timestamp', 'pk'
+    ).values_list('pk', 'vehiculo_id', 'usuario_autorizado_id', 'tipo_acceso', 'timestamp').iterator():
+        ultimos[vehiculo_id] = (pk, usuario_id, tipo_acceso, timestamp)
+    OcupacionCochera.objects.bulk_create([
+        OcupacionCochera(
+            vehiculo_id=vehiculo_id, registro_entrada_id=pk,
+            usuario_autorizado_id=usuario_id, fecha_entrada=timestamp,
+        )
+        for vehiculo_id, (pk, usuario_id, tipo_acceso, timestamp) in ultimos.items()
+        if tipo_acceso == 'entrada'
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0004_versionmodelo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionCochera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_entrada', models.DateTimeField()),
+                ('registro_entrada', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion', to='vehiculos.registroacceso')),
+                ('usuario_autorizado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupaciones', to=settings.AUTH_USER_MODEL)),
+                ('vehiculo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion', to='vehiculos.vehiculo')),
+            ],
+            options={
+                'verbose_name': 'Ocupación de Cochera',
+                'verbose_name_plural': 'Ocupación de Cochera',
+                'ordering': ['-fecha_entrada'],
+                'indexes': [models.Index(fields=['-fecha_entrada'], name='ocupacion_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_ocupacion, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:35
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+
+def poblar_resumenes(apps, schema_editor):
+    RegistroAcceso = apps.get_model('vehiculos', 'RegistroAcceso')
+    for nombre, campo, truncar in (
+        ('ResumenAccesosDia', 'fecha', TruncDate),
+        ('ResumenAccesosHora', 'hora', TruncHour),
+    ):
+        modelo = apps.get_model('vehiculos', nombre)
+        filas = RegistroAcceso.objects.annotate(
+            periodo=truncar('timestamp', tzinfo=timezone.get_current_timezone())
+        ).values('periodo').annotate(
+            entradas=Count('pk', filter=Q(tipo_acceso='entrada')),
+            salidas=Count('pk', filter=Q(tipo_acceso='salida')),
+            vehiculos_unicos=Count('vehiculo', distinct=True),
+        ).order_by()
+        modelo.objects.bulk_create([
+            modelo(**{campo: fila.pop('periodo')}, **fila) for fila in filas
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0005_ocupacioncochera'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAccesosDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('entradas', models.PositiveIntegerField(default=0)),
+                ('salidas', models.PositiveIntegerField(default=0)),
+                ('vehiculos_unicos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Accesos',
+                'verbose_name_plural': 'Resúmenes Diarios de Accesos',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenAccesosHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(unique=True)),
+                ('entradas', models.PositiveIntegerField(default=0)),
+                ('salidas', models.PositiveIntegerField(default=0)),
+                ('vehiculos_unicos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen Horario de Accesos',
+                'verbose_name_plural': 'Resúmenes Horarios de Accesos',
+                'ordering': ['-hora'],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
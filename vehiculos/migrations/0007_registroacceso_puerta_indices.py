@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0006_resumenes_accesos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='registroacceso',
+            options={'ordering': ['-timestamp', '-id'], 'verbose_name': 'Registro de Acceso', 'verbose_name_plural': 'Registros de Acceso'},
+        ),
+        migrations.AddField(
+            model_name='registroacceso',
+            name='puerta',
+            field=models.CharField(blank=True, default='', help_text='Puerta o barrera donde se registró el acceso', max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['timestamp', 'id'], name='acceso_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['vehiculo', 'timestamp', 'id'], name='acceso_vehiculo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['usuario_autorizado', 'timestamp', 'id'], name='acceso_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['tipo_acceso', 'timestamp', 'id'], name='acceso_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['puerta', 'timestamp', 'id'], name='acceso_puerta_fecha_idx'),
+        ),
+    ]
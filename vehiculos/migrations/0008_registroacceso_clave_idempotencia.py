@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0007_registroacceso_puerta_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroacceso',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, help_text='Clave del evento enviada por la puerta; un reenvío no duplica el registro', max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='registroacceso',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0008_registroacceso_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroacceso',
+            name='version_modelo',
+            field=models.CharField(blank=True, default='', help_text='Versión del modelo de placas que hizo la detección (vacío en registros manuales)', max_length=100),
+        ),
+    ]
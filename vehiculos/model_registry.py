@@ -0,0 +1,187 @@
+"""
+Registro de modelos YOLO compartido por todo el proceso
+
+Carga cada modelo una sola vez (por backend de inferencia) y entrega handles
+compartidos para inferencia, evitando pagar la carga de pesos en cada petición.
+"""
+
+import os
+import threading
+import time
+import logging
+
+from .config import PLATE_DETECTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def _current_rss_bytes():
+    """
+    Memoria residente actual del proceso en bytes (None si no se puede medir)
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        # ru_maxrss es el pico, no el actual, pero sirve como aproximación
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+
+class ModelHandle:
+    """
+    Handle compartido sobre un modelo cargado
+
+    El predictor de ultralytics no es seguro entre hilos, por eso las
+    llamadas al modelo se serializan con un lock propio del handle (salvo
+    en backends que admiten llamadas concurrentes, como ONNX Runtime).
+    """
+
+    def __init__(self, model, model_path, load_time, weights_bytes, rss_delta_bytes):
+        self.model = model
+        self.model_path = model_path
+        self.backend = model.name
+        self.load_time = load_time
+        self.weights_bytes = weights_bytes
+        self.rss_delta_bytes = rss_delta_bytes
+        self.loaded_at = time.time()
+        self.inference_count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, source, **kwargs):
+        if self.model.thread_safe:
+            self.inference_count += 1
+            return self.model(source, **kwargs)
+        with self._lock:
+            self.inference_count += 1
+            return self.model(source, **kwargs)
+
+    def stats(self):
+        return {
+            'model_path': self.model_path,
+            'backend': self.backend,
+            'device': self.model.device,
+            'load_time_ms': round(self.load_time * 1000, 1),
+            'weights_bytes': self.weights_bytes,
+            'rss_delta_bytes': self.rss_delta_bytes,
+            'loaded_at': self.loaded_at,
+            'inference_count': self.inference_count,
+        }
+
+
+class ModelRegistry:
+    """
+    Registro thread-safe de modelos cargados, uno por backend y ruta de pesos
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handles = {}
+
+    def get_model(self, model_path, backend=None):
+        """
+        Devuelve el handle del modelo, cargándolo la primera vez
+
+        Args:
+            model_path: Ruta o nombre de los pesos de YOLO
+            backend: 'torch' u 'onnx' (por defecto PLATE_DETECTION_CONFIG['backend'])
+
+        Returns:
+            ModelHandle: Handle compartido del modelo
+        """
+        key = (backend or PLATE_DETECTION_CONFIG['backend'], model_path)
+        handle = self._handles.get(key)
+        if handle is not None:
+            return handle
+
+        with self._lock:
+            # Otro hilo pudo haberlo cargado mientras esperábamos el lock
+            handle = self._handles.get(key)
+            if handle is None:
+                handle = self._load(*key)
+                self._handles[key] = handle
+            return handle
+
+    def _load(self, backend, model_path):
+        from .inference_backends import create_backend
+
+        rss_before = _current_rss_bytes()
+        start = time.perf_counter()
+        model = create_backend(backend, model_path)
+        load_time = time.perf_counter() - start
+        rss_after = _current_rss_bytes()
+
+        rss_delta = None
+        if rss_before is not None and rss_after is not None:
+            rss_delta = max(0, rss_after - rss_before)
+
+        handle = ModelHandle(model, model.model_path, load_time, model.weights_bytes(), rss_delta)
+        logger.info(
+            f"Modelo YOLO '{model.model_path}' ({backend}, {model.device}) cargado en "
+            f"{load_time * 1000:.0f} ms (pesos: {handle.weights_bytes} bytes, RSS: +{rss_delta} bytes)"
+        )
+        return handle
+
+    def reload(self, model_path, backend=None):
+        """
+        Vuelve a cargar el modelo desde disco y reemplaza el handle registrado
+
+        La carga ocurre fuera del lock, así las inferencias con el handle
+        anterior siguen mientras tanto (pesos nuevos en la misma ruta).
+
+        Returns:
+            ModelHandle: Handle nuevo
+        """
+        key = (backend or PLATE_DETECTION_CONFIG['backend'], model_path)
+        handle = self._load(*key)
+        with self._lock:
+            self._handles[key] = handle
+        return handle
+
+    def preload(self, model_path, backend=None):
+        """Carga el modelo de forma anticipada (por ejemplo al arrancar)"""
+        return self.get_model(model_path, backend)
+
+    def is_loaded(self, model_path, backend=None):
+        return (backend or PLATE_DETECTION_CONFIG['backend'], model_path) in self._handles
+
+    def unload(self, model_path, backend=None):
+        with self._lock:
+            key = (backend or PLATE_DETECTION_CONFIG['backend'], model_path)
+            return self._handles.pop(key, None) is not None
+
+    def prepare_for_fork(self):
+        """
+        Prepara los modelos cargados para compartirse con procesos hijos
+
+        Los backends que no sobreviven a un fork (ONNX Runtime crea sus hilos
+        al cargar la sesión) se descargan: cada hijo los cargará al usarlos.
+
+        Returns:
+            list: Handles que quedan compartidos con los hijos
+        """
+        with self._lock:
+            for key, handle in list(self._handles.items()):
+                if handle.model.fork_safe:
+                    handle.model.prepare_for_fork()
+                else:
+                    logger.warning(
+                        f"El backend '{handle.backend}' no se puede compartir tras un fork; "
+                        f"'{handle.model_path}' se cargará en cada worker"
+                    )
+                    del self._handles[key]
+            return list(self._handles.values())
+
+    def stats(self):
+        """Tiempo de carga, memoria y uso de cada modelo cargado"""
+        return [handle.stats() for handle in list(self._handles.values())]
+
+
+# Registro único del proceso
+model_registry = ModelRegistry()
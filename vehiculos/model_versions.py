@@ -0,0 +1,292 @@
+"""
+Cambio de versión del modelo sin reiniciar los procesos
+
+La versión activa se guarda en la base de datos (VersionModelo). Cada proceso
+que detecta la consulta cada MODEL_VERSION_CONFIG['poll_interval_seconds'] y,
+cuando cambia, carga y calienta la nueva en un hilo de fondo mientras la
+anterior sigue atendiendo. Después la intercambia de forma atómica en el
+servicio compartido y espera a que terminen las inferencias en curso con la
+anterior antes de liberarla.
+"""
+
+import os
+import time
+import threading
+import logging
+from pathlib import Path
+
+from .config import MODEL_VERSION_CONFIG, PERFORMANCE_CONFIG, PLATE_DETECTION_CONFIG
+from .inference_scheduler import InferenceScheduler
+from .model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+class LoadedModel:
+    """
+    Una versión del modelo lista para inferencia: handle, planificador y
+    contador de inferencias en curso
+    """
+
+    def __init__(self, handle, version, confidence_threshold, model_path=None):
+        self.handle = handle
+        self.version = version
+        # Ruta pedida (con 'onnx' el handle apunta al .onnx exportado)
+        self.model_path = model_path or handle.model_path
+        self.backend = handle.backend
+        self.loaded_at = time.time()
+        self.scheduler = None
+        # Las peticiones concurrentes se agrupan en lotes antes de llegar al modelo
+        if PERFORMANCE_CONFIG['enable_micro_batching']:
+            self.scheduler = InferenceScheduler(
+                handle,
+                max_batch_size=PERFORMANCE_CONFIG['batch_processing_size'],
+                max_wait_ms=PERFORMANCE_CONFIG['batch_max_wait_ms'],
+                inference_timeout=PERFORMANCE_CONFIG['inference_timeout_seconds'],
+                conf=confidence_threshold,
+            )
+        self.in_flight = 0
+        self.retired = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Registra una inferencia en curso (False si la versión ya fue retirada)"""
+        with self._condition:
+            if self.retired:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._condition.notify_all()
+
+    def retire(self, timeout):
+        """
+        Deja de aceptar inferencias y espera a que terminen las que están en curso
+
+        Si no terminan dentro del tiempo, un hilo de fondo cierra el
+        planificador cuando termine la última.
+
+        Returns:
+            bool: True si todas terminaron dentro del tiempo
+        """
+        expires = time.monotonic() + timeout
+        with self._condition:
+            self.retired = True
+            while self.in_flight:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    threading.Thread(
+                        target=self._close_when_drained, name='model-version-reaper', daemon=True
+                    ).start()
+                    return False
+                self._condition.wait(remaining)
+        self._close()
+        return True
+
+    def _close(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+    def _close_when_drained(self):
+        with self._condition:
+            while self.in_flight:
+                self._condition.wait()
+        self._close()
+        logger.info(f"Versión '{self.version}' drenada después del tiempo de espera; planificador cerrado")
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'model_path': self.model_path,
+            'backend': self.backend,
+            'loaded_at': self.loaded_at,
+            'in_flight': self.in_flight,
+        }
+
+
+def active_version():
+    """
+    Versión activa en la base de datos (None si no hay o la base no está disponible)
+    """
+    from django.apps import apps
+    from django.db import DatabaseError
+
+    # Durante el arranque de Django (p. ej. la precarga en AppConfig.ready) no se consulta la base
+    if not apps.ready:
+        return None
+    try:
+        from .models import VersionModelo
+        return VersionModelo.objects.filter(activa=True).first()
+    except DatabaseError as e:
+        logger.debug(f"No se pudo consultar la versión activa del modelo: {e}")
+        return None
+
+
+def active_version_name():
+    """
+    Nombre de la versión que atiende las detecciones, sin cargar el modelo
+
+    Returns:
+        str: La versión activa en la base o, si no hay, el archivo de PLATE_DETECTION_CONFIG
+    """
+    version = active_version()
+    if version is not None:
+        return version.nombre
+    return Path(PLATE_DETECTION_CONFIG['model_path']).name
+
+
+def warmup_images(count=None):
+    """
+    Imágenes para calentar un modelo recién cargado
+
+    Returns:
+        list: Imágenes BGR de MODEL_VERSION_CONFIG['warmup_images'] o sintéticas
+    """
+    import cv2
+    import numpy as np
+
+    count = count or MODEL_VERSION_CONFIG['warmup_count']
+    directory = MODEL_VERSION_CONFIG['warmup_images']
+    images = []
+    if directory and os.path.isdir(directory):
+        paths = sorted(
+            path for path in Path(directory).iterdir()
+            if path.suffix.lower() in IMAGE_EXTENSIONS
+        )[:count]
+        images = [image for image in (cv2.imread(str(path)) for path in paths) if image is not None]
+    if not images:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, size=(720, 1280, 3), dtype=np.uint8) for _ in range(count)]
+    return images
+
+
+def load_model_version(model_path, backend, version, confidence_threshold, reload=False):
+    """
+    Carga y calienta una versión del modelo sin tocar la que está en uso
+
+    Args:
+        model_path: Pesos de la versión
+        backend: 'torch' u 'onnx'
+        version: Nombre de la versión (se registra con cada detección)
+        reload: Releer los pesos aunque la ruta ya esté cargada (pesos nuevos en la misma ruta)
+
+    Returns:
+        LoadedModel
+    """
+    started = time.perf_counter()
+    if reload and model_registry.is_loaded(model_path, backend):
+        handle = model_registry.reload(model_path, backend)
+    else:
+        handle = model_registry.get_model(model_path, backend)
+
+    images = warmup_images()
+    warmup_started = time.perf_counter()
+    for image in images:
+        handle(image, conf=confidence_threshold)
+    logger.info(
+        f"Versión de modelo '{version}' ({model_path}, {backend}) lista en "
+        f"{(time.perf_counter() - started) * 1000:.0f} ms "
+        f"(calentamiento: {len(images)} imágenes en {(time.perf_counter() - warmup_started) * 1000:.0f} ms)"
+    )
+    return LoadedModel(handle, version, confidence_threshold, model_path)
+
+
+def verify_model_version(model_path, backend, confidence_threshold=None):
+    """
+    Carga y calienta una versión para comprobar que sirve, sin dejarla cargada
+
+    Un modelo que no carga aquí tampoco cargará en los workers.
+
+    Returns:
+        float: Segundos de carga y calentamiento
+
+    Raises:
+        Exception: El error de la carga o del calentamiento
+    """
+    confidence_threshold = confidence_threshold or PLATE_DETECTION_CONFIG['confidence_threshold']
+    was_loaded = model_registry.is_loaded(model_path, backend)
+    started = time.perf_counter()
+    try:
+        load_model_version(model_path, backend, Path(model_path).name, confidence_threshold)._close()
+    finally:
+        # Si el proceso ya la usaba (p. ej. reactivar la versión actual) se queda
+        if not was_loaded:
+            model_registry.unload(model_path, backend)
+    return time.perf_counter() - started
+
+
+class ModelVersionWatcher:
+    """
+    Hilo que sigue la versión activa en la base de datos y la aplica al servicio
+    """
+
+    def __init__(self, service, poll_interval=None):
+        self.service = service
+        self.poll_interval = poll_interval or MODEL_VERSION_CONFIG['poll_interval_seconds']
+        self.last_check = None
+        self.last_error = None
+        # Versión que falló al cargar: no se reintenta hasta que cambie la activa
+        self._failed = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        # Como el planificador de lotes: el hilo no sobrevive a un fork
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name='model-version-watcher', daemon=True)
+            self._thread.start()
+
+    def check(self):
+        """
+        Aplica la versión activa si difiere de la cargada
+
+        Returns:
+            bool: True si se cambió de versión
+        """
+        version = active_version()
+        self.last_check = time.time()
+        if version is None:
+            return False
+        wanted = (version.nombre, version.ruta_modelo, version.backend)
+        current = self.service.loaded_model
+        if wanted == (current.version, current.model_path, current.backend) or wanted == self._failed:
+            return False
+        try:
+            self.service.swap_model(version.ruta_modelo, version.backend, version.nombre)
+        except Exception:
+            self._failed = wanted
+            raise
+        self._failed = None
+        return True
+
+    def _loop(self):
+        from django.db import close_old_connections
+
+        while True:
+            try:
+                close_old_connections()
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error al aplicar la versión activa del modelo: {e}")
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        return {
+            'poll_interval_seconds': self.poll_interval,
+            'last_check': self.last_check,
+            'last_error': self.last_error,
+        }
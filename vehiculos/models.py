@@ -1,4 +1,6 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -81,7 +83,8 @@ class RegistroAcceso(models.Model):
         related_name='registros_vigilancia'
     )
     tipo_acceso = models.CharField(max_length=10, choices=TIPO_ACCESO_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Por defecto la hora del servidor; los eventos sincronizados traen la hora de la puerta
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     metodo = models.CharField(max_length=15, choices=METODO_CHOICES, default='manual')
     
     # Datos del reconocimiento de placa
@@ -103,6 +106,18 @@ class RegistroAcceso(models.Model):
     
     # Observaciones
     observaciones = models.TextField(blank=True, null=True)
+    puerta = models.CharField(
+        max_length=30, blank=True, default='',
+        help_text='Puerta o barrera donde se registró el acceso'
+    )
+    clave_idempotencia = models.CharField(
+        max_length=64, unique=True, blank=True, null=True,
+        help_text='Clave del evento enviada por la puerta; un reenvío no duplica el registro'
+    )
+    version_modelo = models.CharField(
+        max_length=100, blank=True, default='',
+        help_text='Versión del modelo de placas que hizo la detección (vacío en registros manuales)'
+    )
 
     def __str__(self):
         return f"{self.tipo_acceso.title()} - {self.vehiculo.placa} - {self.timestamp.strftime('%d/%m/%Y %H:%M')}"
@@ -120,7 +135,208 @@ class RegistroAcceso(models.Model):
         
         return False
 
+    def save(self, *args, **kwargs):
+        # La ocupación y los resúmenes se actualizan en la misma transacción que el registro
+        nuevo = self._state.adding
+        with transaction.atomic():
+            if nuevo:
+                from .ocupacion import aplicar_registros, bloquear_vehiculos
+                from .resumenes import acumular_registros
+                # Antes del INSERT: dos entradas simultáneas del mismo vehículo se esperan
+                bloquear_vehiculos([self.vehiculo_id])
+            else:
+                # Una edición (p. ej. desde el admin) no se puede aplicar como un acceso nuevo
+                anterior = RegistroAcceso.objects.filter(pk=self.pk).values_list(
+                    'vehiculo_id', 'tipo_acceso', 'timestamp'
+                ).first()
+            super().save(*args, **kwargs)
+            if nuevo:
+                aplicar_registros([self])
+                acumular_registros([self])
+            elif anterior != (self.vehiculo_id, self.tipo_acceso, self.timestamp):
+                from .ocupacion import recalcular_ocupacion
+                from .resumenes import recalcular_periodos
+                recalcular_ocupacion({self.vehiculo_id, anterior[0]} if anterior else [self.vehiculo_id])
+                recalcular_periodos({self.timestamp, anterior[2]} if anterior else [self.timestamp])
+
     class Meta:
         verbose_name = 'Registro de Acceso'
         verbose_name_plural = 'Registros de Acceso'
-        ordering = ['-timestamp']
+        ordering = ['-timestamp', '-id']
+        # El listado pagina por (timestamp, id); cada filtro tiene su índice con ese sufijo
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='acceso_fecha_idx'),
+            models.Index(fields=['vehiculo', 'timestamp', 'id'], name='acceso_vehiculo_fecha_idx'),
+            models.Index(fields=['usuario_autorizado', 'timestamp', 'id'], name='acceso_usuario_fecha_idx'),
+            models.Index(fields=['tipo_acceso', 'timestamp', 'id'], name='acceso_tipo_fecha_idx'),
+            models.Index(fields=['puerta', 'timestamp', 'id'], name='acceso_puerta_fecha_idx'),
+        ]
+
+
+class OcupacionCochera(models.Model):
+    """
+    Vehículo que está actualmente dentro de la cochera
+
+    Una fila por vehículo dentro, con su registro de entrada. Se mantiene al
+    insertar cada RegistroAcceso (ver vehiculos.ocupacion) y se reconstruye
+    desde el historial con python manage.py reconstruir_ocupacion.
+    """
+    vehiculo = models.OneToOneField(Vehiculo, on_delete=models.CASCADE, related_name='ocupacion')
+    registro_entrada = models.OneToOneField(RegistroAcceso, on_delete=models.CASCADE, related_name='ocupacion')
+    usuario_autorizado = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ocupaciones')
+    fecha_entrada = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.vehiculo.placa} dentro desde {self.fecha_entrada.strftime('%d/%m/%Y %H:%M')}"
+
+    class Meta:
+        verbose_name = 'Ocupación de Cochera'
+        verbose_name_plural = 'Ocupación de Cochera'
+        ordering = ['-fecha_entrada']
+        indexes = [
+            models.Index(fields=['-fecha_entrada'], name='ocupacion_fecha_idx'),
+        ]
+
+
+class ResumenAccesosDia(models.Model):
+    """
+    Accesos agregados por día (zona horaria de TIME_ZONE)
+
+    Se acumula al guardar cada RegistroAcceso (ver vehiculos.resumenes) y se
+    reconstruye con python manage.py reconstruir_resumenes.
+    """
+    fecha = models.DateField(unique=True)
+    entradas = models.PositiveIntegerField(default=0)
+    salidas = models.PositiveIntegerField(default=0)
+    vehiculos_unicos = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha}: {self.entradas} entradas, {self.salidas} salidas"
+
+    @property
+    def total(self):
+        return self.entradas + self.salidas
+
+    class Meta:
+        verbose_name = 'Resumen Diario de Accesos'
+        verbose_name_plural = 'Resúmenes Diarios de Accesos'
+        ordering = ['-fecha']
+
+
+class ResumenAccesosHora(models.Model):
+    """
+    Accesos agregados por hora; 'hora' es el inicio de la hora local
+    """
+    hora = models.DateTimeField(unique=True)
+    entradas = models.PositiveIntegerField(default=0)
+    salidas = models.PositiveIntegerField(default=0)
+    vehiculos_unicos = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.hora.strftime('%d/%m/%Y %H:00')}: {self.entradas} entradas, {self.salidas} salidas"
+
+    @property
+    def total(self):
+        return self.entradas + self.salidas
+
+    class Meta:
+        verbose_name = 'Resumen Horario de Accesos'
+        verbose_name_plural = 'Resúmenes Horarios de Accesos'
+        ordering = ['-hora']
+
+
+class TrabajoDeteccion(models.Model):
+    """
+    Detección de placa encolada para procesarse fuera de la petición HTTP
+    
+    Los workers (python manage.py detection_worker) reclaman los trabajos
+    pendientes con bloqueo de filas y escriben el resultado con la misma forma
+    que detect_plate (plates_detected, confidence_scores, bounding_boxes).
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADO = 'completado'
+    FALLIDO = 'fallido'
+
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (COMPLETADO, 'Completado'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trabajos_deteccion')
+    # Bytes de la imagen en la base de datos: los workers no necesitan acceso a MEDIA_ROOT
+    imagen = models.BinaryField()
+    nombre_imagen = models.CharField(max_length=255, blank=True)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default=PENDIENTE)
+    resultado = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, help_text='host:pid del worker que lo procesa')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Trabajo {self.id} ({self.estado})"
+
+    @property
+    def terminado(self):
+        return self.estado in (self.COMPLETADO, self.FALLIDO)
+
+    class Meta:
+        verbose_name = 'Trabajo de Detección'
+        verbose_name_plural = 'Trabajos de Detección'
+        ordering = ['fecha_creacion']
+        indexes = [
+            # Cola: los workers buscan los pendientes más antiguos
+            models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_cola_idx'),
+        ]
+
+
+class VersionModelo(models.Model):
+    """
+    Versión del modelo de detección de placas
+
+    Solo una versión puede estar activa. Cada proceso de detección consulta la
+    versión activa periódicamente; al cambiar, carga y calienta la nueva en
+    segundo plano y la intercambia sin reiniciar (ver vehiculos.model_versions).
+    """
+    BACKEND_CHOICES = [
+        ('torch', 'PyTorch'),
+        ('onnx', 'ONNX Runtime'),
+    ]
+
+    nombre = models.CharField(max_length=100, unique=True)
+    ruta_modelo = models.CharField(max_length=255, help_text='Ruta de los pesos (.pt) o del modelo exportado')
+    backend = models.CharField(max_length=10, choices=BACKEND_CHOICES, default='torch')
+    activa = models.BooleanField(default=False)
+    descripcion = models.TextField(blank=True)
+    creado_por = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='versiones_modelo'
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_activacion = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.nombre}{' (activa)' if self.activa else ''}"
+
+    def activar(self):
+        """Marca esta versión como la única activa"""
+        with transaction.atomic():
+            VersionModelo.objects.filter(activa=True).exclude(pk=self.pk).update(activa=False)
+            self.activa = True
+            self.fecha_activacion = timezone.now()
+            self.save(update_fields=['activa', 'fecha_activacion'])
+
+    class Meta:
+        verbose_name = 'Versión del Modelo'
+        verbose_name_plural = 'Versiones del Modelo'
+        ordering = ['-fecha_creacion']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['activa'], condition=models.Q(activa=True), name='una_version_modelo_activa'
+            ),
+        ]
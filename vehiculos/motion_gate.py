@@ -0,0 +1,170 @@
+"""
+Filtro de cambios para frames de cámara
+
+Compara versiones reducidas en escala de grises de cada frame con el último
+frame que pasó por detección y solo deja pasar los que cambiaron dentro de la
+región de interés. Con el carril vacío o un carro ya leído, YOLO y el OCR no
+se ejecutan.
+"""
+
+import time
+import threading
+import logging
+
+import numpy as np
+
+from .config import MOTION_GATE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Pesos de luminancia para imágenes BGR
+_BGR_LUMA = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+
+class MotionGate:
+    """
+    Decide si un frame merece pasar por detección según lo que cambió en la ROI
+    """
+
+    def __init__(self, roi=None, downscale_width=None, pixel_threshold=None,
+                 min_changed_ratio=None, max_skip_seconds=None):
+        """
+        Args:
+            roi: (x1, y1, x2, y2) en fracciones de la imagen (None = imagen completa)
+            downscale_width: Ancho aproximado de la imagen reducida que se compara
+            pixel_threshold: Diferencia de gris para considerar que un píxel cambió
+            min_changed_ratio: Fracción de píxeles cambiados para disparar detección
+            max_skip_seconds: Forzar una detección tras este tiempo sin cambios (None = nunca)
+        """
+        self.roi = roi
+        self.downscale_width = downscale_width or MOTION_GATE_CONFIG['downscale_width']
+        self.pixel_threshold = (
+            MOTION_GATE_CONFIG['pixel_threshold'] if pixel_threshold is None else pixel_threshold
+        )
+        self.min_changed_ratio = (
+            MOTION_GATE_CONFIG['min_changed_ratio'] if min_changed_ratio is None else min_changed_ratio
+        )
+        self.max_skip_seconds = (
+            MOTION_GATE_CONFIG['max_skip_seconds'] if max_skip_seconds is None else max_skip_seconds
+        )
+
+        self.reference = None
+        self.last_processed_at = None
+        self.last_result = None
+        self.last_changed_ratio = None
+
+        self.frames_seen = 0
+        self.frames_processed = 0
+        self.detections = 0
+        self.detection_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _signature(self, frame):
+        # Submuestreo por pasos: sin copias intermedias a resolución completa
+        step = max(1, frame.shape[1] // self.downscale_width)
+        small = frame[::step, ::step]
+
+        if self.roi is not None:
+            height, width = small.shape[:2]
+            x1, y1, x2, y2 = self.roi
+            small = small[int(y1 * height):int(y2 * height), int(x1 * width):int(x2 * width)]
+
+        if small.ndim == 3:
+            return small.astype(np.float32) @ _BGR_LUMA
+        return small.astype(np.float32)
+
+    def check(self, frame):
+        """
+        Compara el frame con la referencia sin modificarla
+
+        La referencia solo avanza con commit(), cuando la detección del frame
+        terminó bien; así un frame que falló no deja atrás un resultado viejo.
+
+        Returns:
+            tuple: (firma del frame para commit(), resultado a reutilizar o None
+                si el frame debe pasar por detección)
+        """
+        signature = self._signature(frame)
+        now = time.monotonic()
+
+        with self._lock:
+            self.frames_seen += 1
+
+            if self.reference is None or self.reference.shape != signature.shape:
+                changed = True
+                self.last_changed_ratio = None
+            else:
+                changed_ratio = float(
+                    np.count_nonzero(np.abs(signature - self.reference) > self.pixel_threshold)
+                ) / signature.size
+                self.last_changed_ratio = changed_ratio
+                changed = changed_ratio >= self.min_changed_ratio
+
+            if not changed and self.max_skip_seconds is not None and self.last_processed_at is not None:
+                changed = now - self.last_processed_at >= self.max_skip_seconds
+
+            if changed or self.last_result is None:
+                self.frames_processed += 1
+                return signature, None
+            return signature, self.last_result
+
+    def commit(self, signature, result, seconds):
+        """
+        Fija el frame detectado como nueva referencia junto con su resultado
+
+        Args:
+            signature: Firma devuelta por check() para ese frame
+            result: Resultado completo de la detección
+            seconds: Lo que costó la detección
+        """
+        with self._lock:
+            self.reference = signature
+            self.last_processed_at = time.monotonic()
+            self.last_result = result
+            self.detections += 1
+            self.detection_seconds += seconds
+
+    def invalidate(self):
+        """Descarta la referencia y el resultado: el siguiente frame pasa por detección"""
+        with self._lock:
+            self.reference = None
+            self.last_result = None
+
+    def stats(self):
+        with self._lock:
+            skipped = self.frames_seen - self.frames_processed
+            average = self.detection_seconds / self.detections if self.detections else None
+            return {
+                'frames_seen': self.frames_seen,
+                'frames_processed': self.frames_processed,
+                'frames_skipped': skipped,
+                'skip_ratio': round(skipped / self.frames_seen, 3) if self.frames_seen else None,
+                'last_changed_ratio': self.last_changed_ratio,
+                'avg_detection_ms': round(average * 1000, 1) if average is not None else None,
+                # Tiempo de detección ahorrado al omitir frames (estimado con el promedio)
+                'cpu_seconds_saved': round(skipped * average, 2) if average is not None else None,
+            }
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_motion_gate(source):
+    """
+    Filtro de cambios de una cámara (None si está deshabilitado en MOTION_GATE_CONFIG)
+    """
+    if not MOTION_GATE_CONFIG['enabled']:
+        return None
+    with _gates_lock:
+        gate = _gates.get(source)
+        if gate is None:
+            roi = MOTION_GATE_CONFIG['camera_rois'].get(str(source), MOTION_GATE_CONFIG['roi'])
+            gate = MotionGate(roi=roi)
+            _gates[source] = gate
+        return gate
+
+
+def motion_gate_stats():
+    """Proporción de frames omitidos y CPU ahorrada por cámara"""
+    return {str(source): gate.stats() for source, gate in list(_gates.items())}
@@ -0,0 +1,279 @@
+"""
+Pool persistente de procesos OCR para recortes de placas
+
+Cada worker es un proceso de larga vida que mantiene abierta una instancia de
+tesseract (vía tesserocr) y recibe los recortes en memoria por un pipe, sin
+archivos temporales ni un proceso nuevo por recorte. Si tesserocr no está
+instalado el worker usa pytesseract.
+Requiere: pip install tesserocr  (opcional, recomendado)
+"""
+
+import os
+import re
+import queue
+import threading
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import OCR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def ocr_backend_available():
+    """Indica si hay algún motor tesseract disponible (tesserocr o pytesseract)"""
+    for module_name in ('tesserocr', 'pytesseract'):
+        try:
+            __import__(module_name)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def _parse_tesseract_config(tesseract_config):
+    """
+    Extrae psm, oem y variables -c de una cadena de configuración de tesseract
+    """
+    psm = re.search(r'--psm\s+(\d+)', tesseract_config)
+    oem = re.search(r'--oem\s+(\d+)', tesseract_config)
+    variables = dict(re.findall(r'-c\s+(\w+)=(\S+)', tesseract_config))
+    return (
+        int(psm.group(1)) if psm else None,
+        int(oem.group(1)) if oem else None,
+        variables,
+    )
+
+
+def _ocr_worker_main(conn, tesseract_config):
+    """
+    Bucle principal del proceso worker: recibe recortes y devuelve texto
+    """
+    recognize = None
+
+    try:
+        import tesserocr
+
+        psm, oem, variables = _parse_tesseract_config(tesseract_config)
+        init_kwargs = {}
+        if psm is not None:
+            init_kwargs['psm'] = tesserocr.PSM(psm)
+        if oem is not None:
+            init_kwargs['oem'] = tesserocr.OEM(oem)
+        api = tesserocr.PyTessBaseAPI(**init_kwargs)
+        for name, value in variables.items():
+            api.SetVariable(name, value)
+
+        def recognize(crop):
+            height, width = crop.shape[:2]
+            api.SetImageBytes(crop.tobytes(), width, height, 1, width)
+            return api.GetUTF8Text()
+
+    except ImportError:
+        import pytesseract
+
+        def recognize(crop):
+            return pytesseract.image_to_string(crop, config=tesseract_config)
+
+    while True:
+        try:
+            crop = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if crop is None:
+            break
+        try:
+            conn.send(('ok', recognize(crop)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+class OCRWorker:
+    """
+    Un proceso OCR de larga vida con su propio pipe de comunicación
+    """
+
+    def __init__(self, context, tesseract_config):
+        self._context = context
+        self._tesseract_config = tesseract_config
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self.process = self._context.Process(
+            target=_ocr_worker_main,
+            args=(child_conn, self._tesseract_config),
+            name='ocr-worker',
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def stop(self, force=False):
+        try:
+            if not force:
+                self.conn.send(None)
+                self.process.join(timeout=1)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+    def restart(self):
+        self.stop(force=True)
+        self.start()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class OCRWorkerPool:
+    """
+    Pool de workers OCR que reconoce en paralelo todos los recortes de un frame
+
+    Los workers ocupados salen de una cola de workers libres; si un worker no
+    responde dentro del timeout se mata y se relanza.
+    """
+
+    def __init__(self, size=None, timeout=None, tesseract_config=None):
+        self.size = max(1, int(size or OCR_CONFIG['pool_size'] or os.cpu_count() or 1))
+        self.timeout = timeout if timeout is not None else OCR_CONFIG['worker_timeout_seconds']
+        self.tesseract_config = tesseract_config or OCR_CONFIG['tesseract_config']
+
+        self.tasks = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.errors = 0
+        self._stats_lock = threading.Lock()
+
+        # spawn evita heredar hilos y locks del proceso padre
+        context = multiprocessing.get_context('spawn')
+        self._workers = [OCRWorker(context, self.tesseract_config) for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='ocr-dispatch')
+        self._pid = os.getpid()
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def recognize(self, crop, timeout=None):
+        """
+        Reconoce el texto de un recorte binarizado
+
+        Args:
+            crop: Array numpy uint8 de un canal
+            timeout: Segundos máximos de espera (por defecto los del pool)
+
+        Returns:
+            str | None: Texto crudo de tesseract o None si falló o expiró
+        """
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        self._count('tasks')
+        try:
+            if not worker.is_alive():
+                worker.restart()
+                self._count('restarts')
+
+            worker.conn.send(crop)
+            if not worker.conn.poll(timeout):
+                logger.warning(f"Worker OCR sin respuesta tras {timeout}s, reiniciando")
+                self._count('timeouts')
+                worker.restart()
+                self._count('restarts')
+                return None
+
+            status, payload = worker.conn.recv()
+            if status != 'ok':
+                self._count('errors')
+                logger.error(f"Error en worker OCR: {payload}")
+                return None
+            return payload
+
+        except (EOFError, BrokenPipeError, OSError) as e:
+            logger.error(f"Worker OCR caído: {e}")
+            self._count('errors')
+            worker.restart()
+            self._count('restarts')
+            return None
+        finally:
+            self._idle.put(worker)
+
+    def recognize_many(self, crops, timeout=None):
+        """
+        Reconoce varios recortes en paralelo
+
+        Returns:
+            list: Texto (o None) por recorte, en el mismo orden
+        """
+        if not crops:
+            return []
+        if len(crops) == 1:
+            return [self.recognize(crops[0], timeout)]
+        return list(self._executor.map(lambda crop: self.recognize(crop, timeout), crops))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        for worker in self._workers:
+            worker.stop()
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'alive_workers': sum(1 for worker in self._workers if worker.is_alive()),
+            'idle_workers': self._idle.qsize(),
+            'timeout_seconds': self.timeout,
+            'tasks': self.tasks,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+            'errors': self.errors,
+        }
+
+
+_pool = None
+_pool_unavailable = False
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """
+    Devuelve el pool OCR del proceso (None si está deshabilitado o no hay tesseract)
+    """
+    global _pool, _pool_unavailable
+    if not OCR_CONFIG['use_worker_pool'] or _pool_unavailable:
+        return None
+
+    # Los procesos hijos y sus pipes no se heredan de forma útil tras un fork
+    if _pool is not None and _pool._pid == os.getpid():
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool._pid != os.getpid():
+            if not ocr_backend_available():
+                _pool_unavailable = True
+                logger.warning("No hay motor tesseract instalado, el pool OCR queda deshabilitado")
+                return None
+            start = time.perf_counter()
+            _pool = OCRWorkerPool()
+            logger.info(
+                f"Pool OCR iniciado con {_pool.size} workers en "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms"
+            )
+        return _pool
+
+
+def ocr_pool_stats():
+    """Métricas del pool OCR del proceso (None si no se ha iniciado)"""
+    if _pool is None or _pool._pid != os.getpid():
+        return None
+    return _pool.stats()
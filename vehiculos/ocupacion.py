@@ -0,0 +1,148 @@
+"""
+Ocupación de la cochera mantenida de forma incremental
+
+OcupacionCochera tiene una fila por vehículo dentro: cada entrada la crea y
+cada salida la elimina, en la misma transacción que inserta el RegistroAcceso.
+Así "qué vehículos están dentro" es una sola consulta indexada, sin recorrer
+el historial de accesos ni depender de que la entrada haya sido hoy.
+
+Los cambios de un mismo vehículo se serializan bloqueando su fila de
+Vehiculo: la de OcupacionCochera no existe mientras el vehículo está fuera,
+así que no sirve para que dos entradas simultáneas se esperen.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Max
+
+from .models import OcupacionCochera, RegistroAcceso, Vehiculo
+
+logger = logging.getLogger(__name__)
+
+
+def _ultimo_por_vehiculo(registros):
+    """Último registro de cada vehículo en orden (timestamp, id)"""
+    ultimos = {}
+    for registro in sorted(registros, key=lambda r: (r.timestamp, r.pk or 0)):
+        ultimos[registro.vehiculo_id] = registro
+    return ultimos
+
+
+def _fila(registro):
+    return OcupacionCochera(
+        vehiculo_id=registro.vehiculo_id,
+        registro_entrada_id=registro.pk,
+        usuario_autorizado_id=registro.usuario_autorizado_id,
+        fecha_entrada=registro.timestamp,
+    )
+
+
+def bloquear_vehiculos(vehiculo_ids):
+    """
+    Bloquea las filas de los vehículos hasta el final de la transacción
+
+    En orden fijo para no provocar interbloqueos. Llamar dentro de una
+    transacción y, al insertar un acceso, antes del INSERT.
+    """
+    list(Vehiculo.objects.select_for_update().filter(pk__in=vehiculo_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def aplicar_registros(registros):
+    """
+    Aplica registros de acceso ya guardados a la ocupación de la cochera
+
+    Sirve para uno o muchos registros (p. ej. después de un bulk_create): por
+    vehículo solo cuenta el último, y un registro anterior al último guardado
+    del vehículo no cambia la ocupación (eventos sincronizados fuera de orden).
+
+    Args:
+        registros: RegistroAcceso con pk
+
+    Returns:
+        dict: Vehículos que quedaron 'dentro' y que 'salieron'
+    """
+    ultimos = _ultimo_por_vehiculo(registros)
+    if not ultimos:
+        return {'dentro': 0, 'salieron': 0}
+
+    with transaction.atomic():
+        bloquear_vehiculos(ultimos)
+        # Último acceso guardado de cada vehículo (índice vehiculo, timestamp, id)
+        mas_recientes = dict(
+            RegistroAcceso.objects.filter(vehiculo_id__in=ultimos)
+            .values('vehiculo_id').annotate(ultimo=Max('timestamp'))
+            .values_list('vehiculo_id', 'ultimo')
+        )
+        vigentes = [
+            registro for vehiculo_id, registro in ultimos.items()
+            if mas_recientes.get(vehiculo_id, registro.timestamp) <= registro.timestamp
+        ]
+        OcupacionCochera.objects.filter(vehiculo_id__in=[registro.vehiculo_id for registro in vigentes]).delete()
+        entradas = [_fila(registro) for registro in vigentes if registro.tipo_acceso == 'entrada']
+        OcupacionCochera.objects.bulk_create(entradas)
+
+    return {'dentro': len(entradas), 'salieron': len(vigentes) - len(entradas)}
+
+
+def recalcular_ocupacion(vehiculo_ids):
+    """
+    Recalcula desde el historial la ocupación de algunos vehículos
+
+    Para accesos editados o eliminados, que no se pueden aplicar como uno nuevo.
+
+    Returns:
+        int: Vehículos que quedaron dentro
+    """
+    vehiculo_ids = sorted(set(vehiculo_ids))
+    with transaction.atomic():
+        bloquear_vehiculos(vehiculo_ids)
+        ultimos = [
+            RegistroAcceso.objects.filter(vehiculo_id=vehiculo_id).order_by('-timestamp', '-id').first()
+            for vehiculo_id in vehiculo_ids
+        ]
+        OcupacionCochera.objects.filter(vehiculo_id__in=vehiculo_ids).delete()
+        entradas = [_fila(registro) for registro in ultimos if registro and registro.tipo_acceso == 'entrada']
+        OcupacionCochera.objects.bulk_create(entradas)
+    return len(entradas)
+
+
+def esta_en_cochera(vehiculo):
+    return OcupacionCochera.objects.filter(vehiculo=vehiculo).exists()
+
+
+def vehiculos_en_cochera():
+    """Ocupación actual con vehículo, propietario y usuario autorizado en una sola consulta"""
+    return OcupacionCochera.objects.select_related(
+        'vehiculo__usuario', 'usuario_autorizado', 'registro_entrada'
+    ).order_by('-fecha_entrada')
+
+
+def reconstruir_ocupacion(batch_size=2000):
+    """
+    Reconstruye la ocupación desde todo el historial de accesos
+
+    Returns:
+        int: Vehículos dentro de la cochera
+    """
+    ultimos = {}
+    # Solo las columnas necesarias; el último registro de cada vehículo gana
+    campos = ('pk', 'vehiculo_id', 'usuario_autorizado_id', 'tipo_acceso', 'timestamp')
+    for pk, vehiculo_id, usuario_id, tipo_acceso, timestamp in (
+        RegistroAcceso.objects.order_by('timestamp', 'pk').values_list(*campos).iterator(chunk_size=batch_size)
+    ):
+        ultimos[vehiculo_id] = (pk, usuario_id, tipo_acceso, timestamp)
+
+    filas = [
+        OcupacionCochera(
+            vehiculo_id=vehiculo_id, registro_entrada_id=pk,
+            usuario_autorizado_id=usuario_id, fecha_entrada=timestamp,
+        )
+        for vehiculo_id, (pk, usuario_id, tipo_acceso, timestamp) in ultimos.items()
+        if tipo_acceso == 'entrada'
+    ]
+    with transaction.atomic():
+        OcupacionCochera.objects.all().delete()
+        OcupacionCochera.objects.bulk_create(filas, batch_size=batch_size)
+    logger.info(f"Ocupación reconstruida: {len(filas)} vehículos dentro de {len(ultimos)} con accesos")
+    return len(filas)
@@ -0,0 +1,99 @@
+"""
+Paginación por cursor (keyset) del historial de accesos
+
+Con millones de registros, OFFSET obliga a la base a recorrer y descartar
+todas las filas anteriores a la página. Aquí cada página continúa desde el
+último (timestamp, id) entregado, que el cliente devuelve como cursor opaco:
+la consulta arranca en ese punto del índice y lee solo limit + 1 filas, sin
+importar cuán profundo esté paginando.
+"""
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .config import ACCESS_LOG_CONFIG
+
+
+def encode_cursor(timestamp, pk):
+    raw = f'{timestamp.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (timestamp, id) del último registro de la página anterior
+
+    Raises:
+        ValidationError: Si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Cursor inválido'})
+
+
+class KeysetPagination(BasePagination):
+    """
+    Páginas de registros ordenados por (timestamp, id) descendente
+
+    Parámetros: 'cursor' (el 'next' de la respuesta anterior) y 'limit'.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+
+    def get_limit(self, request):
+        value = request.query_params.get(self.limit_query_param)
+        if value in (None, ''):
+            return ACCESS_LOG_CONFIG['page_size']
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ValidationError({'limit': 'Debe ser un número entero'})
+        if limit < 1:
+            raise ValidationError({'limit': 'Debe ser mayor que cero'})
+        return min(limit, ACCESS_LOG_CONFIG['max_page_size'])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_limit(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, pk = decode_cursor(cursor)
+            # timestamp <= t acota el rango del índice; el desempate por id filtra solo los iguales
+            queryset = queryset.filter(
+                Q(timestamp__lte=timestamp) & (Q(timestamp__lt=timestamp) | Q(id__lt=pk))
+            )
+
+        page = list(queryset.order_by('-timestamp', '-id')[:limit + 1])
+        self.has_next = len(page) > limit
+        page = page[:limit]
+        self.next_cursor = encode_cursor(*self._position(page[-1])) if self.has_next else None
+        return page
+
+    def _position(self, item):
+        # Instancias o filas de values() (listados rápidos)
+        if isinstance(item, dict):
+            return item['timestamp'], item['id']
+        return item.timestamp, item.pk
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'cursor': self.next_cursor,
+            'results': data,
+        })
@@ -5,50 +5,171 @@ Requiere: pip install ultralytics opencv-python torch
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import re
 from pathlib import Path
 from django.conf import settings
+import os
+import time
 import logging
+import threading
+from io import BytesIO
+
+from .config import PLATE_DETECTION_CONFIG, OCR_CONFIG, CAMERA_CONFIG, MODEL_VERSION_CONFIG
+from .model_registry import model_registry
+from .model_versions import LoadedModel, ModelVersionWatcher, active_version, load_model_version
+from .ocr_pool import get_ocr_pool
+from .char_recognizer import recognize_characters
+from .plate_grammar import get_plate_grammar
+from .detection_cache import DetectionCache, copy_result, get_detection_cache
+from .camera_capture import get_capture_service, resolve_source
+from .camera_supervisor import get_supervisor_ring
+from .motion_gate import get_motion_gate
+from .plate_tracker import get_plate_tracker
+from .deadline import StageTimer, STAGE_COMPLETED, STAGE_PARTIAL, STAGE_SKIPPED
 
 logger = logging.getLogger(__name__)
 
 
 class PlateDetectionService:
-    def __init__(self):
+    def __init__(self, model_path=None, backend=None):
         """
         Inicializa el servicio de detección de placas
+        
+        Args:
+            model_path: Pesos de YOLO a usar (por defecto la versión activa en la
+                base de datos o, si no hay, los de PLATE_DETECTION_CONFIG)
+            backend: Backend de inferencia, 'torch' u 'onnx' (por defecto el de PLATE_DETECTION_CONFIG)
         """
-        self.model = None
-        self.confidence_threshold = 0.5
-        self.initialize_model()
+        self.confidence_threshold = PLATE_DETECTION_CONFIG['confidence_threshold']
+        # Duración estimada de cada etapa, para decidir qué cabe en un plazo
+        self.stage_timer = StageTimer()
+        self.loaded_model = None
+        self.model_swaps = 0
+        self._swap_lock = threading.Lock()
+        self.version_watcher = None
+        self.initialize_model(model_path, backend)
     
-    def initialize_model(self):
+    def initialize_model(self, model_path=None, backend=None):
         """
         Inicializa el modelo YOLO para detección de placas
+        
+        El modelo se obtiene del registro del proceso, de modo que los pesos
+        se cargan una sola vez y se comparten entre todas las instancias.
         """
         try:
-            # Usar modelo preentrenado de YOLO o entrenar uno específico para placas
-            # Por ahora usamos el modelo general, pero se puede entrenar uno específico
-            self.model = YOLO('yolov8n.pt')  # Modelo ligero para detección
-            logger.info("Modelo YOLO inicializado correctamente")
+            version = None
+            if model_path is None:
+                version = active_version()
+            if version is not None:
+                model_path, backend, version_name = version.ruta_modelo, version.backend, version.nombre
+            else:
+                # Usar modelo preentrenado de YOLO o entrenar uno específico para placas
+                # Por ahora usamos el modelo general, pero se puede entrenar uno específico
+                model_path = model_path or PLATE_DETECTION_CONFIG['model_path']
+                backend = backend or PLATE_DETECTION_CONFIG['backend']
+                version_name = Path(model_path).name
+            
+            handle = model_registry.get_model(model_path, backend)
+            self.loaded_model = LoadedModel(handle, version_name, self.confidence_threshold, model_path)
+            logger.debug(f"Modelo YOLO '{model_path}' ({backend}, versión {version_name}) listo para inferencia")
         except Exception as e:
             logger.error(f"Error al inicializar modelo YOLO: {e}")
             raise
     
-    def detect_license_plate(self, image_path_or_array, save_result=False):
+    @property
+    def model(self):
+        return self.loaded_model.handle
+    
+    @property
+    def scheduler(self):
+        return self.loaded_model.scheduler
+    
+    @property
+    def model_path(self):
+        return self.loaded_model.model_path
+    
+    @property
+    def backend(self):
+        return self.loaded_model.backend
+    
+    @property
+    def model_version(self):
+        return self.loaded_model.version
+    
+    def watch_model_version(self):
+        """Sigue la versión activa en la base de datos (hilo de fondo, uno por proceso)"""
+        if self.version_watcher is None:
+            self.version_watcher = ModelVersionWatcher(self)
+        self.version_watcher.ensure_running()
+    
+    def swap_model(self, model_path, backend, version, drain_timeout=None):
+        """
+        Cambia de versión del modelo sin interrumpir las detecciones
+        
+        La nueva versión se carga y calienta mientras la anterior sigue
+        atendiendo; el cambio es una sola asignación, y la anterior se libera
+        cuando terminan sus inferencias en curso.
+        
+        Returns:
+            bool: True si la versión anterior se drenó dentro del tiempo
+        """
+        drain_timeout = MODEL_VERSION_CONFIG['drain_timeout_seconds'] if drain_timeout is None else drain_timeout
+        with self._swap_lock:
+            old = self.loaded_model
+            same_weights_path = (model_path, backend) == (old.model_path, old.backend)
+            new = load_model_version(
+                model_path, backend, version, self.confidence_threshold, reload=same_weights_path
+            )
+            self.loaded_model = new
+            self.model_swaps += 1
+            if not same_weights_path:
+                # Las inferencias en curso guardaron su propia referencia al modelo anterior
+                model_registry.unload(old.model_path, old.backend)
+        # Fuera del lock: otro cambio de versión no espera a que drene esta
+        drained = old.retire(drain_timeout)
+        
+        logger.info(
+            f"Modelo cambiado de '{old.version}' a '{version}'"
+            + ('' if drained else f" (inferencias del anterior sin terminar tras {drain_timeout}s)")
+        )
+        return drained
+    
+    def _lease_model(self):
+        # El modelo leído puede haberse retirado justo antes de registrarse: se relee
+        while True:
+            loaded = self.loaded_model
+            if loaded.acquire():
+                return loaded
+    
+    def model_stats(self):
+        stats = self.loaded_model.stats()
+        stats['swaps'] = self.model_swaps
+        stats['watcher'] = self.version_watcher.stats() if self.version_watcher is not None else None
+        return stats
+    
+    def detect_license_plate(self, image_path_or_array, save_result=False, ocr_engine=None, cache_key=None,
+                             deadline=None):
         """
         Detecta placas en una imagen
         
         Args:
             image_path_or_array: Ruta de la imagen o array numpy
             save_result: Si guardar la imagen con detecciones
+            ocr_engine: 'tesseract' o 'numpy' (por defecto OCR_CONFIG['engine'])
+            cache_key: Clave de caché ya consultada por el llamador (opcional);
+                solo se usa para guardar el resultado
+            deadline: Plazo de respuesta (vehiculos.deadline.Deadline); las etapas
+                que no alcanzan a terminar se omiten y el resultado es parcial
             
         Returns:
             dict: {
                 'plates_detected': List[str],
                 'confidence_scores': List[float],
                 'bounding_boxes': List[tuple],
+                'unread_boxes': List[tuple] (placas detectadas sin OCR por el plazo),
+                'unread_confidence_scores': List[float],
+                'stages': {etapa: 'completed' | 'partial' | 'skipped'},
+                'deadline_exceeded': bool,
                 'processed_image': np.array (si save_result=True)
             }
         """
@@ -62,58 +183,364 @@ class PlateDetectionService:
             if image is None:
                 raise ValueError("No se pudo cargar la imagen")
             
+            # Una imagen idéntica ya procesada no vuelve a pasar por el modelo
+            cache = get_detection_cache()
+            if cache is not None and cache_key is None:
+                cache_key = self.cache_key(image, save_result, ocr_engine)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
             # Ejecutar detección
-            results = self.model(image, conf=self.confidence_threshold)
+            try:
+                results, model_version = self._infer(image, deadline)
+            except TimeoutError:
+                return self._deadline_result({'inference': STAGE_SKIPPED})
+            
+            plates_info = self.process_results(image, results, save_result, ocr_engine, deadline, model_version)
+            # Un resultado parcial no debe servirse a quien sí tiene tiempo
+            if cache is not None and not plates_info.get('deadline_exceeded'):
+                cache.put(cache_key, plates_info)
+            return plates_info
+            
+        except Exception as e:
+            logger.error(f"Error en detección de placas: {e}")
+            return self._empty_result(str(e))
+    
+    def detect_license_plates_batch(self, images, save_result=False):
+        """
+        Detecta placas en varias imágenes con una sola pasada del modelo
+        
+        Args:
+            images: Lista de arrays numpy (BGR)
+            save_result: Si guardar las imágenes con detecciones
+            
+        Returns:
+            list: Un dict por imagen con la misma forma que detect_license_plate
+        """
+        if not images:
+            return []
+        
+        # Solo las imágenes que no están en caché pasan por el modelo
+        cache = get_detection_cache()
+        keys = [None] * len(images)
+        plates_infos = [None] * len(images)
+        if cache is not None:
+            for index, image in enumerate(images):
+                keys[index] = self.cache_key(image, save_result)
+                plates_infos[index] = cache.get(keys[index])
+        
+        pending = [index for index, plates_info in enumerate(plates_infos) if plates_info is None]
+        if not pending:
+            return plates_infos
+        
+        loaded = self._lease_model()
+        try:
+            batch_results = loaded.handle([images[index] for index in pending], conf=self.confidence_threshold)
+        except Exception as e:
+            logger.error(f"Error en detección por lotes: {e}")
+            for index in pending:
+                plates_infos[index] = self._empty_result(str(e))
+            return plates_infos
+        finally:
+            loaded.release()
+        
+        for index, result in zip(pending, batch_results):
+            plates_infos[index] = self.process_results(
+                images[index], [result], save_result, model_version=loaded.version
+            )
+            if cache is not None:
+                cache.put(keys[index], plates_infos[index])
+        return plates_infos
+    
+    def cache_key(self, image, save_result=False, ocr_engine=None):
+        """
+        Clave de caché de una imagen para este modelo y configuración
+        """
+        loaded = self.loaded_model
+        return build_cache_key(
+            image, loaded.model_path, self.confidence_threshold, save_result, ocr_engine, loaded.backend,
+            loaded.version,
+        )
+    
+    def process_results(self, image, results, save_result=False, ocr_engine=None, deadline=None,
+                        model_version=None):
+        """
+        Convierte los resultados de YOLO en placas reconocidas
+        
+        Args:
+            image: Imagen original (BGR)
+            results: Resultados del modelo para esa imagen
+            save_result: Si dibujar las detecciones sobre la imagen
+            ocr_engine: Motor OCR a usar (por defecto OCR_CONFIG['engine'])
+            deadline: Plazo de respuesta; el OCR y el dibujo se omiten si no alcanzan
+            model_version: Versión del modelo que produjo los resultados
             
+        Returns:
+            dict: Información de placas detectadas
+        """
+        try:
             plates_info = {
+                'model_version': model_version or self.model_version,
                 'plates_detected': [],
                 'confidence_scores': [],
                 'bounding_boxes': [],
+                'unread_boxes': [],
+                'unread_confidence_scores': [],
+                'stages': {'inference': STAGE_COMPLETED},
+                'deadline_exceeded': False,
                 'processed_image': None
             }
             
             # Procesar resultados
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Extraer región de la placa
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                        confidence = float(box.conf[0])
-                        
-                        if confidence >= self.confidence_threshold:
-                            # Extraer región de la placa
-                            plate_region = image[y1:y2, x1:x2]
-                            
-                            # Reconocer texto de la placa
-                            plate_text = self.extract_text_from_plate(plate_region)
-                            
-                            if plate_text:
-                                plates_info['plates_detected'].append(plate_text)
-                                plates_info['confidence_scores'].append(confidence)
-                                plates_info['bounding_boxes'].append((x1, y1, x2, y2))
+            candidates = self.extract_boxes(results)
+            
+            # Reconocer el texto de todas las placas del frame a la vez
+            plate_regions = [image[y1:y2, x1:x2] for (x1, y1, x2, y2), _ in candidates]
+            plate_texts, unread = self.extract_texts_within_deadline(
+                plate_regions, [confidence for _, confidence in candidates], ocr_engine, deadline
+            )
+            plates_info['stages']['ocr'] = self._stage_status(len(unread), len(candidates))
+            
+            for index, ((bbox, confidence), plate_text) in enumerate(zip(candidates, plate_texts)):
+                if index in unread:
+                    plates_info['unread_boxes'].append(bbox)
+                    plates_info['unread_confidence_scores'].append(confidence)
+                elif plate_text:
+                    plates_info['plates_detected'].append(plate_text)
+                    plates_info['confidence_scores'].append(confidence)
+                    plates_info['bounding_boxes'].append(bbox)
             
             # Dibujar detecciones si se solicita
             if save_result and plates_info['plates_detected']:
-                processed_image = self.draw_detections(
-                    image, 
-                    plates_info['bounding_boxes'], 
-                    plates_info['plates_detected'],
-                    plates_info['confidence_scores']
-                )
-                plates_info['processed_image'] = processed_image
+                plates_info['processed_image'] = self.draw_within_deadline(plates_info, image, deadline)
             
+            plates_info['deadline_exceeded'] = any(
+                stage != STAGE_COMPLETED for stage in plates_info['stages'].values()
+            )
             return plates_info
             
         except Exception as e:
             logger.error(f"Error en detección de placas: {e}")
-            return {
+            return self._empty_result(str(e))
+    
+    def extract_boxes(self, results):
+        """
+        Cajas de placa por encima del umbral de confianza
+        
+        Returns:
+            list: ((x1, y1, x2, y2), confianza) por detección
+        """
+        candidates = []
+        for detections in results:
+            # Cada fila: [x1, y1, x2, y2, confianza, clase] (ver inference_backends)
+            for x1, y1, x2, y2, confidence, _ in detections:
+                if confidence >= self.confidence_threshold:
+                    candidates.append(((int(x1), int(y1), int(x2), int(y2)), float(confidence)))
+        return candidates
+    
+    def detect_plate_boxes(self, image, deadline=None):
+        """
+        Solo la etapa de detección (sin OCR)
+        
+        Returns:
+            list: ((x1, y1, x2, y2), confianza) por placa detectada
+        """
+        return self.extract_boxes(self.run_inference(image, deadline))
+    
+    def _stage_status(self, skipped, total):
+        if not skipped:
+            return STAGE_COMPLETED
+        return STAGE_PARTIAL if skipped < total else STAGE_SKIPPED
+    
+    def _deadline_result(self, stages):
+        result = self._empty_result('No hubo tiempo para la detección dentro del plazo')
+        result.update(unread_boxes=[], unread_confidence_scores=[], stages=stages, deadline_exceeded=True)
+        return result
+    
+    def extract_texts_within_deadline(self, plate_regions, confidences, engine=None, deadline=None):
+        """
+        OCR de las regiones que alcanzan a leerse antes del plazo
+        
+        Se leen primero las de mayor confianza de detección; cuántas caben se
+        calcula con la duración medida de un recorte y el paralelismo del OCR.
+        
+        Returns:
+            tuple: (texto o None por región, índices de las regiones no leídas)
+        """
+        if not plate_regions:
+            return [], set()
+        
+        parallelism = 1
+        if (engine or OCR_CONFIG['engine']) != 'numpy':
+            pool = get_ocr_pool()
+            parallelism = pool.size if pool is not None else 1
+        
+        order = sorted(range(len(plate_regions)), key=lambda index: -confidences[index])
+        per_round = self.stage_timer.estimate('ocr_round')
+        if deadline is None:
+            budget = len(order)
+        elif deadline.expired():
+            budget = 0
+        elif per_round is None:
+            budget = len(order)
+        else:
+            budget = parallelism * int(deadline.remaining() // per_round)
+        selected = sorted(order[:budget])
+        
+        texts = [None] * len(plate_regions)
+        if selected:
+            started = time.perf_counter()
+            read = self.extract_texts_from_plates([plate_regions[index] for index in selected], engine)
+            # Una ronda = un recorte por worker OCR en paralelo
+            rounds = -(-len(selected) // parallelism)
+            self.stage_timer.observe('ocr_round', (time.perf_counter() - started) / rounds)
+            for index, text in zip(selected, read):
+                texts[index] = text
+        return texts, set(order[budget:])
+    
+    def draw_within_deadline(self, plates_info, image, deadline=None):
+        """
+        Dibuja las placas si el dibujo cabe en el plazo; anota la etapa en plates_info
+        
+        Returns:
+            np.array | None: Imagen anotada (None si se omitió)
+        """
+        if deadline is not None and not deadline.allows(self.stage_timer.estimate('annotation')):
+            plates_info['stages']['annotation'] = STAGE_SKIPPED
+            return None
+        
+        started = time.perf_counter()
+        processed_image = self.draw_detections(
+            image,
+            plates_info['bounding_boxes'],
+            plates_info['plates_detected'],
+            plates_info['confidence_scores']
+        )
+        self.stage_timer.observe('annotation', time.perf_counter() - started)
+        plates_info['stages']['annotation'] = STAGE_COMPLETED
+        return processed_image
+    
+    def process_tracked_frame(self, frame, tracker, save_result=True, ocr_engine=None, deadline=None):
+        """
+        Procesa un frame usando el tracker de placas
+        
+        Solo se hace OCR de las cajas que el tracker pide (pistas nuevas o con
+        mejor confianza); el texto de cada pista es la votación de sus lecturas.
+        
+        Args:
+            frame: Frame de la cámara (numpy array)
+            tracker: PlateTracker de la cámara
+            deadline: Plazo de respuesta; las pistas que no alcanzan a leerse se
+                reportan sin texto y se leen en un frame siguiente
+            
+        Returns:
+            dict: Información de placas detectadas, con 'track_ids'
+        """
+        try:
+            try:
+                results, model_version = self._infer(frame, deadline)
+            except TimeoutError:
+                return self._deadline_result({'inference': STAGE_SKIPPED})
+            detections = self.extract_boxes(results)
+            updates = tracker.update(detections)
+            
+            to_read = [track for track, needs_ocr in updates if needs_ocr]
+            # Cajas y confianzas de este frame, tomadas con el lock del tracker
+            described = tracker.describe(to_read)
+            plate_regions = [frame[y1:y2, x1:x2] for _, _, (x1, y1, x2, y2), _ in described]
+            confidences = [confidence for _, _, _, confidence in described]
+            plate_texts, unread = self.extract_texts_within_deadline(
+                plate_regions, confidences, ocr_engine, deadline
+            )
+            for index, (track, plate_text, confidence) in enumerate(zip(to_read, plate_texts, confidences)):
+                if index not in unread:
+                    tracker.add_reading(track, plate_text, confidence)
+            unread_tracks = {to_read[index].track_id for index in unread}
+            
+            plates_info = {
+                'model_version': model_version,
                 'plates_detected': [],
                 'confidence_scores': [],
                 'bounding_boxes': [],
-                'processed_image': None,
-                'error': str(e)
+                'track_ids': [],
+                'unread_boxes': [],
+                'unread_confidence_scores': [],
+                'stages': {
+                    'inference': STAGE_COMPLETED,
+                    'ocr': self._stage_status(len(unread), len(to_read)),
+                },
+                'deadline_exceeded': False,
+                'processed_image': None
             }
+            for track_id, plate, box, confidence in tracker.describe([track for track, _ in updates]):
+                if plate:
+                    plates_info['plates_detected'].append(plate)
+                    plates_info['confidence_scores'].append(confidence)
+                    plates_info['bounding_boxes'].append(box)
+                    plates_info['track_ids'].append(track_id)
+                elif track_id in unread_tracks:
+                    # Sin placa todavía y el plazo no alcanzó para leerla
+                    plates_info['unread_boxes'].append(box)
+                    plates_info['unread_confidence_scores'].append(confidence)
+            
+            if save_result and plates_info['plates_detected']:
+                plates_info['processed_image'] = self.draw_within_deadline(plates_info, frame, deadline)
+            plates_info['deadline_exceeded'] = any(
+                stage != STAGE_COMPLETED for stage in plates_info['stages'].values()
+            )
+            return plates_info
+            
+        except Exception as e:
+            logger.error(f"Error en detección con tracker: {e}")
+            return self._empty_result(str(e))
+    
+    def _empty_result(self, error):
+        return {
+            'plates_detected': [],
+            'confidence_scores': [],
+            'bounding_boxes': [],
+            'processed_image': None,
+            'error': error
+        }
+    
+    def run_inference(self, image, deadline=None):
+        """
+        Ejecuta el modelo sobre una imagen, pasando por el planificador de lotes
+        
+        Args:
+            image: Imagen BGR
+            deadline: Plazo de respuesta; si la inferencia no alcanza a terminar
+                no se lanza (o se cancela mientras espera en la cola de lotes)
+        
+        Returns:
+            list: Resultados de YOLO para la imagen
+        
+        Raises:
+            TimeoutError: Si el plazo no alcanza para la inferencia
+        """
+        return self._infer(image, deadline)[0]
+    
+    def _infer(self, image, deadline=None):
+        """run_inference que además devuelve la versión del modelo que respondió"""
+        if deadline is not None and not deadline.allows(self.stage_timer.estimate('inference')):
+            raise TimeoutError('El plazo no alcanza para la inferencia')
+        # El hilo de versiones arranca con la primera inferencia, nunca en el
+        # maestro de gunicorn (no debe abrir conexiones a la base antes del fork)
+        if self.version_watcher is not None:
+            self.version_watcher.ensure_running()
+        
+        loaded = self._lease_model()
+        try:
+            started = time.perf_counter()
+            if loaded.scheduler is not None:
+                results = [loaded.scheduler.infer(image, deadline=deadline)]
+            else:
+                results = loaded.handle(image, conf=self.confidence_threshold)
+        finally:
+            loaded.release()
+        self.stage_timer.observe('inference', time.perf_counter() - started)
+        return results, loaded.version
     
     def extract_text_from_plate(self, plate_region):
         """
@@ -125,27 +552,74 @@ class PlateDetectionService:
         Returns:
             str: Texto de la placa limpio
         """
-        try:
-            # Preprocesamiento de la imagen
-            gray = cv2.cvtColor(plate_region, cv2.COLOR_BGR2GRAY)
-            
-            # Aplicar filtros para mejorar OCR
-            gray = cv2.GaussianBlur(gray, (5, 5), 0)
-            gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        return self.extract_texts_from_plates([plate_region])[0]
+    
+    def extract_texts_from_plates(self, plate_regions, engine=None):
+        """
+        Extrae el texto de varias regiones de placa a la vez
+        
+        Con el motor 'tesseract' y el pool OCR disponible todos los recortes se
+        reconocen en paralelo; con 'numpy' se usa el reconocedor en proceso.
+        
+        Args:
+            plate_regions: Lista de regiones de la imagen con placas
+            engine: 'tesseract' o 'numpy' (por defecto OCR_CONFIG['engine'])
             
+        Returns:
+            list: Texto limpio (o None) por región, en el mismo orden
+        """
+        binaries = []
+        for plate_region in plate_regions:
+            try:
+                binaries.append(self.preprocess_plate(plate_region))
+            except Exception as e:
+                logger.error(f"Error en extracción de texto: {e}")
+                binaries.append(None)
+        
+        valid = [index for index, binary in enumerate(binaries) if binary is not None]
+        texts = [None] * len(plate_regions)
+        if not valid:
+            return texts
+        
+        if (engine or OCR_CONFIG['engine']) == 'numpy':
+            for index in valid:
+                texts[index] = self.basic_text_recognition(binaries[index])
+            return texts
+        
+        pool = get_ocr_pool()
+        if pool is not None:
+            raw_texts = pool.recognize_many([binaries[index] for index in valid])
+            for index, raw_text in zip(valid, raw_texts):
+                texts[index] = self.clean_plate_text(raw_text)
+            return texts
+        
+        for index in valid:
+            texts[index] = self.recognize_plate_text(binaries[index])
+        return texts
+    
+    def preprocess_plate(self, plate_region):
+        """
+        Convierte la región de la placa en una imagen binaria apta para OCR
+        """
+        # Preprocesamiento de la imagen
+        gray = cv2.cvtColor(plate_region, cv2.COLOR_BGR2GRAY)
+        
+        # Aplicar filtros para mejorar OCR
+        if OCR_CONFIG['enable_preprocessing']:
+            gray = cv2.GaussianBlur(gray, OCR_CONFIG['gaussian_blur_kernel'], 0)
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    
+    def recognize_plate_text(self, gray):
+        """
+        Reconoce una placa binarizada en el propio proceso (sin pool OCR)
+        """
+        try:
             # Usar pytesseract para OCR (requiere instalación separada)
             try:
                 import pytesseract
                 # Configuración específica para placas
-                config = '--oem 3 --psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                text = pytesseract.image_to_string(gray, config=config)
-                
-                # Limpiar texto
-                text = re.sub(r'[^A-Z0-9]', '', text.upper())
-                
-                # Validar formato de placa (ajustar según país/región)
-                if self.validate_plate_format(text):
-                    return text
+                text = pytesseract.image_to_string(gray, config=OCR_CONFIG['tesseract_config'])
+                return self.clean_plate_text(text)
                 
             except ImportError:
                 logger.warning("pytesseract no está instalado, usando reconocimiento básico")
@@ -157,35 +631,58 @@ class PlateDetectionService:
             
         return None
     
+    def clean_plate_text(self, text, confidences=None):
+        """
+        Limpia el texto crudo del OCR y lo devuelve solo si es una placa válida
+        
+        Si el texto no cumple ningún formato se intenta corregir las confusiones
+        típicas del OCR (O/0, I/1, B/8, S/5...) según la gramática de placas.
+        
+        Args:
+            text: Texto crudo del OCR
+            confidences: Confianza por carácter (opcional, guía las correcciones)
+        """
+        if not text:
+            return None
+        
+        # Limpiar texto
+        cleaned = re.sub(r'[^A-Z0-9]', '', text.upper())
+        if confidences is not None and len(cleaned) != len(confidences):
+            confidences = None
+        
+        # Validar formato de placa, corrigiendo confusiones si hace falta
+        return get_plate_grammar().best(cleaned, confidences)
+    
     def validate_plate_format(self, text):
         """
         Valida si el texto extraído tiene formato de placa válido
         
+        Usa la gramática compilada con los patrones de PLATE_REGIONS.
+        
         Args:
             text: Texto a validar
             
         Returns:
             bool: True si es válido
         """
-        if not text or len(text) < 5 or len(text) > 8:
-            return False
-        
-        # Patrones comunes de placas (ajustar según región)
-        patterns = [
-            r'^[A-Z]{3}[0-9]{3}$',     # ABC123
-            r'^[A-Z]{3}[0-9]{4}$',     # ABC1234
-            r'^[A-Z]{2}[0-9]{4}$',     # AB1234
-            r'^[0-9]{3}[A-Z]{3}$',     # 123ABC
-        ]
-        
-        return any(re.match(pattern, text) for pattern in patterns)
+        return get_plate_grammar().is_valid(text)
     
     def basic_text_recognition(self, gray_image):
         """
-        Reconocimiento básico sin OCR externo (limitado)
+        Reconocimiento en proceso sin OCR externo
+        
+        Segmenta los caracteres de la placa binarizada y los compara contra el
+        banco de plantillas de char_recognizer.
+        
+        Returns:
+            str: Texto de la placa limpio o None
         """
-        # Implementación básica - en producción usar OCR real
-        return None
+        try:
+            recognition = recognize_characters(gray_image)
+            return self.clean_plate_text(recognition.text, recognition.confidences)
+        except Exception as e:
+            logger.error(f"Error en reconocimiento básico: {e}")
+            return None
     
     def draw_detections(self, image, boxes, texts, confidences):
         """
@@ -204,17 +701,45 @@ class PlateDetectionService:
         
         return result_image
     
-    def process_camera_frame(self, frame):
+    def process_camera_frame(self, frame, motion_gate=None, tracker=None, deadline=None):
         """
         Procesa un frame de cámara en tiempo real
         
         Args:
             frame: Frame de la cámara (numpy array)
+            motion_gate: Filtro de cambios de la cámara; si el frame no cambió
+                respecto al último procesado se reutiliza ese resultado
+            tracker: Tracker de placas de la cámara; con él solo se hace OCR de
+                placas nuevas y cada pista reporta su placa consolidada
+            deadline: Plazo de respuesta (ver detect_license_plate)
             
         Returns:
             dict: Información de placas detectadas
         """
-        return self.detect_license_plate(frame, save_result=True)
+        if motion_gate is not None:
+            signature, last_result = motion_gate.check(frame)
+            if last_result is not None:
+                # Copia profunda, como los aciertos de la caché: el llamador puede modificarla
+                result = copy_result(last_result)
+                result['frame_skipped'] = True
+                return result
+        
+        started = time.perf_counter()
+        if tracker is not None:
+            result = self.process_tracked_frame(
+                frame, tracker, save_result=True, ocr_engine=OCR_CONFIG['camera_engine'], deadline=deadline
+            )
+        else:
+            result = self.detect_license_plate(
+                frame, save_result=True, ocr_engine=OCR_CONFIG['camera_engine'], deadline=deadline
+            )
+        if motion_gate is not None:
+            if result.get('error') or result.get('deadline_exceeded'):
+                # Ni el resultado parcial ni el anterior describen la escena: el siguiente frame se detecta
+                motion_gate.invalidate()
+            else:
+                motion_gate.commit(signature, copy_result(result), time.perf_counter() - started)
+        return result
 
 
 class CameraManager:
@@ -222,10 +747,22 @@ class CameraManager:
     Gestor de cámara para captura en tiempo real
     """
     
-    def __init__(self, camera_index=0):
-        self.camera_index = camera_index
+    def __init__(self, camera_index=None, plate_detector=None, use_background_capture=None):
+        """
+        Args:
+            camera_index: Índice de cámara, ruta de video o URL (por defecto la de CAMERA_CONFIG)
+            plate_detector: Servicio de detección (por defecto el compartido)
+            use_background_capture: Tomar frames del servicio de captura continua
+                en lugar de abrir el dispositivo (por defecto CAMERA_CONFIG['background_capture'])
+        """
+        if camera_index is None:
+            camera_index = CAMERA_CONFIG['source']
+        self.camera_index = resolve_source(camera_index)
         self.cap = None
-        self.plate_detector = PlateDetectionService()
+        self.plate_detector = plate_detector or get_plate_detection_service()
+        if use_background_capture is None:
+            use_background_capture = CAMERA_CONFIG['background_capture']
+        self.use_background_capture = use_background_capture
     
     def initialize_camera(self):
         """Inicializa la cámara"""
@@ -235,8 +772,8 @@ class CameraManager:
                 raise ValueError(f"No se pudo abrir la cámara {self.camera_index}")
             
             # Configurar resolución
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_CONFIG['resolution_width'])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_CONFIG['resolution_height'])
             
             logger.info("Cámara inicializada correctamente")
             return True
@@ -247,6 +784,21 @@ class CameraManager:
     
     def capture_frame(self):
         """Captura un frame de la cámara"""
+        if self.use_background_capture:
+            # Con el supervisor corriendo, su proceso de captura es el dueño de la cámara
+            ring = get_supervisor_ring(self.camera_index)
+            if ring is not None:
+                return ring.latest_frame(max_age=CAMERA_CONFIG['max_frame_age_seconds'])
+
+            # El hilo de captura ya tiene el dispositivo abierto: solo se toma el último frame
+            service = get_capture_service(self.camera_index)
+            frame = service.get_latest_frame(max_age=CAMERA_CONFIG['max_frame_age_seconds'])
+            if frame is None:
+                frame = service.wait_for_frame(service.sequence)
+            if frame is None and service.last_error:
+                raise ValueError(service.last_error)
+            return frame.image if frame is not None else None
+        
         if self.cap is None:
             if not self.initialize_camera():
                 return None
@@ -256,20 +808,76 @@ class CameraManager:
             return frame
         return None
     
-    def detect_plates_in_frame(self):
+    def detect_plates_in_frame(self, deadline=None):
         """Detecta placas en el frame actual"""
         frame = self.capture_frame()
         if frame is not None:
-            return self.plate_detector.process_camera_frame(frame)
+            return self.plate_detector.process_camera_frame(
+                frame,
+                motion_gate=get_motion_gate(self.camera_index),
+                tracker=get_plate_tracker(self.camera_index),
+                deadline=deadline,
+            )
         return None
     
     def release(self):
         """Libera recursos de la cámara"""
+        # Con captura continua el dispositivo pertenece al servicio compartido
         if self.cap:
             self.cap.release()
             cv2.destroyAllWindows()
 
 
+def build_cache_key(image, model_path, confidence_threshold, save_result=False, ocr_engine=None, backend=None,
+                    model_version=None):
+    """
+    Clave de caché de detección: píxeles de la imagen más todo lo que cambia el resultado
+    """
+    return DetectionCache.key_for_image(
+        image,
+        model=model_path,
+        version=model_version,
+        backend=backend or PLATE_DETECTION_CONFIG['backend'],
+        conf=confidence_threshold,
+        save_result=bool(save_result),
+        ocr_engine=ocr_engine or OCR_CONFIG['engine'],
+    )
+
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def get_plate_detection_service():
+    """
+    Devuelve el servicio de detección compartido por el proceso
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_service_lock:
+            if _shared_service is None:
+                service = PlateDetectionService()
+                if MODEL_VERSION_CONFIG['watch']:
+                    service.version_watcher = ModelVersionWatcher(service)
+                _shared_service = service
+    return _shared_service
+
+
+def discard_plate_detection_service():
+    """
+    Olvida el servicio compartido: el siguiente get_plate_detection_service()
+    crea uno nuevo (p. ej. en cada worker, si el modelo no se comparte tras el fork)
+    """
+    global _shared_service
+    with _shared_service_lock:
+        _shared_service = None
+
+
+def model_version_stats():
+    """Versión del modelo del servicio compartido (None si no se ha creado)"""
+    return _shared_service.model_stats() if _shared_service is not None else None
+
+
 # Funciones de utilidad para Django
 def save_detection_image(image_array, filename):
     """
@@ -291,32 +899,114 @@ def save_detection_image(image_array, filename):
     return None
 
 
-def detect_plate_from_upload(image_file):
+# Factores de decodificación reducida de OpenCV (escalado en la DCT del JPEG)
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def _upload_buffer(image_file):
+    """
+    Bytes del archivo subido como memoryview
+
+    Los archivos en memoria (InMemoryUploadedFile) se exponen sin copiarlos;
+    los temporales en disco se leen una sola vez.
+    """
+    image_file.seek(0)
+    raw = getattr(image_file, 'file', image_file)
+    if isinstance(raw, BytesIO):
+        return raw.getbuffer()
+    return memoryview(image_file.read())
+
+
+def _reduced_decode_flag(image_file, target_size):
+    """
+    Flag de cv2.imdecode para decodificar un JPEG lo más pequeño posible
+    sin bajar de target_size en el lado mayor (solo lee la cabecera)
+    """
+    from PIL import Image
+    
+    try:
+        image_file.seek(0)
+        with Image.open(image_file) as header:
+            if header.format != 'JPEG':
+                return cv2.IMREAD_COLOR
+            longest = max(header.size)
+    except Exception:
+        return cv2.IMREAD_COLOR
+    
+    for factor, flag in _REDUCED_DECODE_FLAGS:
+        if longest // factor >= target_size:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_upload_image(image_file, target_size=None):
+    """
+    Decodifica un archivo subido a un array numpy BGR
+    
+    Los JPEG grandes se decodifican directamente a 1/2, 1/4 u 1/8 de su
+    resolución, lo más cerca posible de target_size, y OpenCV aplica la
+    orientación EXIF y entrega el BGR en un único buffer.
+    
+    Args:
+        image_file: Archivo de imagen de Django
+        target_size: Lado mayor mínimo de la imagen decodificada
+            (por defecto PLATE_DETECTION_CONFIG['decode_target_size'])
+        
+    Returns:
+        np.array: Imagen en formato BGR (OpenCV)
+    """
+    if target_size is None:
+        target_size = PLATE_DETECTION_CONFIG['decode_target_size']
+    
+    flag = _reduced_decode_flag(image_file, target_size)
+    buffer = _upload_buffer(image_file)
+    image_array = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), flag)
+    if image_array is not None:
+        return image_array
+    
+    # Formatos que OpenCV no decodifica (GIF...): se pasa por PIL
+    from PIL import Image, ImageOps
+    
+    image_file.seek(0)
+    with Image.open(image_file) as pil_image:
+        pil_image = ImageOps.exif_transpose(pil_image).convert('RGB')
+        return cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+
+
+def detect_plate_from_upload(image_file, deadline=None):
     """
     Detecta placas desde un archivo subido
     
     Args:
         image_file: Archivo de imagen de Django
+        deadline: Plazo de respuesta (vehiculos.deadline.Deadline), contado
+            desde que llegó la petición
         
     Returns:
         dict: Información de detección
     """
     try:
-        # Convertir archivo a array numpy
-        import numpy as np
-        from PIL import Image
+        image_array = decode_upload_image(image_file)
         
-        # Abrir imagen
-        pil_image = Image.open(image_file)
+        # Servicio compartido (modelo ya cargado); la clave de caché incluye su versión activa
+        detector = get_plate_detection_service()
         
-        # Convertir a array numpy (OpenCV usa BGR)
-        image_array = np.array(pil_image)
-        if len(image_array.shape) == 3 and image_array.shape[2] == 3:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+        # Consultar la caché antes de tocar el modelo
+        cache = get_detection_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = detector.cache_key(image_array, save_result=True)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        # Detectar placas
-        detector = PlateDetectionService()
-        return detector.detect_license_plate(image_array, save_result=True)
+        return detector.detect_license_plate(
+            image_array, save_result=True, cache_key=cache_key, deadline=deadline
+        )
         
     except Exception as e:
         logger.error(f"Error al procesar imagen subida: {e}")
@@ -326,4 +1016,83 @@ def detect_plate_from_upload(image_file):
             'bounding_boxes': [],
             'processed_image': None,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+
+def select_best_plate(results):
+    """
+    Consolida las lecturas de varias imágenes del mismo vehículo
+    
+    Cada placa suma la confianza de todas las imágenes donde aparece; gana la
+    de mayor puntuación acumulada.
+    
+    Returns:
+        dict | None: {'placa', 'confianza', 'apariciones'} o None si no hay lecturas
+    """
+    scores = {}
+    for result in results:
+        for plate, confidence in zip(result.get('plates_detected', []), result.get('confidence_scores', [])):
+            entry = scores.setdefault(plate, {'placa': plate, 'puntuacion': 0.0, 'confianza': 0.0, 'apariciones': 0})
+            entry['puntuacion'] += confidence
+            entry['confianza'] = max(entry['confianza'], confidence)
+            entry['apariciones'] += 1
+    
+    if not scores:
+        return None
+    
+    best = max(scores.values(), key=lambda entry: entry['puntuacion'])
+    return {
+        'placa': best['placa'],
+        'confianza': best['confianza'],
+        'apariciones': best['apariciones'],
+    }
+
+
+def detect_plates_from_uploads(image_files):
+    """
+    Detecta placas en varias imágenes subidas en una sola petición
+    
+    Las imágenes se decodifican en paralelo y se procesan con una única
+    pasada por lotes del modelo.
+    
+    Args:
+        image_files: Lista de archivos de imagen de Django
+        
+    Returns:
+        dict: {
+            'resultados': List[dict] (uno por imagen, en el mismo orden),
+            'mejor_placa': dict | None
+        }
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    def _decode(image_file):
+        try:
+            return decode_upload_image(image_file), None
+        except Exception as e:
+            logger.error(f"Error al decodificar imagen '{getattr(image_file, 'name', '')}': {e}")
+            return None, str(e)
+    
+    # PIL y OpenCV liberan el GIL al decodificar, así que los hilos escalan
+    workers = min(len(image_files), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        decoded = list(executor.map(_decode, image_files))
+    
+    valid_images = [image for image, error in decoded if image is not None]
+    detector = get_plate_detection_service()
+    detections = iter(detector.detect_license_plates_batch(valid_images))
+    
+    resultados = []
+    for image_file, (image, error) in zip(image_files, decoded):
+        if image is None:
+            result = detector._empty_result(error)
+        else:
+            result = next(detections)
+        result.pop('processed_image', None)
+        result['imagen'] = getattr(image_file, 'name', None)
+        resultados.append(result)
+    
+    return {
+        'resultados': resultados,
+        'mejor_placa': select_best_plate(resultados),
+    }
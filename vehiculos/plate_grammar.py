@@ -0,0 +1,206 @@
+"""
+Motor de formatos de placa por región
+
+Compila una sola vez todos los patrones regionales configurados en un único
+matcher y corrige confusiones típicas del OCR (O/0, I/1, B/8, S/5...)
+posición por posición, solo donde el formato de la placa lo permite.
+"""
+
+import re
+import itertools
+import threading
+import logging
+from collections import namedtuple
+
+from .config import PLATE_REGIONS, PLATE_CONFUSIONS, PLATE_DETECTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+PlateCandidate = namedtuple('PlateCandidate', ['text', 'cost', 'region', 'substitutions'])
+
+_TOKEN_RE = re.compile(r'\[([^\]]+)\](?:\{(\d+)\})?|([A-Z0-9])(?:\{(\d+)\})?')
+
+
+def _expand_class(body):
+    """Expande el contenido de una clase tipo 'A-Z0-9' al conjunto de caracteres"""
+    chars = set()
+    for start, end in re.findall(r'(.)-(.)', body):
+        chars.update(chr(code) for code in range(ord(start), ord(end) + 1))
+    chars.update(re.sub(r'.-.', '', body))
+    return frozenset(chars)
+
+
+def parse_pattern(pattern):
+    """
+    Convierte un patrón '^[A-Z]{3}[0-9]{3}$' en la lista de caracteres permitidos por posición
+
+    Returns:
+        tuple | None: Un frozenset por posición, o None si el patrón no es posicional
+    """
+    body = pattern
+    if body.startswith('^'):
+        body = body[1:]
+    if body.endswith('$'):
+        body = body[:-1]
+
+    positions = []
+    offset = 0
+    for match in _TOKEN_RE.finditer(body):
+        if match.start() != offset:
+            return None
+        offset = match.end()
+        if match.group(1) is not None:
+            allowed = _expand_class(match.group(1))
+            repeat = int(match.group(2) or 1)
+        else:
+            allowed = frozenset(match.group(3))
+            repeat = int(match.group(4) or 1)
+        positions.extend([allowed] * repeat)
+
+    if offset != len(body) or not positions:
+        return None
+    return tuple(positions)
+
+
+class PlateGrammar:
+    """
+    Gramática de placas compilada a partir de los patrones de cada región
+    """
+
+    def __init__(self, regions=None, confusions=None, max_substitutions=None):
+        self._regions = {name: list(patterns) for name, patterns in (regions or {}).items()}
+        self.max_substitutions = (
+            PLATE_DETECTION_CONFIG['max_ocr_corrections'] if max_substitutions is None else max_substitutions
+        )
+
+        # Mapa simétrico de confusiones: carácter -> caracteres con los que se confunde
+        self.confusions = {}
+        for a, b in (confusions or []):
+            self.confusions.setdefault(a, set()).add(b)
+            self.confusions.setdefault(b, set()).add(a)
+
+        self._lock = threading.Lock()
+        self._compile()
+
+    def _compile(self):
+        alternatives = []
+        templates = {}
+        group_regions = {}
+
+        for region, patterns in self._regions.items():
+            for index, pattern in enumerate(patterns):
+                group = f"{re.sub(r'[^0-9A-Za-z_]', '_', region)}_{index}"
+                body = pattern.lstrip('^').rstrip('$')
+                alternatives.append(f'(?P<{group}>{body})')
+                group_regions[group] = region
+
+                positions = parse_pattern(pattern)
+                if positions is None:
+                    logger.warning(
+                        f"Patrón de placa '{pattern}' ({region}) no es posicional, "
+                        f"se valida pero no se corrige"
+                    )
+                    continue
+                templates.setdefault(len(positions), []).append((region, positions))
+
+        self._matcher = re.compile('|'.join(alternatives)) if alternatives else None
+        self._group_regions = group_regions
+        self._templates = templates
+
+    def register_region(self, name, patterns):
+        """
+        Añade (o reemplaza) los patrones de una región y recompila la gramática
+        """
+        with self._lock:
+            self._regions[name] = list(patterns)
+            self._compile()
+
+    @property
+    def regions(self):
+        return list(self._regions)
+
+    def match_region(self, text):
+        """Región cuyo formato cumple el texto exactamente (None si ninguna)"""
+        if not text or self._matcher is None:
+            return None
+        match = self._matcher.fullmatch(text)
+        if match is None:
+            return None
+        return self._group_regions[match.lastgroup]
+
+    def is_valid(self, text):
+        return self.match_region(text) is not None
+
+    def candidates(self, text, confidences=None, max_candidates=3):
+        """
+        Lecturas válidas cercanas al texto del OCR, de menor a mayor costo
+
+        Cada sustitución por confusión cuesta la confianza del carácter
+        reemplazado (1 si no se conoce), así que se prefiere corregir los
+        caracteres que el OCR leyó con menos seguridad.
+
+        Args:
+            text: Texto limpio del OCR (A-Z0-9)
+            confidences: Confianza por carácter en [0, 1] (opcional)
+            max_candidates: Número máximo de candidatos a devolver
+
+        Returns:
+            list: PlateCandidate ordenados por costo
+        """
+        if not text:
+            return []
+        if confidences is None or len(confidences) != len(text):
+            confidences = [1.0] * len(text)
+
+        best = {}
+        for region, positions in self._templates.get(len(text), []):
+            options = []
+            for char, confidence, allowed in zip(text, confidences, positions):
+                if char in allowed:
+                    options.append([(char, 0.0)])
+                    continue
+                replacements = sorted(self.confusions.get(char, set()) & allowed)
+                if not replacements:
+                    options = None
+                    break
+                options.append([(replacement, max(float(confidence), 1e-3)) for replacement in replacements])
+            if options is None:
+                continue
+
+            for combination in itertools.product(*options):
+                substitutions = sum(1 for _, cost in combination if cost > 0)
+                if substitutions > self.max_substitutions:
+                    continue
+                candidate_text = ''.join(char for char, _ in combination)
+                cost = sum(cost for _, cost in combination)
+                if candidate_text not in best or cost < best[candidate_text].cost:
+                    best[candidate_text] = PlateCandidate(candidate_text, cost, region, substitutions)
+
+        ranked = sorted(best.values(), key=lambda candidate: (candidate.cost, candidate.text))
+        return ranked[:max_candidates]
+
+    def best(self, text, confidences=None):
+        """Mejor lectura válida del texto del OCR (None si no hay ninguna)"""
+        if self.is_valid(text):
+            return text
+        ranked = self.candidates(text, confidences, max_candidates=1)
+        return ranked[0].text if ranked else None
+
+
+_grammar = None
+_grammar_lock = threading.Lock()
+
+
+def get_plate_grammar():
+    """Gramática compartida construida con las regiones activas de la configuración"""
+    global _grammar
+    if _grammar is None:
+        with _grammar_lock:
+            if _grammar is None:
+                active = PLATE_DETECTION_CONFIG['plate_regions']
+                regions = {
+                    name: patterns for name, patterns in PLATE_REGIONS.items()
+                    if active is None or name in active
+                }
+                _grammar = PlateGrammar(regions, PLATE_CONFUSIONS)
+    return _grammar
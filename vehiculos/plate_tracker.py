@@ -0,0 +1,312 @@
+"""
+Seguimiento de placas entre frames de cámara
+
+Asocia las cajas de cada frame con las pistas del frame anterior (IoU y, si
+no hay solapamiento, distancia entre centros) y solo pide OCR cuando una
+pista es nueva o su confianza de detección mejora. Las lecturas de una misma
+pista se combinan votando carácter por carácter, así que la placa reportada
+no cambia de un frame a otro por un error aislado del OCR.
+
+Una pista que deja de verse durante un tiempo se cierra, y una que vuelve a
+asociarse después de frames sin detección se lee de nuevo desde cero: en ese
+hueco pudo salir un carro y entrar otro en el mismo lugar.
+"""
+
+import itertools
+import threading
+import time
+import logging
+
+import numpy as np
+
+from .config import TRACKER_CONFIG
+from .plate_grammar import get_plate_grammar
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    IoU entre todas las parejas de cajas (x1, y1, x2, y2)
+
+    Returns:
+        np.array: Matriz (len(boxes_a), len(boxes_b))
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0.0)
+
+
+def _centers(boxes):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+class PlateTrack:
+    """
+    Una placa seguida a lo largo de varios frames
+    """
+
+    def __init__(self, track_id, box, confidence, now=None):
+        self.track_id = track_id
+        self.box = box
+        self.confidence = confidence
+        self.hits = 1
+        self.missed = 0
+        self.last_seen = time.monotonic() if now is None else now
+        self.frames_since_ocr = 0
+        self._reset_readings()
+
+    def _reset_readings(self):
+        self.readings = 0
+        self.best_ocr_confidence = None
+        # Votos por longitud de lectura: una lista de {carácter: peso} por posición
+        self._votes = {}
+        self._plate = None
+
+    def update(self, box, confidence, now=None):
+        # Tras frames sin detección la placa pudo cambiar: las lecturas anteriores no cuentan
+        if self.missed:
+            self._reset_readings()
+        self.box = box
+        self.confidence = confidence
+        self.hits += 1
+        self.missed = 0
+        self.last_seen = time.monotonic() if now is None else now
+        self.frames_since_ocr += 1
+
+    def add_reading(self, text, weight):
+        """
+        Suma una lectura del OCR a la votación de la pista
+
+        Args:
+            text: Placa leída (None si el OCR no leyó nada)
+            weight: Peso de la lectura (la confianza de detección del recorte)
+        """
+        self.readings += 1
+        self.frames_since_ocr = 0
+        if self.best_ocr_confidence is None or weight > self.best_ocr_confidence:
+            self.best_ocr_confidence = weight
+        if not text:
+            return
+
+        positions = self._votes.setdefault(len(text), [{} for _ in text])
+        for votes, char in zip(positions, text):
+            votes[char] = votes.get(char, 0.0) + weight
+        self._plate = self._fuse()
+
+    def _fuse(self):
+        # Longitud con más peso acumulado y, en ella, el carácter más votado por posición
+        length, positions = max(
+            self._votes.items(),
+            key=lambda item: sum(item[1][0].values()),
+        )
+        chars = []
+        confidences = []
+        for votes in positions:
+            char, weight = max(votes.items(), key=lambda item: item[1])
+            chars.append(char)
+            confidences.append(weight / sum(votes.values()))
+
+        text = ''.join(chars)
+        return get_plate_grammar().best(text, confidences) or text
+
+    @property
+    def plate(self):
+        """Placa consolidada de la pista (None si aún no hay lecturas)"""
+        return self._plate
+
+
+class PlateTracker:
+    """
+    Asigna identificadores de pista a las cajas de placa de una cámara
+    """
+
+    def __init__(self, iou_threshold=None, max_centroid_distance=None, max_missed=None,
+                 reocr_confidence_margin=None, retry_interval=None, max_age_seconds=None):
+        """
+        Args:
+            iou_threshold: IoU mínimo para asociar una caja a una pista
+            max_centroid_distance: Distancia máxima entre centros, relativa al ancho de la caja,
+                para asociar cajas sin solapamiento (movimiento rápido)
+            max_missed: Frames seguidos sin detección antes de cerrar una pista
+            reocr_confidence_margin: Mejora de confianza de detección que justifica otro OCR
+            retry_interval: Frames entre reintentos de OCR de una pista sin placa válida
+            max_age_seconds: Segundos sin ver una pista antes de cerrarla
+        """
+        self.iou_threshold = TRACKER_CONFIG['iou_threshold'] if iou_threshold is None else iou_threshold
+        self.max_centroid_distance = (
+            TRACKER_CONFIG['max_centroid_distance'] if max_centroid_distance is None else max_centroid_distance
+        )
+        self.max_missed = TRACKER_CONFIG['max_missed_frames'] if max_missed is None else max_missed
+        self.reocr_confidence_margin = (
+            TRACKER_CONFIG['reocr_confidence_margin'] if reocr_confidence_margin is None
+            else reocr_confidence_margin
+        )
+        self.retry_interval = TRACKER_CONFIG['retry_interval_frames'] if retry_interval is None else retry_interval
+        self.max_age_seconds = TRACKER_CONFIG['max_age_seconds'] if max_age_seconds is None else max_age_seconds
+
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.frames = 0
+        self.detections = 0
+        self.ocr_requests = 0
+        self.tracks_created = 0
+
+    def _match(self, detections):
+        """Asociación voraz: primero por IoU, luego por distancia entre centros"""
+        if not self.tracks or not detections:
+            return [], list(range(len(self.tracks))), list(range(len(detections)))
+
+        track_boxes = [track.box for track in self.tracks]
+        detection_boxes = [box for box, _ in detections]
+        scores = iou_matrix(track_boxes, detection_boxes)
+
+        matches = []
+        free_tracks = set(range(len(self.tracks)))
+        free_detections = set(range(len(detections)))
+        for flat in np.argsort(-scores, axis=None):
+            t, d = np.unravel_index(flat, scores.shape)
+            if scores[t, d] < self.iou_threshold:
+                break
+            if t in free_tracks and d in free_detections:
+                matches.append((int(t), int(d)))
+                free_tracks.discard(t)
+                free_detections.discard(d)
+
+        if free_tracks and free_detections:
+            tracks = sorted(free_tracks)
+            dets = sorted(free_detections)
+            t_boxes = np.asarray([track_boxes[t] for t in tracks], dtype=np.float32)
+            distances = np.linalg.norm(
+                _centers(t_boxes)[:, None, :] - _centers([detection_boxes[d] for d in dets])[None, :, :],
+                axis=2,
+            )
+            # Distancia relativa al ancho de la caja de la pista
+            distances /= np.maximum(t_boxes[:, 2] - t_boxes[:, 0], 1.0)[:, None]
+            for flat in np.argsort(distances, axis=None):
+                i, j = np.unravel_index(flat, distances.shape)
+                if distances[i, j] > self.max_centroid_distance:
+                    break
+                t, d = tracks[i], dets[j]
+                if t in free_tracks and d in free_detections:
+                    matches.append((t, d))
+                    free_tracks.discard(t)
+                    free_detections.discard(d)
+
+        return matches, sorted(free_tracks), sorted(free_detections)
+
+    def _needs_ocr(self, track):
+        if track.readings == 0:
+            return True
+        if track.confidence >= track.best_ocr_confidence + self.reocr_confidence_margin:
+            return True
+        return track.plate is None and track.frames_since_ocr >= self.retry_interval
+
+    def update(self, detections):
+        """
+        Actualiza las pistas con las detecciones de un frame
+
+        Args:
+            detections: Lista de ((x1, y1, x2, y2), confianza)
+
+        Returns:
+            list: (pista, necesita_ocr) por cada detección del frame
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.frames += 1
+            self.detections += len(detections)
+
+            # Una pista vieja no se asocia aunque la caja coincida: el carro pudo cambiar
+            self.tracks = [track for track in self.tracks if now - track.last_seen <= self.max_age_seconds]
+            matches, unmatched_tracks, unmatched_detections = self._match(detections)
+
+            updated = []
+            for t, d in matches:
+                track = self.tracks[t]
+                track.update(*detections[d], now=now)
+                updated.append(track)
+
+            for t in unmatched_tracks:
+                self.tracks[t].missed += 1
+
+            for d in unmatched_detections:
+                box, confidence = detections[d]
+                track = PlateTrack(next(self._ids), box, confidence, now=now)
+                self.tracks.append(track)
+                self.tracks_created += 1
+                updated.append(track)
+
+            self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+            result = [(track, self._needs_ocr(track)) for track in updated]
+            self.ocr_requests += sum(1 for _, needs_ocr in result if needs_ocr)
+            return result
+
+    def add_reading(self, track, text, weight):
+        """
+        Suma una lectura del OCR a una pista (ver PlateTrack.add_reading)
+
+        Con el lock del tracker: varias peticiones de la misma cámara pueden
+        leer la misma pista a la vez.
+        """
+        with self._lock:
+            track.add_reading(text, weight)
+
+    def describe(self, tracks):
+        """
+        Estado consistente de las pistas para armar la respuesta
+
+        Returns:
+            list: (track_id, placa, caja, confianza) por pista
+        """
+        with self._lock:
+            return [(track.track_id, track.plate, track.box, track.confidence) for track in tracks]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'active_tracks': len(self.tracks),
+                'tracks_created': self.tracks_created,
+                'detections': self.detections,
+                'ocr_calls': self.ocr_requests,
+                'ocr_calls_saved': self.detections - self.ocr_requests,
+                'ocr_call_ratio': round(self.ocr_requests / self.detections, 3) if self.detections else None,
+            }
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_plate_tracker(source):
+    """
+    Tracker de placas de una cámara (None si está deshabilitado en TRACKER_CONFIG)
+    """
+    if not TRACKER_CONFIG['enabled']:
+        return None
+    with _trackers_lock:
+        tracker = _trackers.get(source)
+        if tracker is None:
+            tracker = PlateTracker()
+            _trackers[source] = tracker
+        return tracker
+
+
+def plate_tracker_stats():
+    """Pistas activas y llamadas de OCR ahorradas por cámara"""
+    return {str(source): tracker.stats() for source, tracker in list(_trackers.items())}
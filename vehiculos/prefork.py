@@ -0,0 +1,163 @@
+"""
+Precarga del modelo en el proceso maestro del servidor (pre-fork)
+
+Con gunicorn y preload_app el maestro carga Django y el modelo una vez y los
+workers lo heredan al hacer fork: los pesos se comparten por copy-on-write
+en lugar de tener una copia (y una carga en frío) por worker. Los hilos de
+inferencia, el pool OCR y los planificadores ya comprueban el pid y se
+recrean solos en cada worker.
+"""
+
+import gc
+import os
+import sys
+import logging
+
+from .config import PREFORK_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Campos de /proc/<pid>/smaps_rollup que se reportan (en kB)
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def memory_usage(pid='self'):
+    """
+    Memoria privada y compartida de un proceso según /proc/<pid>/smaps_rollup
+
+    La memoria privada es lo que cuesta cada worker adicional; la compartida
+    (los pesos heredados del maestro) se paga una sola vez.
+
+    Returns:
+        dict | None: MB de rss, pss, private y shared (None fuera de Linux)
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            lines = smaps.readlines()
+    except OSError:
+        return None
+
+    values = {}
+    for line in lines:
+        field, _, rest = line.partition(':')
+        if field in SMAPS_FIELDS:
+            values[field] = int(rest.split()[0])
+
+    to_mb = lambda kb: round(kb / 1024, 1)
+    return {
+        'rss_mb': to_mb(values.get('Rss', 0)),
+        'pss_mb': to_mb(values.get('Pss', 0)),
+        'private_mb': to_mb(values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)),
+        'shared_mb': to_mb(values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)),
+    }
+
+
+def child_pids(parent_pid):
+    """Pids de los procesos hijos directos (workers de un maestro de gunicorn)"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # El nombre del proceso va entre paréntesis y puede contener espacios
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == parent_pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def preload_model():
+    """
+    Carga el servicio de detección al arrancar si PLATE_DETECTION_CONFIG['preload_model'] está activo
+
+    Llamar con el registro de aplicaciones listo (wsgi.py/asgi.py, después de
+    get_wsgi_application()): antes active_version() no consulta la base, se
+    cargaría la ruta de la configuración y el vigilante de versiones la
+    cambiaría enseguida por la activa.
+    """
+    from .config import PLATE_DETECTION_CONFIG
+
+    # OpenCV, NumPy y el modelo se cargan con la primera detección. Los
+    # procesos de inferencia pueden precargarlos para que la primera petición
+    # no pague la importación ni la carga
+    if not PLATE_DETECTION_CONFIG['preload_model']:
+        return
+    try:
+        from .plate_detection import get_plate_detection_service
+        get_plate_detection_service()
+    except Exception as e:
+        logger.error(f"No se pudo precargar el modelo YOLO: {e}")
+
+
+def prepare_master():
+    """
+    Carga el servicio de detección en el maestro y lo deja listo para el fork
+
+    Llamar en el maestro después de cargar la aplicación y antes de crear los
+    workers (hook when_ready de gunicorn).
+    """
+    from django.db import connections
+
+    from .model_registry import model_registry
+    from .plate_detection import discard_plate_detection_service, get_plate_detection_service
+
+    service = get_plate_detection_service()
+    shared = model_registry.prepare_for_fork()
+    if not any(handle is service.model for handle in shared):
+        # El registro descartó su modelo (backend no seguro tras fork): el
+        # servicio no puede quedarse con la sesión del maestro
+        discard_plate_detection_service()
+
+    # La versión activa se leyó de la base: los workers no deben heredar ese socket
+    connections.close_all()
+
+    try:
+        import torch
+        # Los workers solo hacen inferencia: sin grafo de gradientes
+        torch.set_grad_enabled(False)
+    except ImportError:
+        pass
+
+    # Los objetos creados hasta aquí quedan fuera del recolector: sus
+    # cabeceras no se escriben en los workers y las páginas siguen compartidas
+    gc.collect()
+    gc.freeze()
+
+    usage = memory_usage()
+    logger.info(
+        f"Maestro {os.getpid()} listo para fork: {len(shared)} modelos compartidos, "
+        f"{gc.get_freeze_count()} objetos congelados, memoria {usage}"
+    )
+    return shared
+
+
+def threads_per_worker(workers):
+    threads = PREFORK_CONFIG['threads_per_worker']
+    if threads:
+        return threads
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def init_worker(workers):
+    """
+    Ajusta los hilos de inferencia de un worker recién creado
+
+    Cada worker usa por defecto todos los núcleos para PyTorch y OpenCV; con
+    varios workers eso sobresuscribe la CPU, así que se reparten los núcleos.
+
+    Args:
+        workers: Número de workers del servidor
+    """
+    threads = threads_per_worker(workers)
+    if 'torch' in sys.modules:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_grad_enabled(False)
+    if 'cv2' in sys.modules:
+        import cv2
+        cv2.setNumThreads(threads)
+    logger.info(f"Worker {os.getpid()} iniciado con {threads} hilos de inferencia")
+    return threads
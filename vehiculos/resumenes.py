@@ -0,0 +1,217 @@
+"""
+Resúmenes de accesos por hora y por día
+
+Los dashboards consultan las estadísticas cada pocos segundos. En lugar de
+contar sobre todo RegistroAcceso en cada petición, las entradas, salidas y
+vehículos distintos se acumulan en ResumenAccesosHora y ResumenAccesosDia en
+la misma transacción que guarda los registros; las vistas leen unas pocas
+filas sin importar el tamaño del historial.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import RegistroAcceso, ResumenAccesosDia, ResumenAccesosHora
+
+logger = logging.getLogger(__name__)
+
+
+def _periodos(timestamp):
+    """Día y hora local (inicio de la hora) de un instante"""
+    local = timezone.localtime(timestamp)
+    return local.date(), local.replace(minute=0, second=0, microsecond=0)
+
+
+def _inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _bloquear(modelo, campo, claves):
+    # Crea las filas que falten y las bloquea en orden fijo para no provocar interbloqueos
+    modelo.objects.bulk_create([modelo(**{campo: clave}) for clave in claves], ignore_conflicts=True)
+    list(modelo.objects.select_for_update().filter(**{f'{campo}__in': claves}).order_by(campo))
+
+
+def acumular_registros(registros):
+    """
+    Suma registros de acceso ya guardados a los resúmenes por hora y por día
+
+    Sirve para uno o muchos registros (p. ej. después de un bulk_create). Un
+    vehículo cuenta como distinto en un periodo solo si no tenía otros accesos
+    en él.
+
+    Args:
+        registros: RegistroAcceso con pk
+    """
+    registros = list(registros)
+    if not registros:
+        return
+
+    dias, horas = {}, {}
+    pares_dia, pares_hora = set(), set()
+    for registro in registros:
+        fecha, hora = _periodos(registro.timestamp)
+        dias.setdefault(fecha, Counter())[registro.tipo_acceso] += 1
+        horas.setdefault(hora, Counter())[registro.tipo_acceso] += 1
+        pares_dia.add((fecha, registro.vehiculo_id))
+        pares_hora.add((hora, registro.vehiculo_id))
+
+    with transaction.atomic():
+        # Con las filas bloqueadas, otro proceso no puede contar el mismo vehículo a la vez
+        _bloquear(ResumenAccesosDia, 'fecha', sorted(dias))
+        _bloquear(ResumenAccesosHora, 'hora', sorted(horas))
+
+        vistos_dia, vistos_hora = set(), set()
+        anteriores = RegistroAcceso.objects.filter(
+            vehiculo_id__in={vehiculo_id for _, vehiculo_id in pares_dia},
+            timestamp__gte=_inicio_dia(min(dias)),
+            timestamp__lt=_inicio_dia(max(dias) + timedelta(days=1)),
+        ).exclude(pk__in=[registro.pk for registro in registros])
+        for vehiculo_id, timestamp in anteriores.values_list('vehiculo_id', 'timestamp'):
+            fecha, hora = _periodos(timestamp)
+            vistos_dia.add((fecha, vehiculo_id))
+            vistos_hora.add((hora, vehiculo_id))
+        nuevos_dia = Counter(fecha for fecha, _ in pares_dia - vistos_dia)
+        nuevos_hora = Counter(hora for hora, _ in pares_hora - vistos_hora)
+
+        for fecha, conteo in dias.items():
+            ResumenAccesosDia.objects.filter(fecha=fecha).update(
+                entradas=F('entradas') + conteo['entrada'],
+                salidas=F('salidas') + conteo['salida'],
+                vehiculos_unicos=F('vehiculos_unicos') + nuevos_dia[fecha],
+            )
+        for hora, conteo in horas.items():
+            ResumenAccesosHora.objects.filter(hora=hora).update(
+                entradas=F('entradas') + conteo['entrada'],
+                salidas=F('salidas') + conteo['salida'],
+                vehiculos_unicos=F('vehiculos_unicos') + nuevos_hora[hora],
+            )
+
+
+def _recalcular(modelo, campo, clave, inicio, fin):
+    conteo = RegistroAcceso.objects.filter(timestamp__gte=inicio, timestamp__lt=fin).aggregate(
+        entradas=Count('pk', filter=Q(tipo_acceso='entrada')),
+        salidas=Count('pk', filter=Q(tipo_acceso='salida')),
+        vehiculos_unicos=Count('vehiculo', distinct=True),
+    )
+    if conteo['entradas'] or conteo['salidas']:
+        modelo.objects.filter(**{campo: clave}).update(**conteo)
+    else:
+        # Sin accesos no hay fila, igual que después de reconstruir_resumenes
+        modelo.objects.filter(**{campo: clave}).delete()
+
+
+def recalcular_periodos(timestamps):
+    """
+    Recalcula desde el historial el día y la hora de unos instantes
+
+    Para accesos editados o eliminados, que no se pueden acumular como uno nuevo.
+
+    Args:
+        timestamps: Instantes de los accesos afectados (antes y después del cambio)
+    """
+    dias, horas = set(), set()
+    for timestamp in timestamps:
+        fecha, hora = _periodos(timestamp)
+        dias.add(fecha)
+        horas.add(hora)
+
+    with transaction.atomic():
+        _bloquear(ResumenAccesosDia, 'fecha', sorted(dias))
+        _bloquear(ResumenAccesosHora, 'hora', sorted(horas))
+        for fecha in dias:
+            _recalcular(ResumenAccesosDia, 'fecha', fecha, _inicio_dia(fecha), _inicio_dia(fecha + timedelta(days=1)))
+        for hora in horas:
+            _recalcular(ResumenAccesosHora, 'hora', hora, hora, hora + timedelta(hours=1))
+
+
+def resumen_dia(fecha):
+    """
+    Returns:
+        dict: entradas, salidas y vehiculos_unicos del día (ceros si no hubo accesos)
+    """
+    resumen = ResumenAccesosDia.objects.filter(fecha=fecha).values(
+        'entradas', 'salidas', 'vehiculos_unicos'
+    ).first()
+    return resumen or {'entradas': 0, 'salidas': 0, 'vehiculos_unicos': 0}
+
+
+def totales_desde(fecha):
+    """
+    Registros totales y desde una fecha (inclusive), sumando los resúmenes diarios
+
+    Returns:
+        dict: 'total' y 'desde'
+    """
+    accesos = F('entradas') + F('salidas')
+    totales = ResumenAccesosDia.objects.aggregate(
+        total=Sum(accesos),
+        desde=Sum(accesos, filter=Q(fecha__gte=fecha)),
+    )
+    return {clave: valor or 0 for clave, valor in totales.items()}
+
+
+def accesos_por_hora(fecha):
+    """Resúmenes horarios de un día, de la primera a la última hora con accesos"""
+    return ResumenAccesosHora.objects.filter(
+        hora__gte=_inicio_dia(fecha),
+        hora__lt=_inicio_dia(fecha + timedelta(days=1)),
+    ).order_by('hora')
+
+
+def _agregados(truncar, desde=None):
+    registros = RegistroAcceso.objects.all()
+    if desde is not None:
+        registros = registros.filter(timestamp__gte=_inicio_dia(desde))
+    return registros.annotate(
+        periodo=truncar('timestamp', tzinfo=timezone.get_current_timezone())
+    ).values('periodo').annotate(
+        entradas=Count('pk', filter=Q(tipo_acceso='entrada')),
+        salidas=Count('pk', filter=Q(tipo_acceso='salida')),
+        vehiculos_unicos=Count('vehiculo', distinct=True),
+    ).order_by()
+
+
+def reconstruir_resumenes(desde=None, batch_size=1000):
+    """
+    Recalcula los resúmenes desde el historial con dos consultas agregadas
+
+    Args:
+        desde: Primer día a recalcular (None = todo el historial)
+
+    Returns:
+        dict: Filas escritas en 'dias' y 'horas'
+    """
+    dias = [
+        ResumenAccesosDia(
+            fecha=fila['periodo'], entradas=fila['entradas'],
+            salidas=fila['salidas'], vehiculos_unicos=fila['vehiculos_unicos'],
+        )
+        for fila in _agregados(TruncDate, desde)
+    ]
+    horas = [
+        ResumenAccesosHora(
+            hora=fila['periodo'], entradas=fila['entradas'],
+            salidas=fila['salidas'], vehiculos_unicos=fila['vehiculos_unicos'],
+        )
+        for fila in _agregados(TruncHour, desde)
+    ]
+
+    with transaction.atomic():
+        if desde is None:
+            ResumenAccesosDia.objects.all().delete()
+            ResumenAccesosHora.objects.all().delete()
+        else:
+            ResumenAccesosDia.objects.filter(fecha__gte=desde).delete()
+            ResumenAccesosHora.objects.filter(hora__gte=_inicio_dia(desde)).delete()
+        ResumenAccesosDia.objects.bulk_create(dias, batch_size=batch_size)
+        ResumenAccesosHora.objects.bulk_create(horas, batch_size=batch_size)
+
+    logger.info(f"Resúmenes de accesos reconstruidos: {len(dias)} días, {len(horas)} horas")
+    return {'dias': len(dias), 'horas': len(horas)}
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from django.utils import timezone
 from .models import Vehiculo, PrestamoVehiculo, RegistroAcceso
+from .model_versions import active_version_name
 
 
 class VehiculoSerializer(serializers.ModelSerializer):
@@ -84,7 +86,8 @@ class RegistroAccesoSerializer(serializers.ModelSerializer):
                  'usuario_autorizado_nombre', 'vigilante', 'vigilante_nombre', 
                  'tipo_acceso', 'timestamp', 'metodo', 'placa_detectada', 
                  'confianza_deteccion', 'foto_capturada', 'placa_coincide', 
-                 'prestamo_relacionado', 'observaciones', 'es_acceso_autorizado']
+                 'prestamo_relacionado', 'observaciones', 'puerta', 'version_modelo',
+                 'es_acceso_autorizado']
 
     def validate(self, data):
         """Validaciones para registros de acceso"""
@@ -128,6 +131,9 @@ class RegistroAccesoCreateSerializer(serializers.Serializer):
     confianza_deteccion = serializers.FloatField(min_value=0.0, max_value=1.0)
     foto_capturada = serializers.ImageField(required=False)
     observaciones = serializers.CharField(required=False, allow_blank=True)
+    puerta = serializers.CharField(max_length=30, required=False, allow_blank=True)
+    # model_version de la respuesta de detección
+    version_modelo = serializers.CharField(max_length=100, required=False, allow_blank=True)
 
     def validate_placa_detectada(self, value):
         """Buscar vehículo por placa detectada"""
@@ -172,7 +178,163 @@ class RegistroAccesoCreateSerializer(serializers.Serializer):
             foto_capturada=validated_data.get('foto_capturada'),
             placa_coincide=True,
             prestamo_relacionado=prestamo_relacionado,
-            observaciones=validated_data.get('observaciones', '')
+            observaciones=validated_data.get('observaciones', ''),
+            puerta=validated_data.get('puerta', ''),
+            version_modelo=validated_data.get('version_modelo') or active_version_name(),
         )
 
-        return registro
\ No newline at end of file
+        return registro
+
+
+class EventoAccesoSerializer(serializers.Serializer):
+    """Evento de acceso registrado por una puerta, para la sincronización por lotes"""
+    clave_idempotencia = serializers.CharField(max_length=64)
+    placa = serializers.CharField(max_length=20)
+    tipo_acceso = serializers.ChoiceField(choices=RegistroAcceso.TIPO_ACCESO_CHOICES)
+    timestamp = serializers.DateTimeField()
+    metodo = serializers.ChoiceField(choices=RegistroAcceso.METODO_CHOICES, default='automatico')
+    confianza_deteccion = serializers.FloatField(min_value=0.0, max_value=1.0, required=False, allow_null=True)
+    puerta = serializers.CharField(max_length=30, required=False, allow_blank=True, default='')
+    observaciones = serializers.CharField(required=False, allow_blank=True, default='')
+    version_modelo = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+    def validate_placa(self, value):
+        # Sin consultas aquí: las placas del lote se resuelven juntas
+        return value.strip().upper()
+
+
+# =============== SERIALIZACIÓN RÁPIDA DE LISTADOS (SOLO LECTURA) ===============
+#
+# Los listados leen cada página con una sola consulta values() que trae las
+# columnas de las relaciones por JOIN, y arman la misma respuesta que los
+# serializers de arriba sin instanciar modelos ni consultar relaciones fila
+# por fila.
+
+_fecha_hora = serializers.DateTimeField()
+
+# Relaciones que leen los serializers de modelo (select_related para el detalle y las acciones)
+PRESTAMO_RELACIONES = ('vehiculo__usuario', 'prestador', 'prestatario')
+REGISTRO_ACCESO_RELACIONES = ('vehiculo__usuario', 'vigilante', 'usuario_autorizado', 'prestamo_relacionado')
+
+VEHICULO_VALUES = ('marca', 'modelo', 'placa', 'color', 'foto_vehiculo', 'foto_placa',
+                   'fecha_registro', 'usuario_id', 'usuario__username')
+
+REGISTRO_ACCESO_VALUES = (
+    'id', 'vehiculo_id', 'usuario_autorizado_id', 'usuario_autorizado__username',
+    'vigilante_id', 'vigilante__username', 'tipo_acceso', 'timestamp', 'metodo',
+    'placa_detectada', 'confianza_deteccion', 'foto_capturada', 'placa_coincide',
+    'prestamo_relacionado_id', 'prestamo_relacionado__estado', 'prestamo_relacionado__fecha_inicio',
+    'prestamo_relacionado__fecha_fin', 'prestamo_relacionado__prestatario_id',
+    'observaciones', 'puerta', 'version_modelo',
+) + tuple(f'vehiculo__{campo}' for campo in VEHICULO_VALUES)
+
+PRESTAMO_VALUES = (
+    'id', 'vehiculo_id', 'prestador_id', 'prestador__username', 'prestatario_id',
+    'prestatario__username', 'fecha_solicitud', 'fecha_inicio', 'fecha_fin', 'estado',
+    'motivo', 'notas',
+) + tuple(f'vehiculo__{campo}' for campo in VEHICULO_VALUES)
+
+
+def _archivo_url(nombre, request):
+    # Igual que FileField de DRF: URL absoluta si hay petición
+    if not nombre:
+        return None
+    url = default_storage.url(nombre)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _prestamo_activo(estado, fecha_inicio, fecha_fin, ahora):
+    """Misma regla que PrestamoVehiculo.esta_activo"""
+    return estado == 'activo' and fecha_inicio <= ahora <= fecha_fin
+
+
+def _vehiculo_info(fila, request):
+    return {
+        'id': fila['vehiculo_id'],
+        'marca': fila['vehiculo__marca'],
+        'modelo': fila['vehiculo__modelo'],
+        'placa': fila['vehiculo__placa'],
+        'color': fila['vehiculo__color'],
+        'foto_vehiculo': _archivo_url(fila['vehiculo__foto_vehiculo'], request),
+        'foto_placa': _archivo_url(fila['vehiculo__foto_placa'], request),
+        'fecha_registro': _fecha_hora.to_representation(fila['vehiculo__fecha_registro']),
+        'usuario_nombre': fila['vehiculo__usuario__username'],
+    }
+
+
+def serialize_registros_acceso(filas, request=None):
+    """
+    Representación de RegistroAccesoSerializer a partir de filas values(*REGISTRO_ACCESO_VALUES)
+
+    Args:
+        filas: Diccionarios de la consulta values()
+        request: Petición para construir URLs absolutas de las fotos
+
+    Returns:
+        list: Un diccionario por registro
+    """
+    ahora = timezone.now()
+    datos = []
+    for fila in filas:
+        # Misma regla que RegistroAcceso.es_acceso_autorizado
+        if fila['usuario_autorizado_id'] == fila['vehiculo__usuario_id']:
+            autorizado = True
+        elif fila['prestamo_relacionado_id'] is not None and _prestamo_activo(
+            fila['prestamo_relacionado__estado'], fila['prestamo_relacionado__fecha_inicio'],
+            fila['prestamo_relacionado__fecha_fin'], ahora,
+        ):
+            autorizado = fila['usuario_autorizado_id'] == fila['prestamo_relacionado__prestatario_id']
+        else:
+            autorizado = False
+
+        datos.append({
+            'id': fila['id'],
+            'vehiculo': fila['vehiculo_id'],
+            'vehiculo_info': _vehiculo_info(fila, request),
+            'usuario_autorizado': fila['usuario_autorizado_id'],
+            'usuario_autorizado_nombre': fila['usuario_autorizado__username'],
+            'vigilante': fila['vigilante_id'],
+            'vigilante_nombre': fila['vigilante__username'],
+            'tipo_acceso': fila['tipo_acceso'],
+            'timestamp': _fecha_hora.to_representation(fila['timestamp']),
+            'metodo': fila['metodo'],
+            'placa_detectada': fila['placa_detectada'],
+            'confianza_deteccion': fila['confianza_deteccion'],
+            'foto_capturada': _archivo_url(fila['foto_capturada'], request),
+            'placa_coincide': fila['placa_coincide'],
+            'prestamo_relacionado': fila['prestamo_relacionado_id'],
+            'observaciones': fila['observaciones'],
+            'puerta': fila['puerta'],
+            'version_modelo': fila['version_modelo'],
+            'es_acceso_autorizado': autorizado,
+        })
+    return datos
+
+
+def serialize_prestamos(filas, request=None):
+    """
+    Representación de PrestamoVehiculoSerializer a partir de filas values(*PRESTAMO_VALUES)
+
+    Returns:
+        list: Un diccionario por préstamo
+    """
+    ahora = timezone.now()
+    return [
+        {
+            'id': fila['id'],
+            'vehiculo': fila['vehiculo_id'],
+            'vehiculo_info': _vehiculo_info(fila, request),
+            'prestador': fila['prestador_id'],
+            'prestador_nombre': fila['prestador__username'],
+            'prestatario': fila['prestatario_id'],
+            'prestatario_nombre': fila['prestatario__username'],
+            'fecha_solicitud': _fecha_hora.to_representation(fila['fecha_solicitud']),
+            'fecha_inicio': _fecha_hora.to_representation(fila['fecha_inicio']),
+            'fecha_fin': _fecha_hora.to_representation(fila['fecha_fin']),
+            'estado': fila['estado'],
+            'motivo': fila['motivo'],
+            'notas': fila['notas'],
+            'esta_activo': _prestamo_activo(fila['estado'], fila['fecha_inicio'], fila['fecha_fin'], ahora),
+        }
+        for fila in filas
+    ]
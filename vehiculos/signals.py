@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import RegistroAcceso
+from .ocupacion import recalcular_ocupacion
+from .resumenes import recalcular_periodos
+
+@receiver(post_delete, sender=RegistroAcceso)
+def recalcular_acceso_eliminado(sender, instance, **kwargs):
+    # Eliminar un acceso (p. ej. una salida posterior) puede volver a dejar el vehículo dentro
+    # y deja de contar en los resúmenes de su día y su hora
+    recalcular_ocupacion([instance.vehiculo_id])
+    recalcular_periodos([instance.timestamp])
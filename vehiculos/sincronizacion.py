@@ -0,0 +1,295 @@
+"""
+Ingesta por lotes de eventos de acceso registrados sin conexión
+
+Cuando una puerta recupera la conexión reenvía todos los accesos que guardó
+localmente. En lugar de una petición y varias consultas por evento, el lote
+se procesa con consultas por conjuntos: las placas, los préstamos activos y
+el historial reciente de los vehículos se leen de una vez, la secuencia
+entrada/salida de cada vehículo se valida en memoria sobre la línea de tiempo
+combinada (historial + lote), y los registros aceptados se insertan con un
+solo bulk_create en una transacción junto con la ocupación y los resúmenes.
+
+Cada evento lleva una clave de idempotencia: reenviar el mismo lote no
+duplica registros, devuelve el id ya creado.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .config import OFFLINE_SYNC_CONFIG
+from .models import PrestamoVehiculo, RegistroAcceso, Vehiculo
+from .ocupacion import aplicar_registros
+from .resumenes import acumular_registros
+from .serializers import EventoAccesoSerializer
+
+logger = logging.getLogger(__name__)
+
+CREADO = 'creado'
+DUPLICADO = 'duplicado'
+RECHAZADO = 'rechazado'
+
+
+def _resultado(indice, clave, estado, registro_id=None, error=None):
+    resultado = {'indice': indice, 'clave_idempotencia': clave, 'estado': estado}
+    if registro_id is not None:
+        resultado['registro_id'] = registro_id
+    if error is not None:
+        resultado['error'] = error
+    return resultado
+
+
+def _validar(eventos, ahora):
+    """
+    Valida la forma de cada evento (sin consultas)
+
+    Returns:
+        tuple: (eventos válidos como (indice, datos), resultados de los rechazados)
+    """
+    limite_futuro = ahora + timedelta(seconds=OFFLINE_SYNC_CONFIG['max_clock_skew_seconds'])
+    limite_pasado = ahora - timedelta(days=OFFLINE_SYNC_CONFIG['max_event_age_days'])
+    validos, resultados = [], {}
+    for indice, evento in enumerate(eventos):
+        serializer = EventoAccesoSerializer(data=evento)
+        if not serializer.is_valid():
+            clave = evento.get('clave_idempotencia') if isinstance(evento, dict) else None
+            resultados[indice] = _resultado(indice, clave, RECHAZADO, error=serializer.errors)
+            continue
+        datos = serializer.validated_data
+        if not limite_pasado <= datos['timestamp'] <= limite_futuro:
+            resultados[indice] = _resultado(
+                indice, datos['clave_idempotencia'], RECHAZADO,
+                error='timestamp fuera del rango aceptado (reloj de la puerta desfasado o evento muy antiguo)',
+            )
+            continue
+        validos.append((indice, datos))
+    return validos, resultados
+
+
+def _vehiculos(placas, desde):
+    """
+    Vehículos de las placas con su último acceso anterior a 'desde' (una consulta)
+
+    Returns:
+        dict: placa -> Vehiculo (con ultimo_tipo y ultimo_timestamp)
+    """
+    anteriores = RegistroAcceso.objects.filter(
+        vehiculo=OuterRef('pk'), timestamp__lt=desde
+    ).order_by('-timestamp', '-id')
+    # Bloqueados hasta el final del lote: dos sincronizaciones del mismo vehículo no validan a la vez
+    return {
+        vehiculo.placa: vehiculo
+        for vehiculo in Vehiculo.objects.select_for_update().filter(placa__in=placas).order_by('pk').annotate(
+            ultimo_tipo=Subquery(anteriores.values('tipo_acceso')[:1]),
+            ultimo_timestamp=Subquery(anteriores.values('timestamp')[:1]),
+        )
+    }
+
+
+def _historial(vehiculos, desde):
+    """
+    Línea de tiempo por vehículo: último acceso antes de 'desde' y todos los posteriores
+
+    Returns:
+        dict: vehiculo_id -> lista de (timestamp, tipo_acceso)
+    """
+    lineas = {
+        vehiculo.pk: [(vehiculo.ultimo_timestamp, vehiculo.ultimo_tipo)] if vehiculo.ultimo_tipo else []
+        for vehiculo in vehiculos
+    }
+    for vehiculo_id, timestamp, tipo_acceso in RegistroAcceso.objects.filter(
+        vehiculo_id__in=lineas, timestamp__gte=desde
+    ).order_by('timestamp', 'id').values_list('vehiculo_id', 'timestamp', 'tipo_acceso'):
+        lineas[vehiculo_id].append((timestamp, tipo_acceso))
+    return lineas
+
+
+def _prestamos(vehiculo_ids, desde, hasta):
+    """Préstamos activos en algún momento del lote, agrupados por vehículo"""
+    prestamos = {}
+    for prestamo in PrestamoVehiculo.objects.filter(
+        vehiculo_id__in=vehiculo_ids, estado='activo', fecha_inicio__lte=hasta, fecha_fin__gte=desde
+    ):
+        prestamos.setdefault(prestamo.vehiculo_id, []).append(prestamo)
+    return prestamos
+
+
+def _error_secuencia(tipo_acceso, anterior, placa):
+    if tipo_acceso == 'entrada' and anterior == 'entrada':
+        return f'El vehículo {placa} ya tiene una entrada registrada sin salida'
+    if tipo_acceso == 'salida' and anterior is None:
+        return f'No se puede registrar salida sin una entrada previa para {placa}'
+    if tipo_acceso == 'salida' and anterior == 'salida':
+        return f'El vehículo {placa} no tiene una entrada previa para registrar salida'
+    return None
+
+
+def _validar_secuencia(linea, candidatos, placa):
+    """
+    Valida juntos los eventos del lote de un vehículo sobre su línea de tiempo
+
+    Los eventos se intercalan con los accesos guardados y la secuencia
+    combinada debe alternar entrada/salida. Así una visita completa hecha sin
+    conexión (entrada y salida) cabe entre dos accesos ya registrados, aunque
+    cada evento por separado rompería la secuencia.
+
+    Args:
+        linea: Accesos guardados como (timestamp, tipo_acceso), en orden
+        candidatos: Eventos del lote como (indice, datos), en orden cronológico
+        placa: Placa del vehículo (para los mensajes)
+
+    Returns:
+        tuple: (candidatos aceptados en orden, {indice: error} de los rechazados)
+    """
+    # A igual timestamp, los accesos guardados van antes que los del lote
+    combinados = sorted(
+        [(timestamp, 0, posicion, tipo_acceso, None) for posicion, (timestamp, tipo_acceso) in enumerate(linea)]
+        + [(datos['timestamp'], 1, posicion, datos['tipo_acceso'], (indice, datos))
+           for posicion, (indice, datos) in enumerate(candidatos)],
+        key=lambda item: item[:3],
+    )
+
+    aceptados, errores = [], {}
+    anterior = None
+    hueco = []  # Aceptados desde el último acceso guardado
+    for _, _, _, tipo_acceso, candidato in combinados:
+        if candidato is None:
+            # Un acceso guardado no se rechaza: si el hueco lo contradice, sale el último aceptado del hueco
+            if hueco and _error_secuencia(tipo_acceso, anterior, placa):
+                indice, _ = hueco.pop()
+                aceptados = [item for item in aceptados if item[0] != indice]
+                errores[indice] = f'El evento contradice un {tipo_acceso} posterior ya registrado para {placa}'
+            anterior, hueco = tipo_acceso, []
+            continue
+
+        error = _error_secuencia(tipo_acceso, anterior, placa)
+        if error:
+            errores[candidato[0]] = error
+            continue
+        aceptados.append(candidato)
+        hueco.append(candidato)
+        anterior = tipo_acceso
+    return aceptados, errores
+
+
+def _procesar(validos, resultados, vigilante):
+    claves = [datos['clave_idempotencia'] for _, datos in validos]
+    existentes = dict(
+        RegistroAcceso.objects.filter(clave_idempotencia__in=claves).values_list('clave_idempotencia', 'id')
+    )
+
+    pendientes, vistas = [], set()
+    for indice, datos in validos:
+        clave = datos['clave_idempotencia']
+        if clave in existentes:
+            resultados[indice] = _resultado(indice, clave, DUPLICADO, registro_id=existentes[clave])
+        elif clave in vistas:
+            resultados[indice] = _resultado(indice, clave, DUPLICADO, error='Clave repetida dentro del lote')
+        else:
+            vistas.add(clave)
+            pendientes.append((indice, datos))
+    if not pendientes:
+        return []
+
+    desde = min(datos['timestamp'] for _, datos in pendientes)
+    hasta = max(datos['timestamp'] for _, datos in pendientes)
+    vehiculos = _vehiculos({datos['placa'] for _, datos in pendientes}, desde)
+    lineas = _historial(vehiculos.values(), desde)
+    prestamos = _prestamos(list(lineas), desde, hasta)
+
+    # Orden cronológico; a igual timestamp, el orden en que llegaron
+    candidatos = {}
+    for indice, datos in sorted(pendientes, key=lambda item: (item[1]['timestamp'], item[0])):
+        placa = datos['placa']
+        if placa not in vehiculos:
+            resultados[indice] = _resultado(
+                indice, datos['clave_idempotencia'], RECHAZADO,
+                error=f'Vehículo con placa {placa} no está registrado en el sistema',
+            )
+            continue
+        candidatos.setdefault(placa, []).append((indice, datos))
+
+    registros, indices = [], []
+    for placa, eventos_vehiculo in candidatos.items():
+        vehiculo = vehiculos[placa]
+        aceptados, errores = _validar_secuencia(lineas[vehiculo.pk], eventos_vehiculo, placa)
+        for indice, datos in eventos_vehiculo:
+            if indice in errores:
+                resultados[indice] = _resultado(indice, datos['clave_idempotencia'], RECHAZADO, error=errores[indice])
+
+        for indice, datos in aceptados:
+            timestamp = datos['timestamp']
+            prestamo = next(
+                (p for p in prestamos.get(vehiculo.pk, []) if p.fecha_inicio <= timestamp <= p.fecha_fin), None
+            )
+            registros.append(RegistroAcceso(
+                vehiculo=vehiculo,
+                usuario_autorizado_id=prestamo.prestatario_id if prestamo else vehiculo.usuario_id,
+                vigilante=vigilante,
+                tipo_acceso=datos['tipo_acceso'],
+                timestamp=timestamp,
+                metodo=datos['metodo'],
+                placa_detectada=placa,
+                confianza_deteccion=datos.get('confianza_deteccion'),
+                placa_coincide=True,
+                prestamo_relacionado=prestamo,
+                observaciones=datos['observaciones'] or f"Evento {datos['tipo_acceso']} sincronizado desde la puerta",
+                puerta=datos['puerta'],
+                clave_idempotencia=datos['clave_idempotencia'],
+                version_modelo=datos['version_modelo'],
+            ))
+            indices.append(indice)
+
+    if registros:
+        # bulk_create no pasa por save(): ocupación y resúmenes se aplican en bloque
+        RegistroAcceso.objects.bulk_create(registros)
+        if any(registro.pk is None for registro in registros):
+            # Motores que no devuelven los ids insertados
+            ids = dict(RegistroAcceso.objects.filter(
+                clave_idempotencia__in=[registro.clave_idempotencia for registro in registros]
+            ).values_list('clave_idempotencia', 'id'))
+            for registro in registros:
+                registro.pk = ids[registro.clave_idempotencia]
+        aplicar_registros(registros)
+        acumular_registros(registros)
+
+    for indice, registro in zip(indices, registros):
+        resultados[indice] = _resultado(indice, registro.clave_idempotencia, CREADO, registro_id=registro.pk)
+    return registros
+
+
+def ingerir_eventos(eventos, vigilante):
+    """
+    Registra un lote de eventos de acceso de una puerta
+
+    Args:
+        eventos: Lista de dicts con clave_idempotencia, placa, tipo_acceso,
+            timestamp (hora de la puerta) y opcionalmente metodo,
+            confianza_deteccion, puerta y observaciones
+        vigilante: Usuario que sincroniza
+
+    Returns:
+        list: Un resultado por evento, en el orden recibido, con estado
+            'creado', 'duplicado' o 'rechazado' (y registro_id o error)
+    """
+    validos, rechazados = _validar(eventos, timezone.now())
+    for intento in range(2):
+        resultados = dict(rechazados)
+        try:
+            with transaction.atomic():
+                creados = _procesar(validos, resultados, vigilante)
+            break
+        except IntegrityError:
+            # Otro envío del mismo lote insertó alguna clave a la vez: al reintentar son duplicados
+            if intento:
+                raise
+            logger.warning('Claves de idempotencia insertadas en paralelo, reintentando el lote')
+
+    logger.info(
+        f"Sincronización de {len(eventos)} eventos por {vigilante.username}: "
+        f"{len(creados)} creados, {len(eventos) - len(creados)} duplicados o rechazados"
+    )
+    return [resultados[indice] for indice in range(len(eventos))]
@@ -1,3 +1,637 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from usuarios.models import Rol
+
+from .admission import AdmissionController, AdmissionRejected
+from .models import (
+    OcupacionCochera,
+    PrestamoVehiculo,
+    RegistroAcceso,
+    ResumenAccesosDia,
+    ResumenAccesosHora,
+    Vehiculo,
+    VersionModelo,
+)
+from .motion_gate import MotionGate
+from .ocupacion import aplicar_registros, reconstruir_ocupacion
+from .plate_grammar import PlateGrammar
+from .plate_tracker import PlateTracker
+from .resumenes import acumular_registros, reconstruir_resumenes, resumen_dia
+from .sincronizacion import CREADO, DUPLICADO, RECHAZADO, ingerir_eventos
+from .views import admission_controlled
+
+
+class IngerirEventosTests(TestCase):
+    """Sincronización por lotes de accesos registrados sin conexión"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('propietario')
+        cls.vigilante = User.objects.create_user('vigilante')
+        cls.vehiculo = Vehiculo.objects.create(usuario=cls.usuario, marca='Mazda', modelo='3', placa='ABC123')
+        cls.ahora = timezone.now()
+
+    def _hace(self, minutos):
+        return self.ahora - timedelta(minutes=minutos)
+
+    def _registrar(self, tipo_acceso, minutos):
+        return RegistroAcceso.objects.create(
+            vehiculo=self.vehiculo, usuario_autorizado=self.usuario, vigilante=self.vigilante,
+            tipo_acceso=tipo_acceso, timestamp=self._hace(minutos),
+        )
+
+    def _evento(self, clave, tipo_acceso, minutos, placa='ABC123', **datos):
+        return {
+            'clave_idempotencia': clave, 'placa': placa,
+            'tipo_acceso': tipo_acceso, 'timestamp': self._hace(minutos).isoformat(), **datos,
+        }
+
+    def test_visita_sin_conexion_entre_accesos_guardados(self):
+        self._registrar('salida', 40)
+        self._registrar('entrada', 10)
+
+        resultados = ingerir_eventos(
+            [self._evento('e1', 'entrada', 30), self._evento('s1', 'salida', 20)], self.vigilante
+        )
+
+        self.assertEqual([r['estado'] for r in resultados], [CREADO, CREADO])
+        self.assertEqual(
+            list(RegistroAcceso.objects.order_by('timestamp').values_list('tipo_acceso', flat=True)),
+            ['salida', 'entrada', 'salida', 'entrada'],
+        )
+        # La entrada guardada sigue siendo la última: el vehículo está dentro
+        self.assertTrue(OcupacionCochera.objects.filter(vehiculo=self.vehiculo).exists())
+
+    def test_evento_que_contradice_un_acceso_posterior(self):
+        self._registrar('salida', 40)
+        self._registrar('entrada', 10)
+
+        resultados = ingerir_eventos([self._evento('e1', 'entrada', 30)], self.vigilante)
+
+        self.assertEqual(resultados[0]['estado'], RECHAZADO)
+        self.assertIn('posterior', resultados[0]['error'])
+        self.assertEqual(RegistroAcceso.objects.count(), 2)
+
+    def test_secuencia_invalida_dentro_del_lote(self):
+        resultados = ingerir_eventos([
+            self._evento('s0', 'salida', 50),
+            self._evento('e1', 'entrada', 40),
+            self._evento('e2', 'entrada', 30),
+            self._evento('s1', 'salida', 20),
+        ], self.vigilante)
+
+        self.assertEqual(
+            [r['estado'] for r in resultados], [RECHAZADO, CREADO, RECHAZADO, CREADO]
+        )
+        self.assertFalse(OcupacionCochera.objects.filter(vehiculo=self.vehiculo).exists())
+
+    def test_version_del_modelo_de_la_puerta(self):
+        ingerir_eventos([self._evento('e1', 'entrada', 30, version_modelo='placas-v2')], self.vigilante)
+        self.assertEqual(RegistroAcceso.objects.get().version_modelo, 'placas-v2')
+
+    def test_placa_no_registrada(self):
+        resultados = ingerir_eventos([self._evento('x1', 'entrada', 5, placa='ZZZ999')], self.vigilante)
+        self.assertEqual(resultados[0]['estado'], RECHAZADO)
+
+    def test_reenviar_el_lote_no_duplica(self):
+        eventos = [self._evento('e1', 'entrada', 30), self._evento('s1', 'salida', 20)]
+        primera = ingerir_eventos(eventos, self.vigilante)
+        segunda = ingerir_eventos(eventos, self.vigilante)
+
+        self.assertEqual([r['estado'] for r in segunda], [DUPLICADO, DUPLICADO])
+        self.assertEqual(
+            [r['registro_id'] for r in segunda], [r['registro_id'] for r in primera]
+        )
+        self.assertEqual(RegistroAcceso.objects.count(), 2)
+
+    def test_clave_repetida_dentro_del_lote(self):
+        resultados = ingerir_eventos(
+            [self._evento('e1', 'entrada', 30), self._evento('e1', 'entrada', 30)], self.vigilante
+        )
+        self.assertEqual([r['estado'] for r in resultados], [CREADO, DUPLICADO])
+        self.assertEqual(RegistroAcceso.objects.count(), 1)
+
+
+class RegistrarAccesoVigilanteTests(TestCase):
+    """El registro de un acceso detectado guarda la versión del modelo que leyó la placa"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vigilante = User.objects.create_user('vigilante')
+        cls.vigilante.perfil.rol = Rol.objects.create(nombre=Rol.VIGILANTE)
+        cls.vigilante.perfil.save()
+        cls.vehiculo = Vehiculo.objects.create(
+            usuario=User.objects.create_user('propietario'), marca='Mazda', modelo='3', placa='ABC123'
+        )
+        VersionModelo.objects.create(nombre='placas-v3', ruta_modelo='placas-v3.pt', activa=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.vigilante)
+
+    def _registrar(self, tipo_acceso, **datos):
+        return self.client.post('/vehiculos/api/vigilante/registrar-acceso/', {
+            'placa_detectada': 'ABC123', 'tipo_acceso': tipo_acceso, 'confianza_deteccion': '0.9', **datos,
+        })
+
+    def test_version_del_modelo_guardada(self):
+        respuesta = self._registrar('entrada', version_modelo='placas-v2')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(RegistroAcceso.objects.get(pk=respuesta.json()['registro_id']).version_modelo, 'placas-v2')
+
+        # Sin version_modelo en la petición: la versión activa
+        respuesta = self._registrar('salida')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['registro']['version_modelo'], 'placas-v3')
+
+
+class ListadoAccesosConsultasTests(TestCase):
+    """Cada página del historial de accesos cuesta las mismas consultas sin importar su tamaño"""
+
+    @classmethod
+    def setUpTestData(cls):
+        vigilante = Rol.objects.create(nombre=Rol.VIGILANTE)
+        cls.usuario = User.objects.create_user('propietario')
+        cls.vigilante = User.objects.create_user('vigilante')
+        cls.vigilante.perfil.rol = vigilante
+        cls.vigilante.perfil.save()
+
+        ahora = timezone.now()
+        vehiculos = [
+            Vehiculo.objects.create(usuario=cls.usuario, marca='Mazda', modelo='3', placa=f'ABC{i:03d}')
+            for i in range(3)
+        ]
+        prestamo = PrestamoVehiculo.objects.create(
+            vehiculo=vehiculos[0], prestador=cls.usuario, prestatario=cls.vigilante, estado='activo',
+            fecha_inicio=ahora - timedelta(days=1), fecha_fin=ahora + timedelta(days=1),
+        )
+        RegistroAcceso.objects.bulk_create([
+            RegistroAcceso(
+                vehiculo=vehiculos[i % 3], usuario_autorizado=cls.usuario, vigilante=cls.vigilante,
+                tipo_acceso='entrada' if i % 2 else 'salida', timestamp=ahora - timedelta(minutes=i),
+                prestamo_relacionado=prestamo if i % 3 == 0 else None, puerta='norte',
+            )
+            for i in range(60)
+        ])
+
+    def _listar(self, usuario, url, consultas, limit):
+        client = APIClient()
+        # Usuario recién leído: el perfil y el rol no vienen en caché de otra petición
+        client.force_authenticate(User.objects.get(pk=usuario.pk))
+        with self.assertNumQueries(consultas):
+            response = client.get(url, {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return response.data
+
+    def test_listado_vigilante(self):
+        # perfil, rol y la página
+        for limit in (5, 50):
+            self._listar(self.vigilante, '/vehiculos/api/accesos/', 3, limit)
+
+    def test_listado_propietario(self):
+        # perfil (sin rol), ids de sus vehículos y la página
+        for limit in (5, 50):
+            self._listar(self.usuario, '/vehiculos/api/accesos/', 3, limit)
+
+    def test_siguiente_pagina(self):
+        primera = self._listar(self.vigilante, '/vehiculos/api/accesos/', 3, 20)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.vigilante.pk))
+        with self.assertNumQueries(3):
+            segunda = client.get('/vehiculos/api/accesos/', {'limit': 20, 'cursor': primera['cursor']}).data
+        ids = [registro['id'] for registro in primera['results'] + segunda['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_mis_accesos(self):
+        # Solo la página: mis_accesos no consulta el perfil
+        for limit in (5, 50):
+            self._listar(self.usuario, '/vehiculos/api/accesos/mis_accesos/', 1, limit)
+
+
+class OcupacionIncrementalTests(TestCase):
+    """La ocupación mantenida en cada acceso coincide con la reconstruida desde el historial"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('propietario')
+        cls.vehiculos = [
+            Vehiculo.objects.create(usuario=cls.usuario, marca='Mazda', modelo='3', placa=f'OCU{i:03d}')
+            for i in range(4)
+        ]
+        cls.ahora = timezone.now()
+
+    def _registro(self, vehiculo, tipo_acceso, minutos):
+        return RegistroAcceso(
+            vehiculo=vehiculo, usuario_autorizado=self.usuario, vigilante=self.usuario,
+            tipo_acceso=tipo_acceso, timestamp=self.ahora - timedelta(minutes=minutos),
+        )
+
+    def _ocupacion(self):
+        return sorted(OcupacionCochera.objects.values_list('vehiculo_id', 'registro_entrada_id', 'fecha_entrada'))
+
+    def _verificar_reconstruccion(self):
+        incremental = self._ocupacion()
+        reconstruir_ocupacion()
+        self.assertEqual(incremental, self._ocupacion())
+
+    def test_accesos_guardados_uno_a_uno(self):
+        a, b, c, _ = self.vehiculos
+        for vehiculo, tipo_acceso, minutos in [
+            (a, 'entrada', 50), (b, 'entrada', 45), (a, 'salida', 40),
+            (c, 'entrada', 30), (a, 'entrada', 20), (b, 'salida', 10),
+        ]:
+            self._registro(vehiculo, tipo_acceso, minutos).save()
+
+        self.assertEqual(
+            sorted(OcupacionCochera.objects.values_list('vehiculo_id', flat=True)), sorted([a.pk, c.pk])
+        )
+        self._verificar_reconstruccion()
+
+    def test_lote_despues_de_bulk_create(self):
+        a, b, c, d = self.vehiculos
+        registros = RegistroAcceso.objects.bulk_create([
+            self._registro(a, 'entrada', 50), self._registro(a, 'salida', 40),
+            self._registro(b, 'entrada', 30), self._registro(c, 'salida', 20),
+            self._registro(c, 'entrada', 25), self._registro(d, 'entrada', 5),
+        ])
+        aplicar_registros(registros)
+
+        self.assertEqual(
+            sorted(OcupacionCochera.objects.values_list('vehiculo_id', flat=True)), sorted([b.pk, d.pk])
+        )
+        self._verificar_reconstruccion()
+
+    def test_acceso_anterior_al_ultimo_no_cambia_la_ocupacion(self):
+        a = self.vehiculos[0]
+        self._registro(a, 'entrada', 10).save()
+        # Llega tarde (p. ej. sincronizado sin conexión) un acceso de antes
+        self._registro(a, 'salida', 30).save()
+
+        self.assertTrue(OcupacionCochera.objects.filter(vehiculo=a).exists())
+        self._verificar_reconstruccion()
+
+    def test_editar_acceso_recalcula_la_ocupacion(self):
+        a, b = self.vehiculos[:2]
+        self._registro(a, 'entrada', 20).save()
+        salida = self._registro(a, 'salida', 10)
+        salida.save()
+
+        salida.tipo_acceso = 'entrada'
+        salida.save()
+        self.assertEqual(OcupacionCochera.objects.get(vehiculo=a).registro_entrada, salida)
+        self._verificar_reconstruccion()
+
+        # Asignado a otro vehículo: 'a' vuelve a su entrada anterior y 'b' queda dentro
+        salida.vehiculo = b
+        salida.save()
+        self.assertEqual(
+            sorted(OcupacionCochera.objects.values_list('vehiculo_id', flat=True)), sorted([a.pk, b.pk])
+        )
+        self._verificar_reconstruccion()
+
+    def test_eliminar_acceso_recalcula_la_ocupacion(self):
+        a = self.vehiculos[0]
+        entrada = self._registro(a, 'entrada', 20)
+        entrada.save()
+        salida = self._registro(a, 'salida', 10)
+        salida.save()
+
+        salida.delete()
+        self.assertEqual(OcupacionCochera.objects.get(vehiculo=a).registro_entrada, entrada)
+        self._verificar_reconstruccion()
+
+        RegistroAcceso.objects.filter(pk=entrada.pk).delete()
+        self.assertFalse(OcupacionCochera.objects.filter(vehiculo=a).exists())
+        self._verificar_reconstruccion()
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class OcupacionConcurrenteTests(TransactionTestCase):
+    """Dos entradas simultáneas de un vehículo sin ocupación no chocan al crear la fila"""
+
+    def test_entradas_simultaneas_del_mismo_vehiculo(self):
+        usuario = User.objects.create_user('propietario')
+        vehiculo = Vehiculo.objects.create(usuario=usuario, marca='Mazda', modelo='3', placa='CON001')
+        ahora = timezone.now()
+        barrera = threading.Barrier(2)
+        errores = []
+
+        def registrar(minutos):
+            try:
+                barrera.wait()
+                RegistroAcceso(
+                    vehiculo=vehiculo, usuario_autorizado=usuario, vigilante=usuario,
+                    tipo_acceso='entrada', timestamp=ahora - timedelta(minutes=minutos),
+                ).save()
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=registrar, args=(minutos,)) for minutos in (10, 5)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        ocupacion = OcupacionCochera.objects.get(vehiculo=vehiculo)
+        self.assertEqual(ocupacion.registro_entrada, RegistroAcceso.objects.order_by('-timestamp').first())
+
+
+class ResumenesAccesosTests(TestCase):
+    """Los resúmenes acumulados en cada acceso coinciden con los recalculados desde el historial"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('propietario')
+        cls.vehiculos = [
+            Vehiculo.objects.create(usuario=cls.usuario, marca='Mazda', modelo='3', placa=f'RES{i:03d}')
+            for i in range(3)
+        ]
+        # Cerca de medianoche para que los accesos caigan en dos días y varias horas
+        cls.base = timezone.make_aware(datetime(2026, 3, 10, 22, 30))
+
+    def _registro(self, vehiculo, tipo_acceso, minutos):
+        return RegistroAcceso(
+            vehiculo=vehiculo, usuario_autorizado=self.usuario, vigilante=self.usuario,
+            tipo_acceso=tipo_acceso, timestamp=self.base + timedelta(minutes=minutos),
+        )
+
+    def _resumenes(self):
+        return (
+            sorted(ResumenAccesosDia.objects.values_list('fecha', 'entradas', 'salidas', 'vehiculos_unicos')),
+            sorted(ResumenAccesosHora.objects.values_list('hora', 'entradas', 'salidas', 'vehiculos_unicos')),
+        )
+
+    def _verificar_reconstruccion(self):
+        acumulados = self._resumenes()
+        reconstruir_resumenes()
+        self.assertEqual(acumulados, self._resumenes())
+
+    def test_accesos_guardados_uno_a_uno(self):
+        a, b, c = self.vehiculos
+        for vehiculo, tipo_acceso, minutos in [
+            (a, 'entrada', 0), (b, 'entrada', 10), (a, 'salida', 20), (a, 'entrada', 40),
+            (c, 'entrada', 70), (b, 'salida', 95), (a, 'salida', 100), (c, 'salida', 160),
+        ]:
+            self._registro(vehiculo, tipo_acceso, minutos).save()
+
+        self.assertEqual(
+            resumen_dia(self.base.date()), {'entradas': 4, 'salidas': 1, 'vehiculos_unicos': 3}
+        )
+        self._verificar_reconstruccion()
+
+    def test_lote_con_accesos_fuera_de_orden(self):
+        a, b, c = self.vehiculos
+        self._registro(a, 'entrada', 0).save()
+        self._registro(b, 'entrada', 90).save()
+        # Un lote sincronizado tarde: accesos anteriores y posteriores a los ya guardados
+        registros = RegistroAcceso.objects.bulk_create([
+            self._registro(a, 'salida', -30), self._registro(a, 'entrada', -40),
+            self._registro(b, 'salida', 120), self._registro(c, 'entrada', 5),
+        ])
+        acumular_registros(registros)
+
+        self._verificar_reconstruccion()
+
+    def test_editar_y_eliminar_accesos_recalcula_los_resumenes(self):
+        a, b, c = self.vehiculos
+        registros = [
+            self._registro(vehiculo, tipo_acceso, minutos)
+            for vehiculo, tipo_acceso, minutos in [(a, 'entrada', 0), (b, 'entrada', 10), (c, 'entrada', 100)]
+        ]
+        for registro in registros:
+            registro.save()
+
+        registros[1].tipo_acceso = 'salida'
+        registros[1].vehiculo = a
+        registros[1].save()
+        self.assertEqual(
+            resumen_dia(self.base.date()), {'entradas': 1, 'salidas': 1, 'vehiculos_unicos': 1}
+        )
+        self._verificar_reconstruccion()
+
+        # La única de su hora y de su día: las filas desaparecen, como al reconstruir
+        registros[2].delete()
+        self.assertFalse(ResumenAccesosDia.objects.filter(fecha=(self.base + timedelta(days=1)).date()).exists())
+        self._verificar_reconstruccion()
+
+    def test_reconstruir_desde_una_fecha(self):
+        a, b, _ = self.vehiculos
+        for vehiculo, tipo_acceso, minutos in [(a, 'entrada', 0), (b, 'entrada', 100), (a, 'salida', 110)]:
+            self._registro(vehiculo, tipo_acceso, minutos).save()
+        acumulados = self._resumenes()
+
+        reconstruir_resumenes(desde=(self.base + timedelta(days=1)).date())
+        self.assertEqual(acumulados, self._resumenes())
+
+
+class PlateGrammarTests(SimpleTestCase):
+    """Corrección de confusiones del OCR según el formato de cada región"""
+
+    CONFUSIONES = [('O', '0'), ('I', '1'), ('B', '8')]
+
+    def test_confusiones_en_ambos_sentidos(self):
+        gramatica = PlateGrammar({'carro': ['^[A-Z]{3}[0-9]{3}$']}, self.CONFUSIONES, max_substitutions=3)
+
+        # Letras leídas como números en la parte de letras y al revés en la de números
+        self.assertEqual(gramatica.best('0IB1B3'), 'OIB183')
+        self.assertEqual(gramatica.best('AB1I0B'), 'ABI108')
+        # Un carácter sin confusión posible no se corrige
+        self.assertIsNone(gramatica.best('AB7123'))
+
+    def test_limite_de_sustituciones(self):
+        gramatica = PlateGrammar({'carro': ['^[A-Z]{3}[0-9]{3}$']}, self.CONFUSIONES, max_substitutions=1)
+        self.assertEqual(gramatica.best('0BC123'), 'OBC123')
+        self.assertIsNone(gramatica.best('0BC12B'))
+
+    def test_region_de_la_lectura(self):
+        gramatica = PlateGrammar(
+            {'carro': ['^[A-Z]{3}[0-9]{3}$'], 'moto': ['^[A-Z]{3}[0-9]{2}[A-Z]$']},
+            self.CONFUSIONES, max_substitutions=3,
+        )
+        self.assertEqual(gramatica.match_region('ABC123'), 'carro')
+        self.assertEqual(gramatica.match_region('ABC12D'), 'moto')
+
+        # Como moto basta corregir el 0; como carro también habría que cambiar la B final
+        mejor = gramatica.candidates('0BC12B')[0]
+        self.assertEqual((mejor.text, mejor.region, mejor.substitutions), ('OBC12B', 'moto', 1))
+
+    def test_desempate_en_best(self):
+        gramatica = PlateGrammar(
+            {'numeros': ['^[0-9]{2}$'], 'letras': ['^[A-Z]{2}$']}, self.CONFUSIONES, max_substitutions=2,
+        )
+        # Se corrige el carácter leído con menos confianza
+        self.assertEqual(gramatica.best('0B', [0.9, 0.2]), '08')
+        self.assertEqual(gramatica.best('0B', [0.2, 0.9]), 'OB')
+        # A igual costo gana el texto menor, siempre el mismo
+        self.assertEqual(gramatica.best('0B'), '08')
+        self.assertEqual([c.text for c in gramatica.candidates('0B')], ['08', 'OB'])
+
+
+class MotionGateTests(SimpleTestCase):
+    """Solo se reutiliza el resultado de un frame detectado y confirmado con commit()"""
+
+    def setUp(self):
+        self.gate = MotionGate(downscale_width=16, pixel_threshold=25, min_changed_ratio=0.01, max_skip_seconds=None)
+        self.vacio = np.zeros((48, 64, 3), dtype=np.uint8)
+        self.carro = self.vacio.copy()
+        self.carro[16:32, 16:48] = 200
+
+    def test_frame_igual_reutiliza_el_resultado_confirmado(self):
+        firma, anterior = self.gate.check(self.vacio)
+        self.assertIsNone(anterior)
+        self.gate.commit(firma, {'plates_detected': []}, 0.05)
+
+        _, anterior = self.gate.check(self.vacio.copy())
+        self.assertEqual(anterior, {'plates_detected': []})
+        _, anterior = self.gate.check(self.carro)
+        self.assertIsNone(anterior)
+        self.assertEqual(self.gate.stats()['frames_skipped'], 1)
+
+    def test_check_sin_commit_no_mueve_la_referencia(self):
+        firma, _ = self.gate.check(self.vacio)
+        self.gate.commit(firma, {'plates_detected': []}, 0.05)
+
+        # La detección del carro falló: la referencia sigue siendo el carril vacío
+        self.gate.check(self.carro)
+        _, anterior = self.gate.check(self.carro)
+        self.assertIsNone(anterior)
+        _, anterior = self.gate.check(self.vacio)
+        self.assertEqual(anterior, {'plates_detected': []})
+
+    def test_invalidate_obliga_a_detectar(self):
+        firma, _ = self.gate.check(self.carro)
+        self.gate.commit(firma, {'plates_detected': ['ABC123']}, 0.05)
+        self.gate.invalidate()
+
+        firma, anterior = self.gate.check(self.carro)
+        self.assertIsNone(anterior)
+        self.gate.commit(firma, {'plates_detected': ['ABC124']}, 0.05)
+        _, anterior = self.gate.check(self.carro)
+        self.assertEqual(anterior, {'plates_detected': ['ABC124']})
+
+
+class PlateTrackerTests(SimpleTestCase):
+    """Pistas de placas entre frames: votación de lecturas y cierre de pistas viejas"""
+
+    CAJA = (100, 200, 220, 240)
+
+    def setUp(self):
+        self.tracker = PlateTracker(
+            iou_threshold=0.3, max_centroid_distance=1.0, max_missed=5,
+            reocr_confidence_margin=0.1, retry_interval=5, max_age_seconds=2.0,
+        )
+        self.ahora = 1000.0
+        reloj = mock.patch('vehiculos.plate_tracker.time.monotonic', side_effect=lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def _frame(self, *detecciones, segundos=0.1):
+        self.ahora += segundos
+        return self.tracker.update(list(detecciones))
+
+    def test_votacion_por_caracter(self):
+        [(pista, necesita_ocr)] = self._frame((self.CAJA, 0.8))
+        self.assertTrue(necesita_ocr)
+        self.tracker.add_reading(pista, 'ABC123', 0.8)
+
+        # Sin mejora de confianza la misma pista no vuelve al OCR
+        [(misma, necesita_ocr)] = self._frame(((102, 201, 222, 241), 0.82))
+        self.assertIs(misma, pista)
+        self.assertFalse(necesita_ocr)
+
+        # Un error aislado del OCR pierde la votación
+        self.tracker.add_reading(pista, 'ABC128', 0.5)
+        self.tracker.add_reading(pista, 'ABC123', 0.4)
+        self.assertEqual(self.tracker.describe([pista])[0][1], 'ABC123')
+
+    def test_pista_vieja_no_se_reutiliza(self):
+        [(pista, _)] = self._frame((self.CAJA, 0.8))
+        self.tracker.add_reading(pista, 'ABC123', 0.8)
+
+        [(nueva, necesita_ocr)] = self._frame((self.CAJA, 0.8), segundos=2.5)
+        self.assertNotEqual(nueva.track_id, pista.track_id)
+        self.assertTrue(necesita_ocr)
+        self.assertIsNone(nueva.plate)
+
+    def test_pista_reasociada_tras_frames_perdidos_se_lee_de_nuevo(self):
+        [(pista, _)] = self._frame((self.CAJA, 0.8))
+        self.tracker.add_reading(pista, 'ABC123', 0.8)
+        self._frame()
+
+        [(misma, necesita_ocr)] = self._frame((self.CAJA, 0.8))
+        self.assertIs(misma, pista)
+        self.assertTrue(necesita_ocr)
+        self.assertIsNone(misma.plate)
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    """Rechazo inmediato con Retry-After cuando no hay turno a tiempo"""
+
+    def _ocupado(self, max_concurrent=1, max_queue=4, tiempo_servicio=3.0):
+        # Un turno ya medido (tiempo_servicio) y todos los turnos ocupados
+        controlador = AdmissionController(max_concurrent=max_concurrent, max_queue=max_queue, max_queue_wait=2.0)
+        controlador.acquire()
+        controlador.release(tiempo_servicio)
+        for _ in range(max_concurrent):
+            controlador.acquire()
+        return controlador
+
+    def test_cola_llena(self):
+        controlador = self._ocupado(max_queue=0)
+        with self.assertRaises(AdmissionRejected) as rechazo:
+            controlador.acquire()
+        self.assertEqual(rechazo.exception.reason, 'Cola de detección llena')
+        self.assertEqual(controlador.stats()['rejected_queue_full'], 1)
+
+    def test_espera_prevista_mayor_que_la_permitida(self):
+        # Con 3 s por detección el turno llegaría después de los 2 s permitidos
+        controlador = self._ocupado()
+        with self.assertRaises(AdmissionRejected) as rechazo:
+            controlador.acquire()
+        self.assertEqual(rechazo.exception.reason, 'Espera prevista mayor que la permitida')
+        self.assertEqual(controlador.stats()['queue_depth'], 0)
+
+        # Con un plazo más corto que la espera prevista tampoco se encola
+        rapido = self._ocupado(tiempo_servicio=0.5)
+        with self.assertRaises(AdmissionRejected):
+            rapido.acquire(max_wait=0.1)
+        self.assertEqual(rapido.stats()['rejected_expected_wait'], 1)
+
+    def test_retry_after_segun_la_carga(self):
+        # Dos rondas de 3 s (la ocupada y la de la nueva petición)
+        self.assertEqual(self._ocupado().retry_after(), 6)
+        # Con dos turnos: la nueva petición cabe en la segunda ronda
+        self.assertEqual(self._ocupado(max_concurrent=2).retry_after(), 6)
+        self.assertEqual(AdmissionController(max_concurrent=1).retry_after(), 1)
+
+    def test_respuesta_503_con_retry_after(self):
+        controlador = self._ocupado()
+        llamadas = []
+
+        @admission_controlled
+        def detectar(request):
+            llamadas.append(request)
+
+        request = Request(APIRequestFactory().post('/', {}, format='json'), parsers=[JSONParser()])
+        with mock.patch('vehiculos.views.get_admission_controller', return_value=controlador):
+            respuesta = detectar(request)
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta['Retry-After'], '6')
+        self.assertEqual(llamadas, [])
@@ -19,9 +19,17 @@ urlpatterns = [
     path('api/vigilante/estadisticas/', views.vigilante_estadisticas, name='vigilante_estadisticas'),
     path('api/vigilante/detectar-placa/', views.vigilante_detectar_placa, name='vigilante_detectar_placa'),
     path('api/vigilante/registrar-acceso/', views.vigilante_registrar_acceso, name='vigilante_registrar_acceso'),
+    path('api/vigilante/sincronizar-accesos/', views.vigilante_sincronizar_accesos, name='vigilante_sincronizar_accesos'),
     path('api/vigilante/vehiculos-cochera/', views.vigilante_vehiculos_cochera, name='vigilante_vehiculos_cochera'),
     path('api/vigilante/buscar-vehiculo/', views.vigilante_buscar_vehiculo, name='vigilante_buscar_vehiculo'),
     
+    # Detección asíncrona (cola de trabajos procesada por manage.py detection_worker)
+    path('api/deteccion/trabajos/', views.crear_trabajo_deteccion, name='crear_trabajo_deteccion'),
+    path('api/deteccion/trabajos/<uuid:trabajo_id>/', views.estado_trabajo_deteccion, name='estado_trabajo_deteccion'),
+    
+    # Métricas del servicio de detección
+    path('api/deteccion/metricas/', views.metricas_deteccion, name='metricas_deteccion'),
+    
     # URLs del router
     path('', include(router.urls)),
 ]
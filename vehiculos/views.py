@@ -6,31 +6,108 @@ from .forms import VehiculoForm
 
 # Importaciones para API REST
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, action, parser_classes
+from rest_framework.decorators import api_view, action, parser_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models import Q, Count
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+import os
+import sys
 import json
+import functools
+from collections import Counter
+import time
 import logging
 
 from .serializers import (
     VehiculoSerializer, 
     PrestamoVehiculoSerializer, 
     RegistroAccesoSerializer,
-    RegistroAccesoCreateSerializer
+    RegistroAccesoCreateSerializer,
+    PRESTAMO_RELACIONES,
+    PRESTAMO_VALUES,
+    REGISTRO_ACCESO_RELACIONES,
+    REGISTRO_ACCESO_VALUES,
+    serialize_prestamos,
+    serialize_registros_acceso,
 )
-from .models import Vehiculo, PrestamoVehiculo, RegistroAcceso
-from .plate_detection import detect_plate_from_upload, CameraManager
+from .models import Vehiculo, PrestamoVehiculo, RegistroAcceso, TrabajoDeteccion, OcupacionCochera
+from .config import PERFORMANCE_CONFIG, DETECTION_JOBS_CONFIG, OFFLINE_SYNC_CONFIG
+from .detection_jobs import enqueue_detection_job, job_payload
+from .ocupacion import esta_en_cochera, vehiculos_en_cochera
+from .pagination import KeysetPagination
+from .resumenes import accesos_por_hora, resumen_dia, totales_desde
+from .sincronizacion import CREADO, DUPLICADO, RECHAZADO, ingerir_eventos
+from .model_registry import model_registry
+from .inference_scheduler import scheduler_stats
+from .model_versions import active_version_name
+from .ocr_pool import ocr_pool_stats
+from .prefork import memory_usage
+from .deadline import parse_deadline_ms
+from .admission import AdmissionRejected, get_admission_controller, admission_stats
+# plate_detection (OpenCV, NumPy y el modelo) se importa dentro de las vistas
+# que detectan: migrate, el admin y los workers que no detectan no lo cargan
 
 logger = logging.getLogger(__name__)
 
+
+def _request_deadline(request):
+    """
+    Plazo de respuesta pedido con deadline_ms (cuerpo o query string)
+
+    Se cuenta desde que la petición llega a la vista, antes de la cola de
+    admisión, así la espera de turno también consume el plazo.
+
+    Raises:
+        ValueError: Si deadline_ms no es válido
+    """
+    if not hasattr(request, '_detection_deadline'):
+        value = request.data.get('deadline_ms') or request.query_params.get('deadline_ms')
+        request._detection_deadline = parse_deadline_ms(value)
+    return request._detection_deadline
+
+
+def admission_controlled(view):
+    """
+    Limita las detecciones simultáneas del proceso (ver vehiculos.admission)
+
+    Si no hay turno disponible a tiempo responde 503 con Retry-After, en vez
+    de dejar la petición ocupando un hilo hasta expirar. Se aplica a la parte
+    de la vista que detecta, después de validar permisos y datos: una
+    petición que va a recibir 403 o 400 no ocupa turno.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if hasattr(arg, 'META'))
+        try:
+            deadline = _request_deadline(request)
+        except ValueError:
+            # La vista responde 400 con el detalle
+            deadline = None
+        
+        try:
+            with get_admission_controller().admit(deadline.remaining() if deadline else None):
+                return view(*args, **kwargs)
+        except AdmissionRejected as e:
+            logger.warning(f"Detección rechazada por sobrecarga: {e.reason}")
+            response = JsonResponse({
+                'success': False,
+                'error': 'Servicio de detección saturado, intenta de nuevo',
+                'motivo': e.reason,
+                'retry_after': e.retry_after,
+                'plates_detected': [],
+            }, status=503)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+    return wrapper
+
 # Vistas existentes para renderizado HTML
 @login_required
 def lista_vehiculos(request):
@@ -89,6 +166,11 @@ class VehiculoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def detect_plate(self, request, pk=None):
         """Detecta placa en una foto del vehículo"""
+        try:
+            deadline = _request_deadline(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         vehiculo = self.get_object()
         
         if 'image' not in request.FILES:
@@ -97,8 +179,46 @@ class VehiculoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        return self._detect_plate(request, deadline)
+
+    @admission_controlled
+    def _detect_plate(self, request, deadline):
+        try:
+            from .plate_detection import detect_plate_from_upload
+            detection_result = detect_plate_from_upload(request.FILES['image'], deadline)
+            return Response(detection_result)
+        except Exception as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=True, methods=['post'])
+    def detect_plate_batch(self, request, pk=None):
+        """Detecta placa en una ráfaga de fotos del vehículo en una sola petición"""
+        vehiculo = self.get_object()
+        
+        images = request.FILES.getlist('images')
+        if not images:
+            return Response(
+                {'error': 'Se requiere al menos una imagen en el campo "images"'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        max_images = PERFORMANCE_CONFIG['max_batch_images']
+        if len(images) > max_images:
+            return Response(
+                {'error': f'Se permiten como máximo {max_images} imágenes por petición'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return self._detect_plate_batch(request, images)
+
+    @admission_controlled
+    def _detect_plate_batch(self, request, images):
         try:
-            detection_result = detect_plate_from_upload(request.FILES['image'])
+            from .plate_detection import detect_plates_from_uploads
+            detection_result = detect_plates_from_uploads(images)
             return Response(detection_result)
         except Exception as e:
             return Response(
@@ -116,7 +236,12 @@ class PrestamoVehiculoViewSet(viewsets.ModelViewSet):
         # Usuario puede ver préstamos donde es prestador o prestatario
         return PrestamoVehiculo.objects.filter(
             Q(prestador=user) | Q(prestatario=user)
-        ).order_by('-fecha_solicitud')
+        ).select_related(*PRESTAMO_RELACIONES).order_by('-fecha_solicitud')
+
+    def list(self, request, *args, **kwargs):
+        # Listado de solo lectura: una consulta values() en lugar de varias por préstamo
+        prestamos = self.filter_queryset(self.get_queryset()).values(*PRESTAMO_VALUES)
+        return Response(serialize_prestamos(prestamos, request))
 
     def perform_create(self, serializer):
         # El usuario actual es el prestador
@@ -178,38 +303,114 @@ class PrestamoVehiculoViewSet(viewsets.ModelViewSet):
         prestamos_recibidos = self.get_queryset().filter(prestatario=user)
         
         return Response({
-            'prestamos_otorgados': self.get_serializer(prestamos_otorgados, many=True).data,
-            'prestamos_recibidos': self.get_serializer(prestamos_recibidos, many=True).data
+            'prestamos_otorgados': serialize_prestamos(prestamos_otorgados.values(*PRESTAMO_VALUES), request),
+            'prestamos_recibidos': serialize_prestamos(prestamos_recibidos.values(*PRESTAMO_VALUES), request)
         })
 
 
 class RegistroAccesoViewSet(viewsets.ReadOnlyModelViewSet):
-    """Vista de solo lectura para registros de acceso"""
+    """
+    Vista de solo lectura para registros de acceso
+
+    Paginada por cursor sobre (timestamp, id) y con filtros que usan los
+    índices de RegistroAcceso: fecha_desde, fecha_hasta, fecha, vehiculo,
+    placa, puerta y tipo_acceso.
+    """
     serializer_class = RegistroAccesoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         
         # Si es vigilante, puede ver todos los registros
+        registros = RegistroAcceso.objects.select_related(*REGISTRO_ACCESO_RELACIONES)
         if hasattr(user, 'perfil') and user.perfil.rol and user.perfil.rol.nombre == 'vigilante':
-            return RegistroAcceso.objects.all().order_by('-timestamp')
+            return registros
         
         # Usuarios normales solo ven registros de sus vehículos
-        return RegistroAcceso.objects.filter(
-            Q(vehiculo__usuario=user) | Q(usuario_autorizado=user)
-        ).order_by('-timestamp')
+        # (ids resueltos antes para no unir con Vehiculo en cada página)
+        vehiculos_propios = list(Vehiculo.objects.filter(usuario=user).values_list('id', flat=True))
+        return registros.filter(
+            Q(vehiculo_id__in=vehiculos_propios) | Q(usuario_autorizado=user)
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self._listado_rapido(self.filter_queryset(self.get_queryset()))
+
+    def _listado_rapido(self, registros):
+        # Cada página es una sola consulta values(); el detalle usa el serializer
+        page = self.paginate_queryset(registros.values(*REGISTRO_ACCESO_VALUES))
+        return self.get_paginated_response(serialize_registros_acceso(page, self.request))
+
+    def filter_queryset(self, queryset):
+        params = self.request.query_params
+        
+        fecha = params.get('fecha')
+        desde = _parse_fecha(params.get('fecha_desde') or fecha, 'fecha_desde')
+        hasta = _parse_fecha(params.get('fecha_hasta') or fecha, 'fecha_hasta', fin=True)
+        if desde is not None:
+            queryset = queryset.filter(timestamp__gte=desde)
+        if hasta is not None:
+            queryset = queryset.filter(timestamp__lt=hasta)
+        
+        tipo_acceso = params.get('tipo_acceso')
+        if tipo_acceso:
+            if tipo_acceso not in dict(RegistroAcceso.TIPO_ACCESO_CHOICES):
+                raise ValidationError({'tipo_acceso': 'Debe ser "entrada" o "salida"'})
+            queryset = queryset.filter(tipo_acceso=tipo_acceso)
+        
+        vehiculo = params.get('vehiculo')
+        if vehiculo:
+            if not vehiculo.isdigit():
+                raise ValidationError({'vehiculo': 'Debe ser el id del vehículo'})
+            queryset = queryset.filter(vehiculo_id=int(vehiculo))
+        
+        placa = (params.get('placa') or params.get('vehiculo__placa') or '').strip().upper()
+        if placa:
+            # La placa es única: se resuelve a su id y se filtra por el índice (vehiculo, timestamp, id)
+            queryset = queryset.filter(vehiculo_id__in=list(
+                Vehiculo.objects.filter(placa=placa).values_list('id', flat=True)
+            ))
+        
+        puerta = params.get('puerta')
+        if puerta:
+            queryset = queryset.filter(puerta=puerta)
+        
+        return queryset
 
     @action(detail=False, methods=['get'])
     def mis_accesos(self, request):
         """Obtiene registros de acceso del usuario actual"""
         user = request.user
-        registros = RegistroAcceso.objects.filter(
+        registros = self.filter_queryset(RegistroAcceso.objects.filter(
             usuario_autorizado=user
-        ).order_by('-timestamp')
-        
-        serializer = self.get_serializer(registros, many=True)
-        return Response(serializer.data)
+        ))
+        return self._listado_rapido(registros)
+
+
+def _parse_fecha(value, parametro, fin=False):
+    """
+    Convierte un filtro de fecha (AAAA-MM-DD o fecha y hora ISO) en un instante
+
+    Args:
+        fin: Si es solo fecha, devolver el inicio del día siguiente (límite exclusivo)
+
+    Raises:
+        ValidationError: Si el valor no es una fecha válida
+    """
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            dia = date.fromisoformat(value)
+            if fin:
+                dia += timedelta(days=1)
+            return timezone.make_aware(datetime.combine(dia, datetime.min.time()))
+        instante = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({parametro: 'Usa AAAA-MM-DD o fecha y hora ISO 8601'})
+    return instante if timezone.is_aware(instante) else timezone.make_aware(instante)
 
 
 # Vistas específicas para vigilantes
@@ -252,6 +453,11 @@ def detectar_placa_camara(request):
     Detecta placa desde cámara en tiempo real
     Solo para vigilantes
     """
+    try:
+        deadline = _request_deadline(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
     # Verificar permisos de vigilante
     if not hasattr(request.user, 'perfil') or not request.user.perfil.rol:
         return Response(
@@ -265,9 +471,15 @@ def detectar_placa_camara(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
+    return _detectar_placa_camara(request, deadline)
+
+
+@admission_controlled
+def _detectar_placa_camara(request, deadline):
     try:
+        from .plate_detection import CameraManager
         camera = CameraManager()
-        result = camera.detect_plates_in_frame()
+        result = camera.detect_plates_in_frame(deadline)
         camera.release()
         
         if result:
@@ -286,6 +498,111 @@ def detectar_placa_camara(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def crear_trabajo_deteccion(request):
+    """
+    Encola la detección de placa de una imagen y responde de inmediato con el id del trabajo
+    Endpoint: /vehiculos/api/deteccion/trabajos/
+    """
+    if 'image' not in request.FILES:
+        return Response(
+            {'error': 'Se requiere una imagen'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    image_file = request.FILES['image']
+    max_bytes = DETECTION_JOBS_CONFIG['max_image_mb'] * 1024 * 1024
+    if image_file.size > max_bytes:
+        return Response(
+            {'error': f"La imagen supera el máximo de {DETECTION_JOBS_CONFIG['max_image_mb']} MB"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    trabajo = enqueue_detection_job(request.user, image_file)
+    payload = job_payload(trabajo)
+    payload['url'] = request.build_absolute_uri(f'{trabajo.id}/')
+    return Response(payload, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estado_trabajo_deteccion(request, trabajo_id):
+    """
+    Estado y resultado de un trabajo de detección
+    Endpoint: /vehiculos/api/deteccion/trabajos/<id>/?wait=<segundos>
+    
+    Con wait la petición espera hasta que el trabajo termine (o se agote el tiempo).
+    """
+    trabajo = get_object_or_404(TrabajoDeteccion.objects.defer('imagen'), id=trabajo_id, usuario=request.user)
+    
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), DETECTION_JOBS_CONFIG['max_wait_seconds'])
+    except ValueError:
+        return Response(
+            {'error': 'El parámetro wait debe ser un número de segundos'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    deadline = time.monotonic() + wait
+    while not trabajo.terminado and time.monotonic() < deadline:
+        time.sleep(min(DETECTION_JOBS_CONFIG['poll_interval_seconds'], max(0, deadline - time.monotonic())))
+        trabajo.refresh_from_db(fields=['estado', 'resultado', 'error', 'intentos', 'fecha_inicio', 'fecha_fin'])
+    
+    return Response(job_payload(trabajo))
+
+
+def _stats_if_loaded(module_name, function_name, default=None):
+    """
+    Métricas de un módulo de detección solo si este proceso ya lo cargó
+    
+    Si el módulo no se ha importado no tiene nada que reportar, y consultar
+    las métricas no debe arrastrar OpenCV/NumPy al proceso.
+    """
+    module = sys.modules.get(f'{__package__}.{module_name}')
+    if module is None:
+        return default
+    return getattr(module, function_name)()
+
+
+@api_view(['GET'])
+def metricas_deteccion(request):
+    """
+    Métricas de rendimiento del servicio de detección de placas
+    Solo para vigilantes y administradores
+    """
+    # Verificar permisos
+    if not hasattr(request.user, 'perfil') or not request.user.perfil.rol:
+        return Response(
+            {'error': 'No tienes permisos suficientes'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    rol = request.user.perfil.rol.nombre
+    if rol not in ['vigilante', 'administrador_general']:
+        return Response(
+            {'error': 'Solo vigilantes y administradores pueden ver métricas'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    from .camera_supervisor import read_supervisor_status
+
+    return Response({
+        'modelos': model_registry.stats(),
+        'version_modelo': _stats_if_loaded('plate_detection', 'model_version_stats'),
+        'planificadores': scheduler_stats(),
+        'pool_ocr': ocr_pool_stats(),
+        'admision': admission_stats(),
+        'cache': _stats_if_loaded('detection_cache', 'detection_cache_stats'),
+        'camaras': _stats_if_loaded('camera_capture', 'capture_stats', []),
+        'filtro_movimiento': _stats_if_loaded('motion_gate', 'motion_gate_stats', {}),
+        'seguimiento': _stats_if_loaded('plate_tracker', 'plate_tracker_stats', {}),
+        'supervisor': read_supervisor_status(),
+        'proceso': {'pid': os.getpid(), 'memoria': memory_usage()},
+    })
+
+
 @api_view(['GET'])
 def estadisticas_accesos(request):
     """
@@ -305,38 +622,21 @@ def estadisticas_accesos(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    from django.db.models import Count
-    from datetime import datetime, timedelta
-
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
     hace_7_dias = hoy - timedelta(days=7)
     
-    # Estadísticas básicas
-    total_registros = RegistroAcceso.objects.count()
-    registros_hoy = RegistroAcceso.objects.filter(timestamp__date=hoy).count()
-    registros_semana = RegistroAcceso.objects.filter(timestamp__date__gte=hace_7_dias).count()
-    
-    # Entradas vs salidas hoy
-    entradas_hoy = RegistroAcceso.objects.filter(
-        timestamp__date=hoy, tipo_acceso='entrada'
-    ).count()
-    salidas_hoy = RegistroAcceso.objects.filter(
-        timestamp__date=hoy, tipo_acceso='salida'
-    ).count()
-    
-    # Vehículos únicos hoy
-    vehiculos_unicos_hoy = RegistroAcceso.objects.filter(
-        timestamp__date=hoy
-    ).values('vehiculo').distinct().count()
+    # Unas pocas filas de los resúmenes diarios, sin contar sobre el historial
+    totales = totales_desde(hace_7_dias)
+    resumen_hoy = resumen_dia(hoy)
 
     return Response({
-        'total_registros': total_registros,
-        'registros_hoy': registros_hoy,
-        'registros_semana': registros_semana,
-        'entradas_hoy': entradas_hoy,
-        'salidas_hoy': salidas_hoy,
-        'vehiculos_unicos_hoy': vehiculos_unicos_hoy,
-        'vehiculos_en_cochera': entradas_hoy - salidas_hoy,
+        'total_registros': totales['total'],
+        'registros_hoy': resumen_hoy['entradas'] + resumen_hoy['salidas'],
+        'registros_semana': totales['desde'],
+        'entradas_hoy': resumen_hoy['entradas'],
+        'salidas_hoy': resumen_hoy['salidas'],
+        'vehiculos_unicos_hoy': resumen_hoy['vehiculos_unicos'],
+        'vehiculos_en_cochera': OcupacionCochera.objects.count(),
     })
 
 
@@ -353,39 +653,36 @@ def vigilante_estadisticas(request):
     if not hasattr(request.user, 'perfil') or request.user.perfil.rol.nombre != 'vigilante':
         return JsonResponse({'error': 'Acceso denegado. Solo vigilantes pueden acceder.'}, status=403)
     
-    hoy = date.today()
-    
-    # Estadísticas del día
-    entradas_hoy = RegistroAcceso.objects.filter(
-        timestamp__date=hoy, 
-        tipo_acceso='entrada'
-    ).count()
-    
-    salidas_hoy = RegistroAcceso.objects.filter(
-        timestamp__date=hoy, 
-        tipo_acceso='salida'
-    ).count()
+    hoy = timezone.localdate()
     
-    # Vehículos actualmente en cochera (entradas - salidas hoy)
-    vehiculos_en_cochera = entradas_hoy - salidas_hoy
-    
-    # Total de registros hoy
-    registros_hoy = entradas_hoy + salidas_hoy
+    # Estadísticas del día desde los resúmenes por día y por hora
+    resumen_hoy = resumen_dia(hoy)
+    por_hora = [
+        {
+            'hora': timezone.localtime(resumen.hora).strftime('%H:%M'),
+            'entradas': resumen.entradas,
+            'salidas': resumen.salidas,
+            'vehiculos_unicos': resumen.vehiculos_unicos,
+        }
+        for resumen in accesos_por_hora(hoy)
+    ]
     
     # Registro más reciente
     ultimo_registro = RegistroAcceso.objects.filter(
-        timestamp__date=hoy
-    ).order_by('-timestamp').first()
+        timestamp__gte=timezone.make_aware(datetime.combine(hoy, datetime.min.time()))
+    ).select_related('vehiculo').order_by('-timestamp').first()
     
     return JsonResponse({
-        'entradas_hoy': entradas_hoy,
-        'salidas_hoy': salidas_hoy,
-        'vehiculos_en_cochera': max(0, vehiculos_en_cochera),  # No puede ser negativo
-        'registros_hoy': registros_hoy,
+        'entradas_hoy': resumen_hoy['entradas'],
+        'salidas_hoy': resumen_hoy['salidas'],
+        'vehiculos_en_cochera': OcupacionCochera.objects.count(),
+        'registros_hoy': resumen_hoy['entradas'] + resumen_hoy['salidas'],
+        'vehiculos_unicos_hoy': resumen_hoy['vehiculos_unicos'],
+        'accesos_por_hora': por_hora,
         'ultimo_registro': {
             'placa': ultimo_registro.vehiculo.placa if ultimo_registro else None,
             'tipo': ultimo_registro.tipo_acceso if ultimo_registro else None,
-            'hora': ultimo_registro.timestamp.strftime('%H:%M') if ultimo_registro else None
+            'hora': timezone.localtime(ultimo_registro.timestamp).strftime('%H:%M') if ultimo_registro else None
         } if ultimo_registro else None,
         'fecha': hoy.strftime('%Y-%m-%d')
     })
@@ -398,17 +695,46 @@ def vigilante_detectar_placa(request):
     """
     Detectar placa usando cámara en tiempo real.
     Endpoint: /vehiculos/api/vigilante/detectar-placa/
+    
+    Con deadline_ms la respuesta llega dentro del plazo aunque sea parcial:
+    'stages' indica qué etapas terminaron y 'unread_boxes' las placas
+    detectadas que no alcanzaron a leerse (digitación manual).
     """
+    try:
+        deadline = _request_deadline(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'plates_detected': []}, status=400)
+    
     # Verificar que el usuario sea vigilante
     if not hasattr(request.user, 'perfil') or request.user.perfil.rol.nombre != 'vigilante':
         return JsonResponse({'error': 'Acceso denegado. Solo vigilantes pueden usar la detección.'}, status=403)
     
+    return _vigilante_detectar_placa(request, deadline)
+
+
+@admission_controlled
+def _vigilante_detectar_placa(request, deadline):
     try:
-        # Inicializar cámara si es necesario
+        # Tomar el último frame del servicio de captura continua
+        from .plate_detection import CameraManager
         camera_manager = CameraManager()
         
         # Capturar frame y detectar placa
-        detection_result = camera_manager.detect_from_camera()
+        detection_result = camera_manager.detect_plates_in_frame(deadline)
+        partial = {
+            'model_version': detection_result.get('model_version'),
+            'stages': detection_result.get('stages', {}),
+            'deadline_exceeded': detection_result.get('deadline_exceeded', False),
+            'unread_boxes': detection_result.get('unread_boxes', []),
+            'unread_confidence_scores': detection_result.get('unread_confidence_scores', []),
+        } if detection_result is not None else {}
+        
+        if detection_result is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'No se pudo capturar frame de la cámara',
+                'plates_detected': []
+            }, status=500)
         
         if detection_result.get('plates_detected'):
             return JsonResponse({
@@ -416,13 +742,18 @@ def vigilante_detectar_placa(request):
                 'plates_detected': detection_result['plates_detected'],
                 'confidence_scores': detection_result['confidence_scores'],
                 'timestamp': timezone.now().isoformat(),
-                'message': f"Detectada(s) {len(detection_result['plates_detected'])} placa(s)"
+                'message': f"Detectada(s) {len(detection_result['plates_detected'])} placa(s)",
+                **partial,
             })
         else:
             return JsonResponse({
                 'success': False,
                 'plates_detected': [],
-                'message': 'No se detectaron placas en este momento'
+                'message': (
+                    'Placa detectada sin lectura dentro del plazo, ingrésala manualmente'
+                    if partial.get('unread_boxes') else 'No se detectaron placas en este momento'
+                ),
+                **partial,
             })
             
     except Exception as e:
@@ -451,6 +782,9 @@ def vigilante_registrar_acceso(request):
         tipo_acceso = request.POST.get('tipo_acceso', '').lower()
         confianza = float(request.POST.get('confianza_deteccion', 0.0))
         observaciones = request.POST.get('observaciones', '')
+        puerta = request.POST.get('puerta', '').strip()
+        # model_version de la respuesta de detectar-placa
+        version_modelo = request.POST.get('version_modelo', '').strip() or active_version_name()
         
         # Validaciones
         if not placa:
@@ -512,7 +846,9 @@ def vigilante_registrar_acceso(request):
             confianza_deteccion=confianza,
             vigilante=request.user,
             prestamo_relacionado=prestamo_activo,
-            observaciones=observaciones or f'Registro {tipo_acceso} por detección automática'
+            observaciones=observaciones or f'Registro {tipo_acceso} por detección automática',
+            puerta=puerta,
+            version_modelo=version_modelo,
         )
         
         return JsonResponse({
@@ -528,7 +864,9 @@ def vigilante_registrar_acceso(request):
             'registro': {
                 'tipo_acceso': registro.tipo_acceso,
                 'timestamp': registro.timestamp.isoformat(),
-                'confianza': registro.confianza_deteccion
+                'confianza': registro.confianza_deteccion,
+                'puerta': registro.puerta,
+                'version_modelo': registro.version_modelo,
             }
         })
         
@@ -539,6 +877,48 @@ def vigilante_registrar_acceso(request):
         return JsonResponse({'error': f'Error interno: {str(e)}'}, status=500)
 
 
+@api_view(['POST'])
+@login_required
+@csrf_exempt
+def vigilante_sincronizar_accesos(request):
+    """
+    Registrar por lotes los accesos que una puerta guardó sin conexión.
+    Endpoint: /vehiculos/api/vigilante/sincronizar-accesos/
+    
+    Cada evento trae su timestamp (hora de la puerta) y una clave de
+    idempotencia; reenviar el lote no duplica registros. La respuesta trae un
+    resultado por evento en el mismo orden.
+    """
+    # Verificar que el usuario sea vigilante
+    if not hasattr(request.user, 'perfil') or request.user.perfil.rol.nombre != 'vigilante':
+        return JsonResponse({'error': 'Acceso denegado. Solo vigilantes pueden registrar accesos.'}, status=403)
+    
+    eventos = request.data.get('eventos') if hasattr(request.data, 'get') else None
+    if not isinstance(eventos, list) or not eventos:
+        return JsonResponse({'error': 'Se requiere una lista "eventos" con al menos un evento'}, status=400)
+    
+    max_eventos = OFFLINE_SYNC_CONFIG['max_events']
+    if len(eventos) > max_eventos:
+        return JsonResponse({
+            'error': f'Se permiten como máximo {max_eventos} eventos por petición'
+        }, status=400)
+    
+    try:
+        resultados = ingerir_eventos(eventos, request.user)
+    except Exception as e:
+        logger.error(f"Error al sincronizar accesos: {str(e)}")
+        return JsonResponse({'error': f'Error interno: {str(e)}'}, status=500)
+    
+    conteo = Counter(resultado['estado'] for resultado in resultados)
+    return JsonResponse({
+        'procesados': len(resultados),
+        'creados': conteo[CREADO],
+        'duplicados': conteo[DUPLICADO],
+        'rechazados': conteo[RECHAZADO],
+        'resultados': resultados
+    })
+
+
 @api_view(['GET'])
 @login_required
 def vigilante_vehiculos_cochera(request):
@@ -551,35 +931,22 @@ def vigilante_vehiculos_cochera(request):
         return JsonResponse({'error': 'Acceso denegado. Solo vigilantes pueden acceder.'}, status=403)
     
     hoy = date.today()
+    ahora = timezone.now()
     
-    # Obtener todos los vehículos que entraron hoy y no han salido
-    vehiculos_cochera = []
-    
-    # Buscar todos los registros de entrada de hoy
-    entradas_hoy = RegistroAcceso.objects.filter(
-        timestamp__date=hoy,
-        tipo_acceso='entrada'
-    ).order_by('-timestamp')
-    
-    for entrada in entradas_hoy:
-        # Verificar si ya salió
-        salida = RegistroAcceso.objects.filter(
-            vehiculo=entrada.vehiculo,
-            timestamp__date=hoy,
-            timestamp__gt=entrada.timestamp,
-            tipo_acceso='salida'
-        ).first()
-        
-        if not salida:  # No ha salido
-            vehiculos_cochera.append({
-                'vehiculo_id': entrada.vehiculo.id,
-                'placa': entrada.vehiculo.placa,
-                'propietario': entrada.vehiculo.usuario.get_full_name() or entrada.vehiculo.usuario.username,
-                'usuario_autorizado': entrada.usuario_autorizado.get_full_name() or entrada.usuario_autorizado.username,
-                'hora_entrada': entrada.timestamp.strftime('%H:%M'),
-                'tiempo_estacionado': str(timezone.now() - entrada.timestamp).split('.')[0],  # Sin microsegundos
-                'es_prestamo': entrada.prestamo_relacionado is not None
-            })
+    # Una sola consulta sobre la ocupación (incluye a los que entraron antes de hoy)
+    vehiculos_cochera = [
+        {
+            'vehiculo_id': ocupacion.vehiculo_id,
+            'placa': ocupacion.vehiculo.placa,
+            'propietario': ocupacion.vehiculo.usuario.get_full_name() or ocupacion.vehiculo.usuario.username,
+            'usuario_autorizado': ocupacion.usuario_autorizado.get_full_name() or ocupacion.usuario_autorizado.username,
+            'hora_entrada': ocupacion.fecha_entrada.strftime('%H:%M'),
+            'fecha_entrada': ocupacion.fecha_entrada.isoformat(),
+            'tiempo_estacionado': str(ahora - ocupacion.fecha_entrada).split('.')[0],  # Sin microsegundos
+            'es_prestamo': ocupacion.registro_entrada.prestamo_relacionado_id is not None
+        }
+        for ocupacion in vehiculos_en_cochera()
+    ]
     
     return JsonResponse({
         'vehiculos_en_cochera': vehiculos_cochera,
@@ -642,7 +1009,7 @@ def vigilante_buscar_vehiculo(request):
                 'timestamp': ultimo_registro.timestamp.isoformat(),
                 'vigilante': ultimo_registro.vigilante.username
             } if ultimo_registro else None,
-            'esta_en_cochera': ultimo_registro and ultimo_registro.tipo_acceso == 'entrada' if ultimo_registro else False
+            'esta_en_cochera': esta_en_cochera(vehiculo)
         })
         
     except Vehiculo.DoesNotExist: